@@ -1,20 +1,100 @@
 from sqlmodel import SQLModel, create_engine, Session
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy import event, inspect, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine
 from app.models.user import User
-from app.models.health import Medication, HealthMetric
-from app.models.medical import MedicalReport
-from app.models.cognitive import BehaviorLog
+from app.models.health import Medication, HealthMetric, HealthRollup, InactivitySetting, DoseLog, VitalAnomaly
+from app.models.medical import MedicalReport, SummaryCache
+from app.models.cognitive import BehaviorLog, BehaviorWeekStat, CognitiveAnalysisCache
+from app.models.location import LocationFix, Geofence, GeofenceEvent
 import os
 from dotenv import load_dotenv
 
+# The one place .env is loaded; app.main imports this module before anything that reads config
 load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./eldercare.db")
+# Async driver URL; derived from DATABASE_URL for SQLite (aiosqlite)
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL", DATABASE_URL.replace("sqlite://", "sqlite+aiosqlite://", 1))
 
-engine = create_engine(DATABASE_URL, echo=True)
+# Statement logging and pool sizing
+DB_ECHO = os.getenv("DB_ECHO", "false").lower() == "true"
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+# Schema setup on every worker start; autoscaled deployments can run it once instead
+DB_INIT_ON_STARTUP = os.getenv("DB_INIT_ON_STARTUP", "true").lower() == "true"
+
+# SQLite tuning applied to every new connection
+SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL") # safe with WAL: a crash can't corrupt, may drop the last commits
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_CACHE_SIZE_KB = int(os.getenv("SQLITE_CACHE_SIZE_KB", "20000"))
+
+def _engine_kwargs(url: str) -> dict:
+    kwargs = {"echo": DB_ECHO, "pool_pre_ping": not url.startswith("sqlite")}
+    database = make_url(url).database
+    if not url.startswith("sqlite") or (database and database != ":memory:"):
+        kwargs.update(pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW, pool_timeout=DB_POOL_TIMEOUT)
+    return kwargs
+
+def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA journal_mode={SQLITE_JOURNAL_MODE}")
+    cursor.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+    cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KB}")
+    cursor.close()
+
+engine = create_engine(DATABASE_URL, **_engine_kwargs(DATABASE_URL))
+async_engine = create_async_engine(ASYNC_DATABASE_URL, **_engine_kwargs(ASYNC_DATABASE_URL))
+
+if DATABASE_URL.startswith("sqlite"):
+    event.listen(engine, "connect", _apply_sqlite_pragmas)
+if ASYNC_DATABASE_URL.startswith("sqlite"):
+    event.listen(async_engine.sync_engine, "connect", _apply_sqlite_pragmas)
+
+def add_missing_columns():
+    """
+    Lightweight forward migration: create_all never alters existing tables, so add
+    columns declared on a model after its table was created. New columns must be
+    nullable or carry a server_default.
+    """
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in SQLModel.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {c["name"] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                ddl = f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" {column.type.compile(dialect=engine.dialect)}'
+                default = column.server_default
+                if default is not None and isinstance(default.arg, str):
+                    ddl += " DEFAULT '" + default.arg.replace("'", "''") + "'"
+                conn.execute(text(ddl))
 
 def init_db():
+    """Creates tables, then adds columns and indexes declared since they were created."""
     SQLModel.metadata.create_all(engine)
+    add_missing_columns()
+    # create_all skips tables that already exist, including their indexes,
+    # so add any index declared after the table was first created.
+    for table in SQLModel.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(engine, checkfirst=True)
 
 def get_session():
     with Session(engine) as session:
         yield session
+
+async def get_async_session():
+    """For async routes: DB I/O awaits instead of blocking the event loop."""
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
+        yield session
+
+if __name__ == "__main__":
+    # python -m app.db  -> run schema setup once per release, then start workers with DB_INIT_ON_STARTUP=false
+    init_db()
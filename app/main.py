@@ -1,86 +1,225 @@
-from fastapi import FastAPI, Request
-from fastapi.staticfiles import StaticFiles
-from fastapi.templating import Jinja2Templates
-from fastapi.responses import HTMLResponse
+import logging
+import os
 
-from app.routers import auth, profile, health, safety
-from app.db import init_db
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.templating import Jinja2Templates
+from fastapi.responses import HTMLResponse, PlainTextResponse
+
+from app.services.startup import lazy_import, readiness, startup_profile, timed_import
+
+# Services log through the logging module; INFO keeps the startup profile and simulated messages visible
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO").upper(), format="%(levelname)s %(name)s: %(message)s")
+
+# app.db loads .env, so it goes first; every import below is timed for the startup report
+db = timed_import("app.db")
+auth, profile, health, safety, medical, cognitive, caregiver, stream = (
+    timed_import(f"app.routers.{name}")
+    for name in ("auth", "profile", "health", "safety", "medical", "cognitive", "caregiver", "stream")
+)
+from sqlmodel import Session
+from app.services.cognitive_analysis import ensure_week_stats
+from app.services.telemetry import telemetry_queue
+from app.services.inactivity import inactivity_monitor, rebuild_index
+from app.services.geofence import ensure_loaded as load_geofences
+from app.services.reminders import load_schedules, reminder_scheduler
+from app.services.anomaly import backfill_baselines
+from app.services.archive import ArchiveScheduler, health_archive
+from app.services.passwords import password_hasher
+from app.services.pdf_extract import pdf_extractor
+from app.services.report_pipeline import report_pipeline
+from app.services.auth_cache import cache_stats
+from app.services.caregiver_overview import snapshot_cache
+from app.services.event_hub import event_hub
+from app.services.geofence import geofence_index
+from app.services.anomaly import anomaly_detector
+from app.services.whatsapp import dispatcher
+from app.services.asset_cache import REVALIDATE, CachedStaticFiles, PageCache, asset_store, cached_response
+from app.services.metrics import CONTENT_TYPE, METRICS_ENABLED, METRICS_TOKEN, MetricsMiddleware, instrument_engine, lag_monitor, metrics
 
 app = FastAPI(title="Elder Care Platform")
 
+archive_scheduler = ArchiveScheduler(health_archive, db.engine)
+
+if METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+    instrument_engine(db.engine)
+    instrument_engine(db.async_engine.sync_engine)
+    # Existing per-service stats, read on each scrape
+    for name, collector in {
+        "auth_cache": cache_stats,
+        "caregiver_snapshot_cache": snapshot_cache.stats,
+        "whatsapp": dispatcher.stats,
+        "password_hasher": password_hasher.stats,
+        "telemetry_queue": telemetry_queue.stats,
+        "pdf_extractor": pdf_extractor.stats,
+        "event_hub": event_hub.stats,
+        "geofence_index": geofence_index.stats,
+        "reminder_scheduler": reminder_scheduler.stats,
+        "anomaly_detector": anomaly_detector.stats,
+        "health_archive": health_archive.stats,
+        "archive_scheduler": archive_scheduler.stats,
+        "readiness": readiness.status,
+        "runtime": lag_monitor.stats,
+        "static_assets": asset_store.stats,
+    }.items():
+        metrics.register(name, collector)
+
+def _build_week_stats():
+    with Session(db.engine) as session:
+        ensure_week_stats(session)
+
+def _build_ai_client():
+    from app.services.ai_service import get_client
+    get_client()
+
 @app.on_event("startup")
 def on_startup():
-    init_db()
+    # Critical path: schema, telemetry writer, password pool. Alerts and auth can serve after this.
+    if db.DB_INIT_ON_STARTUP:
+        with startup_profile.timed("init_db"):
+            db.init_db()
+    with startup_profile.timed("telemetry_queue.start"):
+        telemetry_queue.start()
+    with startup_profile.timed("inactivity_monitor.start"):
+        inactivity_monitor.start()
+    with startup_profile.timed("reminder_scheduler.start"):
+        reminder_scheduler.start()
+    with startup_profile.timed("password_hasher.start"):
+        password_hasher.start()
+    readiness.mark_critical()
+    archive_scheduler.start()
+
+    # Everything else warms in the background; each step still works lazily if hit first
+    readiness.warm_in_background([
+        ("inactivity index", lambda: rebuild_index(inactivity_monitor)),
+        ("medication schedules", lambda: load_schedules(reminder_scheduler)),
+        ("anomaly baselines", backfill_baselines),
+        ("geofence index", load_geofences),
+        ("cognitive week stats", _build_week_stats),
+        ("resume pending reports", report_pipeline.resume_pending),
+        ("pandas", lazy_import("pandas").load),
+        ("PyPDF2", lazy_import("PyPDF2").load),
+        ("huggingface_hub client", _build_ai_client),
+        ("static assets", asset_store.ensure_loaded),
+        ("page shells", page_cache.warm),
+    ])
+
+@app.get("/ready")
+def ready(response: Response, full: bool = False):
+    """
+    200 once critical routes (auth, alerts, ingest) can serve; with ?full=true, only
+    once every subsystem is warm. Includes the per-step startup timings.
+    """
+    if not readiness.critical or (full and not readiness.warm):
+        response.status_code = 503
+    return {**readiness.status(), "startup": startup_profile.as_dict()}
 
-# Mount static files
-app.mount("/static", StaticFiles(directory="static"), name="static")
-
-# Templates
+@app.on_event("startup")
+async def start_lag_monitor():
+    if METRICS_ENABLED:
+        lag_monitor.start()
+
+@app.get("/metrics", include_in_schema=False)
+def get_metrics(request: Request):
+    """
+    Prometheus text format: route latency, per-request SQL counts, external API
+    timings, event loop / threadpool lag, plus every service's stats() as gauges.
+    """
+    if not METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics disabled")
+    if METRICS_TOKEN and request.headers.get("authorization") != f"Bearer {METRICS_TOKEN}":
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+    return PlainTextResponse(metrics.render(), media_type=CONTENT_TYPE)
+
+@app.on_event("shutdown")
+def on_shutdown():
+    # Drain buffered telemetry so a deploy/restart never loses accepted samples
+    telemetry_queue.stop()
+    inactivity_monitor.stop()
+    reminder_scheduler.stop()
+    archive_scheduler.stop()
+    password_hasher.stop()
+    report_pipeline.stop()
+    pdf_extractor.stop()
+    lag_monitor.stop()
+
+@app.on_event("shutdown")
+async def close_async_engine():
+    await db.async_engine.dispose()
+
+# Mount static files (served from memory, precompressed; uploads still from disk)
+app.mount("/static", CachedStaticFiles(directory="static"), name="static")
+
+# Templates; page shells have no per-user context, so each is rendered once
 templates = Jinja2Templates(directory="templates")
+templates.env.globals["asset_url"] = asset_store.url
+page_cache = PageCache(templates)
 
 app.include_router(auth.router, prefix="/auth", tags=["auth"])
 app.include_router(profile.router, prefix="/profile", tags=["profile"])
 app.include_router(health.router, prefix="/health", tags=["health"])
 app.include_router(safety.router, prefix="/safety", tags=["safety"])
-from app.routers import medical, cognitive
 app.include_router(medical.router, prefix="/medical", tags=["medical"])
 app.include_router(cognitive.router, prefix="/cognitive", tags=["cognitive"])
+app.include_router(caregiver.router, prefix="/caregiver", tags=["caregiver"])
+app.include_router(stream.router, prefix="/stream", tags=["stream"])
 
 @app.get("/", response_class=HTMLResponse)
 async def read_root(request: Request):
-    return templates.TemplateResponse("index.html", {"request": request})
+    return page_cache.response(request, "index.html")
 
 @app.get("/login", response_class=HTMLResponse)
 async def login_page(request: Request):
-    return templates.TemplateResponse("login.html", {"request": request})
+    return page_cache.response(request, "login.html")
 
 @app.get("/signup", response_class=HTMLResponse)
 async def signup_page(request: Request):
-    return templates.TemplateResponse("signup.html", {"request": request})
+    return page_cache.response(request, "signup.html")
 
 @app.get("/dashboard", response_class=HTMLResponse)
 async def dashboard_page(request: Request):
     # In a real app, we'd check cookies/session here, but for now we rely on JS redirection
-    return templates.TemplateResponse("dashboard.html", {"request": request})
+    return page_cache.response(request, "dashboard.html")
 
 @app.get("/monitor", response_class=HTMLResponse)
 async def monitor_page(request: Request):
-    return templates.TemplateResponse("fall_monitor.html", {"request": request})
+    return page_cache.response(request, "fall_monitor.html")
 
 @app.get("/videocall", response_class=HTMLResponse)
 async def videocall_page(request: Request):
-    return templates.TemplateResponse("videocall.html", {"request": request})
+    return page_cache.response(request, "videocall.html")
 
 @app.get("/companion", response_class=HTMLResponse)
 async def companion_page(request: Request):
-    return templates.TemplateResponse("companion.html", {"request": request})
+    return page_cache.response(request, "companion.html")
 
 @app.get("/location", response_class=HTMLResponse)
 async def location_page(request: Request):
-    return templates.TemplateResponse("location.html", {"request": request})
+    return page_cache.response(request, "location.html")
 
 @app.get("/nutrition", response_class=HTMLResponse)
 async def nutrition_page(request: Request):
-    return templates.TemplateResponse("nutrition.html", {"request": request})
+    return page_cache.response(request, "nutrition.html")
 
 @app.get("/medical-records", response_class=HTMLResponse)
 async def medical_records_page(request: Request):
-    return templates.TemplateResponse("medical_reports.html", {"request": request})
+    return page_cache.response(request, "medical_reports.html")
 
 @app.get("/medications", response_class=HTMLResponse)
 async def medications_page(request: Request):
-    return templates.TemplateResponse("medications.html", {"request": request})
+    return page_cache.response(request, "medications.html")
 
 @app.get("/patient-profile", response_class=HTMLResponse)
 async def patient_profile_page(request: Request):
-    return templates.TemplateResponse("patient_profile.html", {"request": request})
+    return page_cache.response(request, "patient_profile.html")
 
 @app.get("/cognitive-health", response_class=HTMLResponse)
 async def cognitive_page(request: Request):
-    return templates.TemplateResponse("cognitive.html", {"request": request})
+    return page_cache.response(request, "cognitive.html")
 
 @app.get("/favicon.ico", include_in_schema=False)
-async def favicon():
-    from fastapi.responses import FileResponse
-    return FileResponse("static/images/favicon.svg")
+async def favicon(request: Request):
+    asset_store.ensure_loaded()
+    icon, _ = asset_store.lookup("images/favicon.svg")
+    return cached_response(request.headers, request.method, icon, REVALIDATE)
 
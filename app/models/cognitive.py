@@ -1,14 +1,32 @@
-from sqlmodel import SQLModel, Field
+from sqlmodel import SQLModel, Field, Index
 from datetime import datetime
 from typing import Optional, List
 
 class BehaviorLog(SQLModel, table=True):
+    __table_args__ = (Index("ix_behaviorlog_user_id_timestamp", "user_id", "timestamp"),)
+
     id: Optional[int] = Field(default=None, primary_key=True)
     user_id: int
     description: str # e.g., "Forgot name of grandchild"
     severity: str # Low, Medium, High
     timestamp: datetime = Field(default_factory=datetime.now)
 
+class BehaviorWeekStat(SQLModel, table=True):
+    """Per-user weekly log counts by severity, updated on every log insert."""
+    user_id: int = Field(primary_key=True)
+    week_start: datetime = Field(primary_key=True) # Monday 00:00
+    severity: str = Field(primary_key=True)
+    count: int = 0
+
+class CognitiveAnalysisCache(SQLModel, table=True):
+    """Last analysis per user, valid while last_log_id is still the user's newest log."""
+    user_id: int = Field(primary_key=True)
+    last_log_id: int
+    stage: str
+    score: int
+    advice: str # JSON list
+    created_at: datetime = Field(default_factory=datetime.now)
+
 class CognitiveAnalysis(SQLModel):
     stage: str # "Normal Aging", "Mild Cognitive Impairment", "Early Dementia"
     score: int # 0-100 risk score
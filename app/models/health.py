@@ -1,5 +1,6 @@
 from typing import Optional
-from sqlmodel import SQLModel, Field
+from sqlalchemy import text
+from sqlmodel import SQLModel, Field, Index
 from datetime import datetime
 
 class Medication(SQLModel, table=True):
@@ -11,8 +12,21 @@ class Medication(SQLModel, table=True):
     instructions: Optional[str] = None # "Before food"
     start_date: Optional[datetime] = None
     end_date: Optional[datetime] = None
+    created_at: Optional[datetime] = None # set by the server; NULL on rows older than the column
 
 class HealthMetric(SQLModel, table=True):
+    __table_args__ = (
+        Index("ix_healthmetric_user_id_timestamp", "user_id", "timestamp"),
+        # Newest reading of one vital per user (caregiver overview) without walking
+        # rows that lack it, e.g. spo2 for a user whose exports never carry it
+        *(
+            Index(f"ix_healthmetric_user_id_timestamp_{vital}", "user_id", "timestamp", sqlite_where=text(f"{vital} IS NOT NULL"))
+            for vital in ("heart_rate", "steps", "sleep_minutes", "spo2")
+        ),
+        # Latest inactivity alert per user (inactivity monitor rebuild); alert rows are rare
+        Index("ix_healthmetric_user_id_timestamp_inactivity", "user_id", "timestamp", sqlite_where=text("inactivity_alert = 1")),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     user_id: int = Field(foreign_key="user.id")
     timestamp: datetime
@@ -27,3 +41,72 @@ class HealthMetric(SQLModel, table=True):
     # Fall/Safety
     fall_detected: bool = False
     inactivity_alert: bool = False
+
+class TelemetrySample(SQLModel):
+    """One pushed watch/device reading. Missing timestamps default to receipt time."""
+    timestamp: Optional[datetime] = None
+    source: str = "device"
+    heart_rate: Optional[int] = Field(default=None, ge=0)
+    steps: Optional[int] = Field(default=None, ge=0)
+    sleep_minutes: Optional[int] = Field(default=None, ge=0)
+    spo2: Optional[int] = Field(default=None, ge=0, le=100)
+
+class HealthRollup(SQLModel, table=True):
+    """
+    Pre-aggregated HealthMetric values per user, metric and time bucket.
+    resolution is one of "minute", "hour", "day"; mean = total / count.
+    """
+    user_id: int = Field(primary_key=True)
+    resolution: str = Field(primary_key=True)
+    metric: str = Field(primary_key=True) # heart_rate, steps, sleep_minutes, spo2
+    bucket_start: datetime = Field(primary_key=True)
+    count: int = 0
+    total: float = 0
+    min_value: Optional[float] = None
+    max_value: Optional[float] = None
+
+class InactivitySetting(SQLModel, table=True):
+    """Per-user inactivity alert window. Users without a row use the server default."""
+    user_id: int = Field(foreign_key="user.id", primary_key=True)
+    window_minutes: int = Field(default=360, ge=5)
+    enabled: bool = True
+
+class InactivitySettingUpdate(SQLModel):
+    """Request body for PUT /health/inactivity-settings (table models skip validation)."""
+    window_minutes: int = Field(default=360, ge=5, le=7 * 24 * 60)
+    enabled: bool = True
+
+class DoseLog(SQLModel, table=True):
+    """
+    One scheduled dose of a Medication. Written as "reminded" when the reminder goes
+    out, then "taken" when the elder confirms or "missed" once the grace period passes.
+    """
+    __table_args__ = (
+        Index("ix_doselog_medication_id_scheduled_for", "medication_id", "scheduled_for", unique=True),
+        Index("ix_doselog_status_scheduled_for", "status", "scheduled_for"),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    medication_id: int = Field(foreign_key="medication.id")
+    user_id: int = Field(foreign_key="user.id", index=True)
+    scheduled_for: datetime
+    status: str = "reminded" # "reminded", "taken", "missed"
+    reminded_at: Optional[datetime] = None
+    confirmed_at: Optional[datetime] = None
+
+class VitalAnomaly(SQLModel, table=True):
+    """
+    A heart rate / SpO2 reading the anomaly detector flagged: past a hard limit
+    ("above_limit"/"below_limit") or far from the user's own baseline for that time
+    of day ("above_baseline"/"below_baseline"; score is the z-score).
+    """
+    __table_args__ = (Index("ix_vitalanomaly_user_id_timestamp", "user_id", "timestamp"),)
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    user_id: int = Field(foreign_key="user.id")
+    timestamp: datetime
+    metric: str
+    value: float
+    baseline: Optional[float] = None
+    score: Optional[float] = None
+    reason: str
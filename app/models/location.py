@@ -0,0 +1,57 @@
+from typing import List, Optional
+from sqlmodel import SQLModel, Field, Index
+from datetime import datetime
+
+class LocationFix(SQLModel, table=True):
+    __table_args__ = (Index("ix_locationfix_user_id_timestamp", "user_id", "timestamp"),)
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    user_id: int = Field(foreign_key="user.id")
+    timestamp: datetime
+    latitude: float
+    longitude: float
+    accuracy_m: Optional[float] = None
+    source: str = "browser" # "browser", "phone", "watch"
+
+class Geofence(SQLModel, table=True):
+    """
+    A safe zone: kind "circle" uses center + radius_m, kind "polygon" uses polygon,
+    a JSON list of [lat, lon] vertices. state is the last confirmed "inside"/"outside"
+    (None until the first confirmed fix).
+    """
+    id: Optional[int] = Field(default=None, primary_key=True)
+    user_id: int = Field(foreign_key="user.id", index=True)
+    name: str
+    kind: str = "circle"
+    center_lat: Optional[float] = None
+    center_lon: Optional[float] = None
+    radius_m: Optional[float] = None
+    polygon: Optional[str] = None
+    active: bool = True
+    state: Optional[str] = None
+    created_at: datetime = Field(default_factory=datetime.now)
+
+class GeofenceEvent(SQLModel, table=True):
+    id: Optional[int] = Field(default=None, primary_key=True)
+    geofence_id: int = Field(foreign_key="geofence.id", index=True)
+    user_id: int = Field(foreign_key="user.id")
+    kind: str # "breach" (left the zone) or "return"
+    timestamp: datetime
+    latitude: float
+    longitude: float
+
+class LocationSample(SQLModel):
+    """One position fix. Missing timestamps default to receipt time."""
+    timestamp: Optional[datetime] = None
+    latitude: float = Field(ge=-90, le=90)
+    longitude: float = Field(ge=-180, le=180)
+    accuracy_m: Optional[float] = Field(default=None, ge=0)
+    source: str = "browser"
+
+class GeofenceCreate(SQLModel):
+    name: str
+    kind: str = "circle"
+    center_lat: Optional[float] = Field(default=None, ge=-90, le=90)
+    center_lon: Optional[float] = Field(default=None, ge=-180, le=180)
+    radius_m: Optional[float] = Field(default=None, gt=0)
+    polygon: Optional[List[List[float]]] = None # [[lat, lon], ...]
@@ -1,8 +1,10 @@
 from typing import Optional
-from sqlmodel import Field, SQLModel
+from sqlmodel import Field, SQLModel, Index
 from datetime import datetime
 
 class MedicalReport(SQLModel, table=True):
+    __table_args__ = (Index("ix_medicalreport_user_id_upload_date", "user_id", "upload_date"),)
+
     id: Optional[int] = Field(default=None, primary_key=True)
     user_id: int
     title: str
@@ -11,3 +13,14 @@ class MedicalReport(SQLModel, table=True):
     summary: Optional[str] = None # AI Generated Summary
     file_path: Optional[str] = None
     upload_date: datetime = Field(default_factory=datetime.now)
+    # Extraction + summarization run in the background after upload
+    status: str = Field(default="ready", sa_column_kwargs={"server_default": "ready"}) # processing, ready, failed
+    processed_date: Optional[datetime] = None
+    content_hash: Optional[str] = Field(default=None, index=True) # SHA-256 of the uploaded bytes
+
+class SummaryCache(SQLModel, table=True):
+    """Summaries keyed by SHA-256 of (model, extracted text), so re-uploads skip inference."""
+    key: str = Field(primary_key=True)
+    model: str
+    summary: str
+    created_at: datetime = Field(default_factory=datetime.now)
@@ -0,0 +1,11 @@
+from typing import List, Optional
+from sqlmodel import SQLModel, Field
+
+class PoseFrame(SQLModel):
+    t: float # capture time in seconds (e.g. performance.now() / 1000)
+    landmarks: List[List[float]] # 33 x [x, y, z, visibility], MediaPipe Pose normalized coords
+
+class PoseBatch(SQLModel):
+    camera_id: str = "camera-1"
+    location: Optional[str] = None # e.g. "Home Bedroom (Camera 1)"
+    frames: List[PoseFrame] = Field(max_length=256)
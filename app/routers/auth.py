@@ -1,8 +1,9 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlmodel import Session, select
-from app.db import get_session
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.db import get_async_session
 from app.models.user import User, UserCreate, UserRead, UserLogin
-from passlib.context import CryptContext
+from app.services.passwords import password_hasher, PasswordPoolBusy, RETRY_AFTER_SECONDS
 from jose import JWTError, jwt
 from datetime import datetime, timedelta
 import os
@@ -13,13 +14,12 @@ SECRET_KEY = os.getenv("JWT_SECRET", "secret")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
-
-def get_password_hash(password):
-    return pwd_context.hash(password)
+def pool_busy_exception():
+    return HTTPException(
+        status_code=503,
+        detail="Too many password checks in progress, please retry shortly",
+        headers={"Retry-After": str(RETRY_AFTER_SECONDS)},
+    )
 
 def create_access_token(data: dict, expires_delta: timedelta | None = None):
     to_encode = data.copy()
@@ -32,28 +32,45 @@ def create_access_token(data: dict, expires_delta: timedelta | None = None):
     return encoded_jwt
 
 @router.post("/signup", response_model=UserRead)
-def signup(user: UserCreate, session: Session = Depends(get_session)):
+async def signup(user: UserCreate, session: AsyncSession = Depends(get_async_session)):
     statement = select(User).where(User.email == user.email)
-    existing_user = session.exec(statement).first()
+    existing_user = (await session.exec(statement)).first()
     if existing_user:
         raise HTTPException(status_code=400, detail="Email already registered")
     
-    hashed_password = get_password_hash(user.password)
+    # bcrypt runs in the password process pool, not on the shared threadpool
+    try:
+        hashed_password = await password_hasher.hash(user.password)
+    except PasswordPoolBusy:
+        raise pool_busy_exception()
     # Exclude 'password' from the source data, add 'hashed_password'
     user_data = user.dict(exclude={"password"})
     db_user = User(**user_data, hashed_password=hashed_password)
     
     session.add(db_user)
-    session.commit()
-    session.refresh(db_user)
+    await session.commit()
+    await session.refresh(db_user)
     return db_user
 
 @router.post("/login")
-def login(user: UserLogin, session: Session = Depends(get_session)):
+async def login(user: UserLogin, session: AsyncSession = Depends(get_async_session)):
     statement = select(User).where(User.email == user.email)
-    db_user = session.exec(statement).first()
-    if not db_user or not verify_password(user.password, db_user.hashed_password):
+    db_user = (await session.exec(statement)).first()
+    if not db_user:
         raise HTTPException(status_code=400, detail="Incorrect email or password")
+    try:
+        ok, new_hash = await password_hasher.verify(user.password, db_user.hashed_password)
+    except PasswordPoolBusy:
+        raise pool_busy_exception()
+    if not ok:
+        raise HTTPException(status_code=400, detail="Incorrect email or password")
+
+    # Transparent upgrade when BCRYPT_ROUNDS changed since this hash was made
+    if new_hash:
+        db_user.hashed_password = new_hash
+        session.add(db_user)
+        await session.commit()
+        await session.refresh(db_user)
     
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
@@ -0,0 +1,74 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlmodel import Session, SQLModel, select
+from app.db import get_session
+from app.models.user import CaregiverElderLink, User, UserRole
+from app.routers.profile import get_current_user
+from app.services.caregiver_overview import caregiver_overview, linked_elders
+
+router = APIRouter()
+
+class AccessGrant(SQLModel):
+    caregiver_email: str
+
+def get_current_caregiver(current_user: User = Depends(get_current_user)) -> User:
+    if current_user.role not in (UserRole.CAREGIVER, UserRole.ADMIN):
+        raise HTTPException(status_code=403, detail="Caregiver account required")
+    return current_user
+
+@router.get("/overview")
+def get_overview(current_user: User = Depends(get_current_caregiver), session: Session = Depends(get_session)):
+    """
+    Latest vitals, open fall/inactivity alerts and newest report for every linked elder.
+    Served from per-elder snapshots; cheap enough for a wall display polling every few seconds.
+    """
+    return caregiver_overview(session, current_user.id)
+
+@router.get("/elders")
+def get_elders(current_user: User = Depends(get_current_caregiver), session: Session = Depends(get_session)):
+    return [{"id": e.id, "full_name": e.full_name, "email": e.email} for e in linked_elders(session, current_user.id)]
+
+@router.delete("/elders/{elder_id}")
+def unlink_elder(elder_id: int, current_user: User = Depends(get_current_caregiver), session: Session = Depends(get_session)):
+    link = session.get(CaregiverElderLink, (current_user.id, elder_id))
+    if not link:
+        raise HTTPException(status_code=404, detail="Elder not linked")
+    session.delete(link)
+    session.commit()
+    return {"ok": True}
+
+# --- Elder side: only the elder can grant a caregiver access to their data ---
+
+def get_current_elder(current_user: User = Depends(get_current_user)) -> User:
+    if current_user.role != UserRole.ELDER:
+        raise HTTPException(status_code=403, detail="Elder account required")
+    return current_user
+
+@router.get("/access")
+def get_caregivers_with_access(current_user: User = Depends(get_current_elder), session: Session = Depends(get_session)):
+    caregivers = session.exec(
+        select(User)
+        .join(CaregiverElderLink, CaregiverElderLink.caregiver_id == User.id)
+        .where(CaregiverElderLink.elder_id == current_user.id)
+    ).all()
+    return [{"id": c.id, "full_name": c.full_name, "email": c.email} for c in caregivers]
+
+@router.post("/access")
+def grant_caregiver_access(grant: AccessGrant, current_user: User = Depends(get_current_elder), session: Session = Depends(get_session)):
+    """The signed-in elder lets a caregiver see their vitals, alerts and reports."""
+    caregiver = session.exec(select(User).where(User.email == grant.caregiver_email)).first()
+    if not caregiver or caregiver.role not in (UserRole.CAREGIVER, UserRole.ADMIN):
+        raise HTTPException(status_code=404, detail="Caregiver not found")
+    if session.get(CaregiverElderLink, (caregiver.id, current_user.id)):
+        raise HTTPException(status_code=409, detail="Caregiver already has access")
+    session.add(CaregiverElderLink(caregiver_id=caregiver.id, elder_id=current_user.id))
+    session.commit()
+    return {"id": caregiver.id, "full_name": caregiver.full_name, "email": caregiver.email}
+
+@router.delete("/access/{caregiver_id}")
+def revoke_caregiver_access(caregiver_id: int, current_user: User = Depends(get_current_elder), session: Session = Depends(get_session)):
+    link = session.get(CaregiverElderLink, (caregiver_id, current_user.id))
+    if not link:
+        raise HTTPException(status_code=404, detail="Caregiver has no access")
+    session.delete(link)
+    session.commit()
+    return {"ok": True}
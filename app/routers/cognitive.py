@@ -1,9 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException, Body
+from fastapi import APIRouter, Depends, HTTPException, Body, Request, Response, Query
 from sqlmodel import Session, SQLModel, Field, select
 from app.db import get_session
 from app.models.user import User
 from app.models.cognitive import BehaviorLog, CognitiveAnalysis
 from app.routers.profile import get_current_user
+from app.services.cognitive_analysis import analyze_user, record_log
+from app.services.pagination import DEFAULT_LIMIT, MAX_LIMIT, keyset_page, set_next_cursor
 from datetime import datetime
 from typing import Optional, List
 
@@ -18,35 +20,33 @@ def log_behavior(
 ):
     log.user_id = current_user.id
     session.add(log)
+    session.flush()
+    record_log(session, log)
     session.commit()
     session.refresh(log)
     return log
 
 @router.get("/logs", response_model=List[BehaviorLog])
-def get_logs(current_user: User = Depends(get_current_user), session: Session = Depends(get_session)):
-    return session.exec(select(BehaviorLog).where(BehaviorLog.user_id == current_user.id).order_by(BehaviorLog.timestamp.desc())).all()
+def get_logs(
+    request: Request,
+    response: Response,
+    limit: int = Query(DEFAULT_LIMIT, ge=1, le=MAX_LIMIT),
+    before: Optional[str] = None,
+    current_user: User = Depends(get_current_user),
+    session: Session = Depends(get_session)
+):
+    statement = select(BehaviorLog).where(BehaviorLog.user_id == current_user.id)
+    logs, next_cursor = keyset_page(session, statement, BehaviorLog.timestamp, BehaviorLog.id, limit, before)
+    set_next_cursor(request, response, next_cursor)
+    return logs
 
 @router.post("/analyze", response_model=CognitiveAnalysis)
 def analyze_cognitive_health(
     current_user: User = Depends(get_current_user),
     session: Session = Depends(get_session)
 ):
-    # Fetch recent logs
-    logs = session.exec(select(BehaviorLog).where(BehaviorLog.user_id == current_user.id)).all()
-    
-    if not logs:
-        return CognitiveAnalysis(stage="Unknown", score=0, advice=["Not enough data. Log daily behaviors for analysis."])
-    
-    # --- Hugging Face AI Analysis ---
-    from app.services.ai_service import analyze_cognitive_state
-    
-    # Construct a prompt from logs
-    logs_text = "\n".join([f"- [{l.timestamp}] ({l.severity}): {l.description}" for l in logs])
-    
-    result = analyze_cognitive_state(logs_text)
-    
-    return CognitiveAnalysis(
-        stage=result["stage"], 
-        score=result["score"], 
-        advice=result["advice"]
-    )
+    """
+    Cached per user until a new log arrives; a miss analyzes the recent window
+    plus weekly severity features rather than the full history.
+    """
+    return analyze_user(session, current_user.id)
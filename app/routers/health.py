@@ -1,23 +1,46 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, UploadFile, File, Request, Response, Query
 from sqlmodel import Session, select
 from app.db import get_session
-from app.models.health import Medication, HealthMetric
+from app.models.health import Medication, HealthMetric, TelemetrySample, InactivitySetting, InactivitySettingUpdate, DoseLog, VitalAnomaly
 from app.models.user import User
 from app.routers.profile import get_current_user
-import pandas as pd
-import io
-from datetime import datetime
+from app.services.anomaly import backfill_baselines
+from app.services.archive import health_archive, series_between
+from app.services.caregiver_overview import invalidate_elders
+from app.services.health_ingest import ingest_csv
+from app.services.telemetry import telemetry_queue, sample_to_record
+from app.services.inactivity import inactivity_monitor
+from app.services.pagination import MAX_LIMIT, decode_cursor, encode_cursor, keyset_page, set_next_cursor
+from app.services.reminders import confirm_dose, parse_timing, reminder_scheduler
+from app.services.rollups import ROLLUP_METRICS, auto_resolution, parse_resolution, query_series
+from app.services.startup import lazy_import
+from pydantic import ValidationError
+from datetime import datetime, timedelta, timezone
+from typing import Literal, Optional
+import json
+import logging
+
+pd = lazy_import("pandas")
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
+
+def _utc_now() -> datetime:
+    # HealthMetric timestamps are naive UTC (telemetry, CSV ingest)
+    return datetime.now(timezone.utc).replace(tzinfo=None)
 
 # --- Medication Endpoints ---
 
 @router.post("/medications", response_model=Medication)
 def create_medication(med: Medication, current_user: User = Depends(get_current_user), session: Session = Depends(get_session)):
     med.user_id = current_user.id
+    med.created_at = datetime.now()
+    if not parse_timing(med.timing):
+        logger.warning("Medication timing %r has no recognizable times; no reminders will be sent", med.timing)
     session.add(med)
     session.commit()
     session.refresh(med)
+    reminder_scheduler.upsert(med)
     return med
 
 @router.get("/medications", response_model=list[Medication])
@@ -32,57 +55,230 @@ def delete_medication(med_id: int, current_user: User = Depends(get_current_user
         raise HTTPException(status_code=404, detail="Medication not found")
     session.delete(med)
     session.commit()
+    reminder_scheduler.remove(med_id)
     return {"ok": True}
 
+@router.post("/medications/{med_id}/taken", response_model=DoseLog)
+def confirm_medication_taken(med_id: int, current_user: User = Depends(get_current_user), session: Session = Depends(get_session)):
+    """Confirms the current dose (the latest one due, or one coming up within the hour)."""
+    med = session.get(Medication, med_id)
+    if not med or med.user_id != current_user.id:
+        raise HTTPException(status_code=404, detail="Medication not found")
+    dose = confirm_dose(session, med)
+    if dose is None:
+        raise HTTPException(status_code=409, detail="No dose of this medication is due")
+    return dose
+
+@router.get("/medications/doses", response_model=list[DoseLog])
+def get_dose_history(
+    status: Optional[Literal["reminded", "taken", "missed"]] = None,
+    limit: int = 50,
+    current_user: User = Depends(get_current_user),
+    session: Session = Depends(get_session)
+):
+    statement = select(DoseLog).where(DoseLog.user_id == current_user.id)
+    if status:
+        statement = statement.where(DoseLog.status == status)
+    return session.exec(statement.order_by(DoseLog.scheduled_for.desc()).limit(min(max(limit, 1), 500))).all()
+
 # --- Health Data Import (Samsung Watuch) ---
 
 @router.post("/upload")
-async def upload_health_data(file: UploadFile = File(...), current_user: User = Depends(get_current_user), session: Session = Depends(get_session)):
+def upload_health_data(background_tasks: BackgroundTasks, file: UploadFile = File(...), current_user: User = Depends(get_current_user), session: Session = Depends(get_session)):
     """
-    Parses a CSV file (Samsung Health Export format mockup) and saves metrics.
-    Expected CSV columns: Time, HeartRate, Steps, SleepMinutes
+    Parses a CSV file (Samsung Health Export format) and bulk-inserts the metrics.
+    Expected CSV columns: Time, HeartRate, Steps, SleepMinutes (SpO2 optional)
+    The file is streamed in chunks, so memory stays flat regardless of export size.
     """
-    contents = await file.read()
     try:
-        df = pd.read_csv(io.StringIO(contents.decode('utf-8')))
-        
-        # Simple parsing logic - assume standard columns for now
-        # In real world, would need mapping logic
-        metrics = []
-        for index, row in df.iterrows():
-            # Mock parsing - just looking for keys case-insensitively
-            row_keys = {k.lower(): v for k, v in row.items()}
-            
-            metric = HealthMetric(
-                user_id=current_user.id,
-                timestamp=datetime.now(), # In real app, parse row_keys.get('time')
-                source="samsung_watch",
-                heart_rate=row_keys.get('heartrate') or row_keys.get('heart_rate') or 0,
-                steps=row_keys.get('steps') or row_keys.get('step_count') or 0,
-                sleep_minutes=row_keys.get('sleep') or row_keys.get('sleep_minutes') or 0
-            )
-            session.add(metric)
-            metrics.append(metric)
-            
-        session.commit()
-        return {"imported": len(metrics), "message": "Health data imported successfully"}
-        
-    except Exception as e:
+        result = ingest_csv(file.file, current_user.id, session)
+    except (ValueError, pd.errors.ParserError, pd.errors.EmptyDataError, UnicodeDecodeError) as e:
+        session.rollback()
         raise HTTPException(status_code=400, detail=f"Invalid CSV format: {str(e)}")
 
+    invalidate_elders([current_user.id])
+    # Imported history reshapes this user's baselines (the import itself isn't scored); rebuilt after the response
+    background_tasks.add_task(backfill_baselines, [current_user.id])
+    return {**result, "message": "Health data imported successfully"}
+
+# --- Streaming Telemetry (watches pushing continuously) ---
+
+INGEST_OFFER_ROWS = 1000
+
+def _queue_or_503(records: list[dict], accepted: int, rejected: int):
+    if not telemetry_queue.offer(records):
+        raise HTTPException(
+            status_code=503,
+            detail={"message": "Telemetry queue full, retry later", "accepted": accepted, "rejected": rejected},
+            headers={"Retry-After": str(max(1, int(telemetry_queue.flush_seconds)))},
+        )
+
+@router.post("/ingest", status_code=202)
+async def ingest_telemetry(request: Request, current_user: User = Depends(get_current_user)):
+    """
+    Accepts pushed samples as a JSON object, a JSON array, or NDJSON (one sample per line).
+    Samples are queued for write-behind batching instead of committing per request.
+    Returns 503 with Retry-After when the queue is full; `accepted` says how many rows
+    of this request were already queued so a client can resume an NDJSON stream.
+    """
+    received_at = _utc_now()
+    accepted = 0
+    rejected = 0
+    records = []
+
+    def add(raw):
+        nonlocal rejected
+        try:
+            sample = TelemetrySample.model_validate(raw)
+        except ValidationError:
+            rejected += 1
+            return
+        records.append(sample_to_record(sample, current_user.id, received_at))
+
+    content_type = request.headers.get("content-type", "")
+    if "ndjson" in content_type or "jsonl" in content_type:
+        buffer = b""
+        async for chunk in request.stream():
+            buffer += chunk
+            *lines, buffer = buffer.split(b"\n")
+            for line in lines:
+                if line.strip():
+                    try:
+                        add(json.loads(line))
+                    except json.JSONDecodeError:
+                        rejected += 1
+            if len(records) >= INGEST_OFFER_ROWS:
+                _queue_or_503(records, accepted, rejected)
+                accepted += len(records)
+                records = []
+        if buffer.strip():
+            try:
+                add(json.loads(buffer))
+            except json.JSONDecodeError:
+                rejected += 1
+    else:
+        try:
+            payload = await request.json()
+        except json.JSONDecodeError:
+            raise HTTPException(status_code=400, detail="Body must be JSON, a JSON array, or NDJSON")
+        for raw in payload if isinstance(payload, list) else [payload]:
+            add(raw)
+
+    _queue_or_503(records, accepted, rejected)
+    accepted += len(records)
+    return {"accepted": accepted, "rejected": rejected, "queued": telemetry_queue.pending}
+
 @router.get("/stats")
-def get_health_stats(current_user: User = Depends(get_current_user), session: Session = Depends(get_session)):
-    # Update Last Activity (Stub logic for "Inactivity Monitor")
-    # In a real app, this would update a timestamp on the User model
-    # print(f"User {current_user.id} active at {datetime.now()}")
-    
-    # Return recent stats
-    statement = select(HealthMetric).where(HealthMetric.user_id == current_user.id).order_by(HealthMetric.timestamp.desc()).limit(10)
-    return session.exec(statement).all()
+def get_health_stats(
+    request: Request,
+    response: Response,
+    limit: int = Query(10, ge=1, le=MAX_LIMIT),
+    before: Optional[str] = None,
+    current_user: User = Depends(get_current_user),
+    session: Session = Depends(get_session)
+):
+    # Return recent stats, newest first; older pages via the X-Next-Cursor header
+    statement = select(HealthMetric).where(HealthMetric.user_id == current_user.id)
+    rows, next_cursor = keyset_page(session, statement, HealthMetric.timestamp, HealthMetric.id, limit, before)
+    if next_cursor is None and len(rows) < limit:
+        # Live table exhausted: the same cursor keeps paging into the archive
+        if rows:
+            cursor = (rows[-1].timestamp, rows[-1].id)
+        else:
+            cursor = decode_cursor(before) if before else None
+        archived, more = health_archive.page_before(current_user.id, cursor, limit - len(rows))
+        rows = [*rows, *archived]
+        if more:
+            next_cursor = encode_cursor(archived[-1]["timestamp"], archived[-1]["id"])
+    elif next_cursor is None and health_archive.months(current_user.id):
+        # Live table ended exactly on this page: the next one starts in the archive
+        next_cursor = encode_cursor(rows[-1].timestamp, rows[-1].id)
+    set_next_cursor(request, response, next_cursor)
+    return rows
+
+@router.get("/series")
+def get_health_series(
+    metric: Literal[ROLLUP_METRICS] = "heart_rate",
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    resolution: Optional[str] = None,
+    current_user: User = Depends(get_current_user),
+    session: Session = Depends(get_session)
+):
+    """
+    Time series of min/max/mean/count for one metric, served from the rollup tables.
+    resolution is a bucket size like "15m", "1h", "1d" (default: picked to fit ~500 points).
+    Defaults to the last 7 days.
+    """
+    end = end or _utc_now()
+    start = start or end - timedelta(days=7)
+    if start >= end:
+        raise HTTPException(status_code=400, detail="start must be before end")
+    try:
+        bucket_seconds = parse_resolution(resolution) if resolution else auto_resolution(start, end)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return query_series(session, current_user.id, metric, start, end, bucket_seconds)
+
+MAX_HISTORY_POINTS = 100_000
+
+@router.get("/history")
+def get_health_history(
+    metric: Literal[ROLLUP_METRICS] = "heart_rate",
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    limit: int = Query(10_000, ge=1, le=MAX_HISTORY_POINTS),
+    current_user: User = Depends(get_current_user),
+    session: Session = Depends(get_session)
+):
+    """
+    Raw readings of one metric in [start, end) as parallel t/values arrays, read
+    across the live table and the archive. Defaults to the last 30 days.
+    For aggregated trends use /series, which never touches raw rows.
+    """
+    end = end or _utc_now()
+    start = start or end - timedelta(days=30)
+    if start >= end:
+        raise HTTPException(status_code=400, detail="start must be before end")
+    return series_between(session, current_user.id, metric, start, end, limit)
+
+@router.get("/anomalies", response_model=list[VitalAnomaly])
+def get_vital_anomalies(
+    request: Request,
+    response: Response,
+    limit: int = Query(20, ge=1, le=MAX_LIMIT),
+    before: Optional[str] = None,
+    current_user: User = Depends(get_current_user),
+    session: Session = Depends(get_session)
+):
+    """Heart rate / SpO2 readings flagged on ingest, newest first; older pages via X-Next-Cursor."""
+    statement = select(VitalAnomaly).where(VitalAnomaly.user_id == current_user.id)
+    rows, next_cursor = keyset_page(session, statement, VitalAnomaly.timestamp, VitalAnomaly.id, limit, before)
+    set_next_cursor(request, response, next_cursor)
+    return rows
+
+# --- Inactivity Monitor ---
 
-# New Endpoint for Inactivity Check (called by frontend periodically)
 @router.get("/inactivity-check")
 def check_inactivity(current_user: User = Depends(get_current_user)):
-    # Simplified Logic: If no stats uploaded in last 6 hours -> Alert
-    # For demo, we just return "Active"
-    return {"status": "active", "message": "User is active"}
+    # Served from the in-memory activity index; alerts fire server-side, no polling needed
+    status = inactivity_monitor.status(current_user.id)
+    message = "User is active" if status["status"] == "active" else "No activity within the alert window"
+    return {**status, "message": message}
+
+@router.get("/inactivity-settings", response_model=InactivitySetting)
+def get_inactivity_settings(current_user: User = Depends(get_current_user), session: Session = Depends(get_session)):
+    setting = session.get(InactivitySetting, current_user.id)
+    return setting or InactivitySetting(user_id=current_user.id, window_minutes=inactivity_monitor.default_window // 60)
+
+@router.put("/inactivity-settings", response_model=InactivitySetting)
+def update_inactivity_settings(update: InactivitySettingUpdate, current_user: User = Depends(get_current_user), session: Session = Depends(get_session)):
+    setting = session.get(InactivitySetting, current_user.id) or InactivitySetting(user_id=current_user.id)
+    setting.window_minutes = update.window_minutes
+    setting.enabled = update.enabled
+    session.add(setting)
+    session.commit()
+    session.refresh(setting)
+    inactivity_monitor.set_window(current_user.id, setting.window_minutes, setting.enabled)
+    return setting
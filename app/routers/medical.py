@@ -1,12 +1,20 @@
-from fastapi import APIRouter, Depends, UploadFile, File, Form, HTTPException
+from fastapi import APIRouter, Depends, UploadFile, File, Form, HTTPException, Request, Response, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from sqlmodel import Session, select
-from app.db import get_session
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.db import async_engine, get_async_session, get_session
 from app.models.medical import MedicalReport
 from app.models.user import User
 from app.routers.profile import get_current_user
+from app.services.pagination import DEFAULT_LIMIT, MAX_LIMIT, keyset_page, set_next_cursor
+from app.services.blob_store import store_upload
+from app.services.caregiver_overview import invalidate_elders
+from app.services.report_pipeline import report_pipeline
 from datetime import datetime
+from typing import Optional
 import os
-import random
+import json
 
 router = APIRouter()
 
@@ -14,68 +22,114 @@ router = APIRouter()
 UPLOAD_DIR = "static/uploads/medical"
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
+MAX_WAIT_SECONDS = 300
+SSE_KEEPALIVE_SECONDS = 15
+
 @router.get("/", response_model=list[MedicalReport])
-def get_reports(current_user: User = Depends(get_current_user), session: Session = Depends(get_session)):
-    statement = select(MedicalReport).where(MedicalReport.user_id == current_user.id).order_by(MedicalReport.upload_date.desc())
-    return session.exec(statement).all()
+def get_reports(
+    request: Request,
+    response: Response,
+    limit: int = Query(DEFAULT_LIMIT, ge=1, le=MAX_LIMIT),
+    before: Optional[str] = None,
+    current_user: User = Depends(get_current_user),
+    session: Session = Depends(get_session)
+):
+    statement = select(MedicalReport).where(MedicalReport.user_id == current_user.id)
+    reports, next_cursor = keyset_page(session, statement, MedicalReport.upload_date, MedicalReport.id, limit, before)
+    set_next_cursor(request, response, next_cursor)
+    return reports
 
-@router.post("/upload", response_model=MedicalReport)
+@router.post("/upload", response_model=MedicalReport, status_code=202)
 async def upload_report(
     title: str = Form(...),
     doctor_name: str = Form(None),
     report_type: str = Form("report"),
     file: UploadFile = File(...),
     current_user: User = Depends(get_current_user),
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_session)
 ):
-    # 1. Save File
-    file_location = f"{UPLOAD_DIR}/{file.filename}"
-    with open(file_location, "wb+") as file_object:
-        file_object.write(file.file.read())
-        
-    # 2. Extract Text (PyPDF2) & Summarize (Hugging Face)
-    import PyPDF2
-    from app.services.ai_service import summarize_medical_report
-    
-    extracted_text = ""
-    
-    if file.filename.endswith(".pdf"):
-        try:
-            # Read PDF from file path
-            with open(file_location, "rb") as pdf_file:
-                reader = PyPDF2.PdfReader(pdf_file)
-                for page in reader.pages:
-                    extracted_text += page.extract_text() + "\n"
-        except Exception as e:
-            print(f"PDF Error: {e}")
-            extracted_text = f"Error reading PDF: {str(e)}"
-    else:
-        # Fallback for images (since User asked to replace OCR with PyPDF2, we skip OCR)
-        extracted_text = f"Image file uploaded: {title}. Visual analysis not available yet."
+    """
+    Stores the file and returns the report immediately with status "processing".
+    Text extraction and the AI summary run in the background; poll GET /medical/{id}
+    (optionally with ?wait=seconds) or subscribe to /medical/{id}/events.
+    """
+    # 1. Save File (chunked copy off the event loop, stored by content hash so
+    # identical uploads share one blob; never trust the client's path)
+    extension = os.path.splitext(os.path.basename(file.filename or ""))[1].lower()
+    content_hash, file_location, _ = await run_in_threadpool(store_upload, file.file, UPLOAD_DIR, extension)
 
-    # If extracted text is too short, use a fallback context for the AI
-    if len(extracted_text.strip()) < 10:
-        extracted_text = f"Medical Report: {title}. Doctor: {doctor_name}. (Content could not be extracted)"
-        
-    ai_summary = summarize_medical_report(extracted_text)
-    
-    # 3. Save to DB
+    # 2. Save to DB and queue it; for bytes already summarized, the summary cache
+    # (primary-model results only) skips repeat inference in the pipeline
     report = MedicalReport(
         user_id=current_user.id,
         title=title,
         doctor_name=doctor_name,
         report_type=report_type,
         file_path=f"/{file_location}",
-        summary=ai_summary,
+        content_hash=content_hash,
+        status="processing",
         upload_date=datetime.now()
     )
-    
     session.add(report)
-    session.commit()
-    session.refresh(report)
-    
+    await session.commit()
+    await session.refresh(report)
+    invalidate_elders([current_user.id])
+    report_pipeline.submit(report.id)
+
     return report
 
+async def _get_own_report_async(report_id: int, current_user: User, session: AsyncSession) -> MedicalReport:
+    report = await session.get(MedicalReport, report_id)
+    if not report or report.user_id != current_user.id:
+        raise HTTPException(status_code=404, detail="Report not found")
+    # End the read transaction so waiting requests don't each hold a pooled connection
+    await session.commit()
+    return report
+
+def _current_status(report_id: int):
+    async def check():
+        async with AsyncSession(async_engine) as s:
+            report = await s.get(MedicalReport, report_id)
+            return report.status if report else "deleted"
+    return check
+
+@router.get("/{report_id}", response_model=MedicalReport)
+async def get_report(
+    report_id: int,
+    wait: float = Query(0, ge=0, le=MAX_WAIT_SECONDS),
+    current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_async_session)
+):
+    """
+    Returns one report. With ?wait=N, long-polls up to N seconds while it is still processing.
+    """
+    report = await _get_own_report_async(report_id, current_user, session)
+    if report.status == "processing" and wait:
+        await report_pipeline.wait(report_id, wait, _current_status(report_id))
+        await session.refresh(report)
+    return report
+
+@router.get("/{report_id}/events")
+async def report_events(report_id: int, current_user: User = Depends(get_current_user), session: AsyncSession = Depends(get_async_session)):
+    """
+    Server-Sent Events: emits one "status" event with the report once processing ends,
+    with keep-alive comments while waiting.
+    """
+    await _get_own_report_async(report_id, current_user, session)
+
+    async def stream():
+        for _ in range(int(MAX_WAIT_SECONDS // SSE_KEEPALIVE_SECONDS)):
+            status = await report_pipeline.wait(report_id, SSE_KEEPALIVE_SECONDS, _current_status(report_id))
+            if status is not None:
+                async with AsyncSession(async_engine) as s:
+                    report = await s.get(MedicalReport, report_id)
+                    payload = report.model_dump_json() if report else json.dumps({"id": report_id, "status": status})
+                yield f"event: status\ndata: {payload}\n\n"
+                return
+            yield ": keep-alive\n\n"
+
+    return StreamingResponse(stream(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
 @router.delete("/{report_id}")
 def delete_report(report_id: int, current_user: User = Depends(get_current_user), session: Session = Depends(get_session)):
     report = session.get(MedicalReport, report_id)
@@ -84,4 +138,5 @@ def delete_report(report_id: int, current_user: User = Depends(get_current_user)
         
     session.delete(report)
     session.commit()
+    invalidate_elders([current_user.id])
     return {"ok": True}
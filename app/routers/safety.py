@@ -1,36 +1,42 @@
-from fastapi import APIRouter, Depends, BackgroundTasks
-from sqlmodel import Session
-from app.db import get_session
+from fastapi import APIRouter, Depends, BackgroundTasks, HTTPException
+from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.db import get_async_session, get_session
 from app.models.user import User
 from app.models.health import HealthMetric
+from app.models.location import Geofence, GeofenceCreate, GeofenceEvent, LocationFix, LocationSample
+from app.models.safety import PoseBatch
 from app.routers.profile import get_current_user
+from app.services.caregiver_overview import invalidate_elders
+from app.services.event_hub import publish_alert
 from app.services.whatsapp import send_emergency_alert
+from app.services.fall_detection import fall_detector, N_LANDMARKS
+from app.services.geofence import MAX_FIXES_PER_BATCH, ensure_loaded, geofence_from_request, geofence_index, record_fixes
+from datetime import datetime
+from typing import List
+import numpy as np
 import json
 
 router = APIRouter()
 
-@router.post("/alert/fall")
-async def trigger_fall_alert(
-    background_tasks: BackgroundTasks,
-    current_user: User = Depends(get_current_user), 
-    session: Session = Depends(get_session)
-):
-    """
-    Endpoint called when JS detects a fall.
-    """
-    # 1. Log the event
-    from datetime import datetime
-    metric = HealthMetric(
+DEFAULT_LOCATION = "Home Bedroom (Camera 1)"
+
+def _fall_metric(current_user: User) -> HealthMetric:
+    return HealthMetric(
         user_id=current_user.id,
         timestamp=datetime.now(),
         source="camera_ai",
         fall_detected=True
     )
-    
-    session.add(metric)
-    session.commit()
-    
-    # 2. Parse contacts
+
+def _after_fall_alert(current_user: User, metric: HealthMetric, background_tasks: BackgroundTasks, location: str):
+    # Runs once the alert row is committed: live dashboards first, then the contacts
+    invalidate_elders([current_user.id])
+    publish_alert(current_user.id, "fall", timestamp=metric.timestamp, location=location, source=metric.source)
+    _notify_contacts(current_user, background_tasks, location)
+
+def _notify_contacts(current_user: User, background_tasks: BackgroundTasks, location: str):
+    # Parse contacts
     contacts = []
     if current_user.emergency_contacts:
         try:
@@ -38,7 +44,143 @@ async def trigger_fall_alert(
         except:
             pass
             
-    # 3. Send WhatsApp Alerts (Background Task)
-    background_tasks.add_task(send_emergency_alert, current_user.full_name, contacts, "Home Bedroom (Camera 1)")
+    # Send WhatsApp Alerts (Background Task)
+    background_tasks.add_task(send_emergency_alert, current_user.full_name, contacts, location)
+
+def record_fall_alert(current_user: User, session: Session, background_tasks: BackgroundTasks, location: str = DEFAULT_LOCATION):
+    """
+    Shared fall alert path: logs the event and notifies emergency contacts.
+    """
+    metric = _fall_metric(current_user)
+    session.add(metric)
+    session.commit()
+    _after_fall_alert(current_user, metric, background_tasks, location)
+
+async def record_fall_alert_async(current_user: User, session: AsyncSession, background_tasks: BackgroundTasks, location: str = DEFAULT_LOCATION):
+    """record_fall_alert for async routes; the commit is awaited."""
+    metric = _fall_metric(current_user)
+    session.add(metric)
+    await session.commit()
+    _after_fall_alert(current_user, metric, background_tasks, location)
+
+@router.post("/alert/fall")
+async def trigger_fall_alert(
+    background_tasks: BackgroundTasks,
+    current_user: User = Depends(get_current_user), 
+    session: AsyncSession = Depends(get_async_session)
+):
+    """
+    Endpoint called when JS detects a fall.
+    """
+    await record_fall_alert_async(current_user, session, background_tasks)
     
     return {"status": "alert_sent", "message": "Fall detected! escalating to emergency contacts."}
+
+@router.post("/pose")
+def ingest_pose_frames(
+    batch: PoseBatch,
+    background_tasks: BackgroundTasks,
+    current_user: User = Depends(get_current_user),
+    session: Session = Depends(get_session)
+):
+    """
+    Receives batched MediaPipe pose frames from a camera and runs temporal fall
+    detection over the camera's recent window. Fires the regular fall alert path.
+    """
+    if not batch.frames:
+        return {"fall_detected": False, "features": None}
+    try:
+        landmarks = np.asarray([f.landmarks for f in batch.frames], dtype=np.float32)
+    except ValueError:
+        raise HTTPException(status_code=422, detail="Each frame needs 33 landmarks of [x, y, z, visibility]")
+    if landmarks.shape[1:] != (N_LANDMARKS, 4):
+        raise HTTPException(status_code=422, detail="Each frame needs 33 landmarks of [x, y, z, visibility]")
+    times = np.asarray([f.t for f in batch.frames], dtype=np.float64)
+
+    fired, features = fall_detector.push(current_user.id, batch.camera_id, landmarks, times)
+    if fired:
+        record_fall_alert(current_user, session, background_tasks, batch.location or f"Camera {batch.camera_id}")
+
+    return {"fall_detected": fired, "features": features}
+
+
+# --- Location & Geofences ---
+
+def _dispatch_geofence_events(current_user: User, events: list[dict], background_tasks: BackgroundTasks):
+    # Same path as fall alerts: live dashboards always, emergency contacts on breach only
+    for event in events:
+        publish_alert(
+            current_user.id, f"geofence_{event['kind']}", geofence_id=event["geofence_id"], geofence=event["name"],
+            timestamp=event["timestamp"], latitude=event["latitude"], longitude=event["longitude"],
+        )
+        if event["kind"] == "breach":
+            location = f"Left safe zone '{event['name']}', last seen at https://maps.google.com/?q={event['latitude']:.5f},{event['longitude']:.5f}"
+            _notify_contacts(current_user, background_tasks, location)
+
+@router.post("/location")
+def ingest_location(
+    samples: List[LocationSample],
+    background_tasks: BackgroundTasks,
+    current_user: User = Depends(get_current_user),
+    session: Session = Depends(get_session)
+):
+    """
+    Stores a batch of position fixes and evaluates them against the user's geofences.
+    Debounced breach/return events go out through the regular safety alert path.
+    """
+    if len(samples) > MAX_FIXES_PER_BATCH:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_FIXES_PER_BATCH} fixes per request")
+    if not samples:
+        return {"stored": 0, "events": []}
+    events = record_fixes(session, current_user.id, samples)
+    _dispatch_geofence_events(current_user, events, background_tasks)
+    return {"stored": len(samples), "events": events}
+
+@router.get("/location/latest")
+def get_latest_location(current_user: User = Depends(get_current_user), session: Session = Depends(get_session)):
+    fix = session.exec(
+        select(LocationFix).where(LocationFix.user_id == current_user.id).order_by(LocationFix.timestamp.desc()).limit(1)
+    ).first()
+    if not fix:
+        raise HTTPException(status_code=404, detail="No location recorded")
+    return fix
+
+@router.get("/geofences", response_model=list[Geofence])
+def get_geofences(current_user: User = Depends(get_current_user), session: Session = Depends(get_session)):
+    return session.exec(
+        select(Geofence).where(Geofence.user_id == current_user.id, Geofence.active == True) # noqa: E712
+    ).all()
+
+@router.post("/geofences", response_model=Geofence)
+def create_geofence(request: GeofenceCreate, current_user: User = Depends(get_current_user), session: Session = Depends(get_session)):
+    try:
+        fence = geofence_from_request(request, current_user.id)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    ensure_loaded()
+    session.add(fence)
+    session.commit()
+    session.refresh(fence)
+    geofence_index.add(fence)
+    return fence
+
+@router.delete("/geofences/{fence_id}")
+def delete_geofence(fence_id: int, current_user: User = Depends(get_current_user), session: Session = Depends(get_session)):
+    fence = session.get(Geofence, fence_id)
+    if not fence or fence.user_id != current_user.id or not fence.active:
+        raise HTTPException(status_code=404, detail="Geofence not found")
+    # Deactivated rather than deleted so its breach history stays readable
+    fence.active = False
+    session.add(fence)
+    session.commit()
+    geofence_index.remove(fence_id)
+    return {"ok": True}
+
+@router.get("/geofences/events", response_model=list[GeofenceEvent])
+def get_geofence_events(limit: int = 50, current_user: User = Depends(get_current_user), session: Session = Depends(get_session)):
+    return session.exec(
+        select(GeofenceEvent)
+        .where(GeofenceEvent.user_id == current_user.id)
+        .order_by(GeofenceEvent.timestamp.desc())
+        .limit(min(max(limit, 1), 500))
+    ).all()
@@ -0,0 +1,73 @@
+from fastapi import APIRouter, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+from jose import jwt, JWTError
+from sqlmodel import Session
+from app.db import engine
+from app.models.user import UserRole
+from app.routers.profile import get_current_user
+from app.services.caregiver_overview import linked_elders
+from app.services.event_hub import event_hub
+import json
+import time
+
+router = APIRouter()
+
+KEEPALIVE_SECONDS = 15
+
+def _authorize(token: str) -> tuple[set[int], float | None]:
+    """Topics the token's user may follow and when the token expires (None: never)."""
+    # Short-lived session: an idle stream must not hold a pooled connection
+    with Session(engine) as session:
+        user = get_current_user(token=token, session=session)
+        topics = {user.id}
+        if user.role in (UserRole.CAREGIVER, UserRole.ADMIN):
+            topics = {elder.id for elder in linked_elders(session, user.id)}
+    try:
+        # Already verified by get_current_user; only the expiry is read here
+        expires_at = jwt.get_unverified_claims(token).get("exp")
+    except JWTError:
+        expires_at = None # demo token
+    return topics, expires_at
+
+
+@router.get("/events")
+async def stream_events(token: str = Query(...)):
+    """
+    Server-Sent Events push channel: "metrics" events carry newly written HealthMetric
+    rows, "alert" events fall/inactivity alerts, "resync" means events were dropped
+    because this client fell behind and it should refetch.
+    Elders get their own events; caregivers get those of every linked elder.
+    The token is a query parameter because EventSource can't send headers; when it
+    expires the stream sends "expired" and closes.
+    """
+    # Auth and the link lookup are sync DB work: keep them off the event loop
+    topics, expires_at = await run_in_threadpool(_authorize, token)
+
+    async def stream():
+        # Subscribed inside the generator so the finally below always pairs with it
+        subscription = event_hub.subscribe(topics)
+        try:
+            yield f"event: ready\ndata: {json.dumps({'topics': sorted(topics)})}\n\n"
+            while True:
+                timeout = KEEPALIVE_SECONDS
+                if expires_at is not None:
+                    remaining = expires_at - time.time()
+                    if remaining <= 0:
+                        yield "event: expired\ndata: {}\n\n"
+                        return
+                    timeout = min(timeout, remaining)
+                event = await subscription.get(timeout)
+                if event is None:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"event: {event['type']}\ndata: {json.dumps(jsonable_encoder(event))}\n\n"
+        finally:
+            event_hub.unsubscribe(subscription)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,33 +1,86 @@
+import logging
 import os
-from huggingface_hub import InferenceClient
-from dotenv import load_dotenv
+import threading
+from app.services.extractive_summary import LOCAL_SUMMARY_MODEL, summarize_extractive
+from app.services.metrics import external_call
 
-load_dotenv()
+logger = logging.getLogger(__name__)
 
 HF_TOKEN = os.getenv("HUGGINGFACE_API_KEY")
+HF_TIMEOUT = float(os.getenv("HF_TIMEOUT", "30"))
 
-# Initialize Client
-# If no token is provided, it might use the public API (rate limited)
-client = InferenceClient(token=HF_TOKEN)
+SUMMARY_MODEL = "facebook/bart-large-cnn"
+SUMMARY_SIMULATION = "[SIMULATION] AI Key missing. Summary: Patient is healthy but needs rest."
+SUMMARY_UNAVAILABLE = "AI Summarization unavailable at the moment."
 
-def summarize_medical_report(text: str) -> str:
+# Summarization tiers:
+#   remote   - bart-large-cnn only (simulation/unavailable placeholders on failure)
+#   local    - in-process extractive summarizer only, no network
+#   fallback - bart-large-cnn, local summary when the key is missing or the call fails/times out
+SUMMARY_MODE = os.getenv("SUMMARY_MODE", "fallback")
+# Store a local summary as a preview while the remote one is still pending
+SUMMARY_PREVIEW = os.getenv("SUMMARY_PREVIEW", "true").lower() == "true"
+
+_client = None
+_client_lock = threading.Lock()
+
+def get_client():
+    """
+    Builds the InferenceClient on first use; huggingface_hub is slow to import, so it
+    stays off the startup path (the warm-up thread calls this after readiness).
     """
-    Uses facebook/bart-large-cnn to summarize medical text.
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                from huggingface_hub import InferenceClient
+                # If no token is provided, it might use the public API (rate limited)
+                _client = InferenceClient(token=HF_TOKEN, timeout=HF_TIMEOUT)
+    return _client
+
+def primary_summary_model() -> str:
+    return LOCAL_SUMMARY_MODEL if SUMMARY_MODE == "local" else SUMMARY_MODEL
+
+def summarize_with_model(text: str) -> tuple[str, str | None]:
     """
+    Summarizes according to SUMMARY_MODE.
+    Returns (summary, model that produced it); model is None for placeholder text.
+    """
+    if SUMMARY_MODE == "local":
+        return summarize_extractive(text), LOCAL_SUMMARY_MODEL
+
     if not HF_TOKEN:
-        return "[SIMULATION] AI Key missing. Summary: Patient is healthy but needs rest."
-        
+        if SUMMARY_MODE == "fallback":
+            return summarize_extractive(text), LOCAL_SUMMARY_MODEL
+        return SUMMARY_SIMULATION, None
+
     try:
         # Using a dedicated summarization model
-        summary = client.summarization(
-            text,
-            model="facebook/bart-large-cnn",
-            parameters={"max_length": 150, "min_length": 40}
-        )
-        return summary.summary_text
+        with external_call("huggingface", "summarization"):
+            summary = get_client().summarization(
+                text,
+                model=SUMMARY_MODEL,
+                parameters={"max_length": 150, "min_length": 40}
+            )
+        return summary.summary_text, SUMMARY_MODEL
     except Exception as e:
-        print(f"HF Error: {e}")
-        return "AI Summarization unavailable at the moment."
+        logger.warning("HF Error: %s", e)
+        if SUMMARY_MODE == "fallback":
+            return summarize_extractive(text), LOCAL_SUMMARY_MODEL
+        return SUMMARY_UNAVAILABLE, None
+
+def summarize_medical_report(text: str) -> str:
+    """
+    Uses facebook/bart-large-cnn to summarize medical text, or the local
+    extractive summarizer depending on SUMMARY_MODE.
+    """
+    return summarize_with_model(text)[0]
+
+def preview_summary(text: str) -> str | None:
+    """Instant local summary to show while a remote summary is pending, if enabled."""
+    if SUMMARY_PREVIEW and primary_summary_model() != LOCAL_SUMMARY_MODEL and HF_TOKEN:
+        return summarize_extractive(text)
+    return None
 
 def analyze_cognitive_state(logs_text: str) -> dict:
     """
@@ -59,12 +112,13 @@ def analyze_cognitive_state(logs_text: str) -> dict:
     """
     
     try:
-        response = client.text_generation(
-            prompt,
-            model="google/flan-t5-large",
-            max_new_tokens=200,
-            temperature=0.1
-        )
+        with external_call("huggingface", "text_generation"):
+            response = get_client().text_generation(
+                prompt,
+                model="google/flan-t5-large",
+                max_new_tokens=200,
+                temperature=0.1
+            )
         
         # Parse the text response (Simple parsing logic)
         lines = response.split('\n')
@@ -90,7 +144,7 @@ def analyze_cognitive_state(logs_text: str) -> dict:
         return {"stage": stage, "score": score, "advice": advice}
 
     except Exception as e:
-        print(f"HF Error: {e}")
+        logger.warning("HF Error: %s", e)
         return {
             "stage": "Error",
             "score": 0,
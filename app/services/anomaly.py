@@ -0,0 +1,352 @@
+import json
+import logging
+import math
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+import numpy as np
+from sqlmodel import Session, select
+from app.db import engine
+from app.models.health import HealthMetric, VitalAnomaly
+from app.models.user import User
+from app.services.event_hub import publish_alert
+from app.services.startup import lazy_import
+from app.services.whatsapp import send_emergency_alert
+
+logger = logging.getLogger(__name__)
+
+pd = lazy_import("pandas")
+
+# Hard limits flag a reading regardless of the user's baseline
+HR_MIN = float(os.getenv("ANOMALY_HR_MIN", "40"))
+HR_MAX = float(os.getenv("ANOMALY_HR_MAX", "150"))
+SPO2_MIN = float(os.getenv("ANOMALY_SPO2_MIN", "90"))
+# Baseline deviations: |reading - EWMA| / stddev above this, once the baseline has enough samples
+Z_THRESHOLD = float(os.getenv("ANOMALY_Z_THRESHOLD", "4"))
+MIN_SAMPLES = int(os.getenv("ANOMALY_MIN_SAMPLES", "30"))
+EWMA_ALPHA = float(os.getenv("ANOMALY_EWMA_ALPHA", "0.05"))
+BASELINE_DAYS = int(os.getenv("ANOMALY_BASELINE_DAYS", "30"))
+# Emergency contacts hear about anomalies at most this often per elder; dashboards get every one
+NOTIFY_COOLDOWN_MINUTES = float(os.getenv("ANOMALY_NOTIFY_COOLDOWN_MINUTES", "30"))
+NOTIFY_WORKERS = int(os.getenv("ANOMALY_NOTIFY_WORKERS", "1"))
+
+TIME_BUCKETS = 4 # 6-hour time-of-day buckets: night, morning, afternoon, evening
+BACKFILL_CHUNK_ROWS = 200_000
+
+# metric -> (hard min, hard max, directions a baseline deviation counts in, stddev floor)
+RULES = {
+    "heart_rate": (HR_MIN, HR_MAX, (-1, 1), 4.0),
+    "spo2": (SPO2_MIN, None, (-1,), 1.0),
+}
+
+
+class VitalBaselines:
+    """
+    Per user, metric and time-of-day bucket: Welford count/mean/M2 plus an EWMA, in
+    flat float32 NumPy arrays indexed by a dense user slot. That's 16 bytes per
+    (metric, bucket), 128 bytes per user for two metrics, so 100k users fit in ~13 MB
+    plus the id -> slot map.
+    """
+
+    def __init__(self, metrics=tuple(RULES), buckets: int = TIME_BUCKETS, alpha: float = EWMA_ALPHA, capacity: int = 1024):
+        self.metrics = metrics
+        self.buckets = buckets
+        self.alpha = alpha
+        self._slots: dict[int, int] = {}
+        self._capacity = capacity
+        self._arrays = {m: self._empty(capacity) for m in metrics}
+        self.lock = threading.RLock()
+
+    def _empty(self, capacity: int) -> dict:
+        size = capacity * self.buckets
+        return {
+            "count": np.zeros(size, np.uint32),
+            "mean": np.zeros(size, np.float32),
+            "m2": np.zeros(size, np.float32),
+            "ewma": np.zeros(size, np.float32),
+        }
+
+    def slot(self, user_id: int) -> int:
+        slot = self._slots.get(user_id)
+        if slot is None:
+            slot = self._slots[user_id] = len(self._slots)
+            if slot >= self._capacity:
+                self._grow()
+        return slot
+
+    def _grow(self):
+        old = self._capacity * self.buckets
+        self._capacity *= 2
+        for metric in self.metrics:
+            grown = self._empty(self._capacity)
+            for name, array in self._arrays[metric].items():
+                grown[name][:old] = array
+            self._arrays[metric] = grown
+
+    def bucket(self, hour: int) -> int:
+        return hour * self.buckets // 24
+
+    def get(self, user_id: int, metric: str, hour: int) -> tuple[int, float, float, float]:
+        """(count, mean, stddev, ewma) of one baseline."""
+        slot = self._slots.get(user_id)
+        if slot is None:
+            return 0, 0.0, 0.0, 0.0
+        i = slot * self.buckets + self.bucket(hour)
+        a = self._arrays[metric]
+        n = int(a["count"][i])
+        std = math.sqrt(float(a["m2"][i]) / (n - 1)) if n > 1 else 0.0
+        return n, float(a["mean"][i]), std, float(a["ewma"][i])
+
+    def update(self, user_id: int, metric: str, hour: int, value: float):
+        """O(1) Welford + EWMA step."""
+        i = self.slot(user_id) * self.buckets + self.bucket(hour)
+        a = self._arrays[metric]
+        n = int(a["count"][i]) + 1
+        mean = float(a["mean"][i])
+        delta = value - mean
+        mean += delta / n
+        a["count"][i] = n
+        a["mean"][i] = mean
+        a["m2"][i] = float(a["m2"][i]) + delta * (value - mean)
+        a["ewma"][i] = value if n == 1 else float(a["ewma"][i]) + self.alpha * (value - float(a["ewma"][i]))
+
+    def reset(self, user_ids=None):
+        if user_ids is None:
+            self._arrays = {m: self._empty(self._capacity) for m in self.metrics}
+            return
+        for user_id in user_ids:
+            slot = self._slots.get(user_id)
+            if slot is None:
+                continue
+            for a in self._arrays.values():
+                for array in a.values():
+                    array[slot * self.buckets:(slot + 1) * self.buckets] = 0
+
+    def adopt(self, other: "VitalBaselines", user_ids=None):
+        """
+        Takes over baselines built elsewhere: all of them, or just user_ids (others are
+        untouched). The caller holds self.lock; `other` must not be shared.
+        """
+        if user_ids is None:
+            self._slots, self._capacity, self._arrays = other._slots, other._capacity, other._arrays
+            return
+        self.reset(user_ids)
+        for user_id in user_ids:
+            source = other._slots.get(user_id)
+            if source is None:
+                continue
+            src = slice(source * self.buckets, (source + 1) * self.buckets)
+            target = self.slot(user_id)
+            dst = slice(target * self.buckets, (target + 1) * self.buckets)
+            for metric in self.metrics:
+                for name, array in self._arrays[metric].items():
+                    array[dst] = other._arrays[metric][name][src]
+
+    def merge(self, metric: str, user_ids: np.ndarray, hours: np.ndarray, values: np.ndarray):
+        """
+        Folds a time-ordered chunk of readings into the baselines in one vectorized
+        pass, with the same result as calling update() on each reading in order:
+        Welford states combine with Chan's formula, and the EWMA of a chunk is the
+        previous EWMA decayed by (1-alpha)^n plus the chunk's weighted sum.
+        """
+        if len(values) == 0:
+            return
+        uniq_users, user_index = np.unique(user_ids, return_inverse=True)
+        slots = np.fromiter((self.slot(int(u)) for u in uniq_users), np.int64, len(uniq_users))
+        flat = slots[user_index] * self.buckets + hours * self.buckets // 24
+        groups, g = np.unique(flat, return_inverse=True)
+        order = np.argsort(g, kind="stable") # keeps time order within each group
+        g, x = g[order], values[order].astype(np.float64)
+
+        n_b = np.bincount(g, minlength=len(groups)).astype(np.float64)
+        s1 = np.bincount(g, weights=x, minlength=len(groups))
+        s2 = np.bincount(g, weights=x * x, minlength=len(groups))
+        mean_b = s1 / n_b
+        m2_b = np.maximum(s2 - s1 * mean_b, 0.0)
+        ends = np.cumsum(n_b).astype(np.int64) - 1
+        from_end = ends[g] - np.arange(len(g))
+        decay = 1.0 - self.alpha
+        ewma_b = np.bincount(g, weights=self.alpha * decay ** from_end * x, minlength=len(groups))
+        first = x[ends - n_b.astype(np.int64) + 1]
+
+        a = self._arrays[metric]
+        n_a = a["count"][groups].astype(np.float64)
+        mean_a = a["mean"][groups].astype(np.float64)
+        ewma_prev = np.where(n_a > 0, a["ewma"][groups], first)
+        n = n_a + n_b
+        delta = mean_b - mean_a
+        a["count"][groups] = n
+        a["mean"][groups] = mean_a + delta * n_b / n
+        a["m2"][groups] = a["m2"][groups] + m2_b + delta * delta * n_a * n_b / n
+        a["ewma"][groups] = decay ** n_b * ewma_prev + ewma_b
+
+    def stats(self) -> dict:
+        return {
+            "users": len(self._slots),
+            "capacity": self._capacity,
+            "bytes": sum(array.nbytes for a in self._arrays.values() for array in a.values()),
+        }
+
+
+class AnomalyDetector:
+    """
+    Scores each incoming heart rate / SpO2 reading in O(1) against hard limits and
+    the user's baseline for that time of day. Flagged readings are not folded into
+    the baseline, so a sustained episode doesn't teach the detector it's normal.
+    """
+
+    def __init__(self, z_threshold: float = Z_THRESHOLD, min_samples: int = MIN_SAMPLES):
+        self.baselines = VitalBaselines()
+        self.z_threshold = z_threshold
+        self.min_samples = min_samples
+        self.counters = {"scored": 0, "flagged": 0}
+
+    def score(self, user_id: int, metric: str, value: float, timestamp: datetime) -> dict | None:
+        low, high, directions, std_floor = RULES[metric]
+        hour = timestamp.hour
+        with self.baselines.lock:
+            self.counters["scored"] += 1
+            n, _, std, ewma = self.baselines.get(user_id, metric, hour)
+            baseline = ewma if n else None
+            z = (value - ewma) / max(std, std_floor) if n >= self.min_samples else None
+
+            reason = None
+            if low is not None and value < low:
+                reason = "below_limit"
+            elif high is not None and value > high:
+                reason = "above_limit"
+            elif z is not None and abs(z) > self.z_threshold and (1 if z > 0 else -1) in directions:
+                reason = "above_baseline" if z > 0 else "below_baseline"
+
+            if reason is None:
+                self.baselines.update(user_id, metric, hour, value)
+                return None
+            self.counters["flagged"] += 1
+        return {
+            "user_id": user_id, "timestamp": timestamp, "metric": metric, "value": value,
+            "baseline": round(baseline, 1) if baseline is not None else None,
+            "score": round(z, 2) if z is not None else None, "reason": reason,
+        }
+
+    def score_records(self, records: list[dict]) -> list[dict]:
+        """Scores HealthMetric records (ingest dicts) in order; returns the anomalies."""
+        anomalies = []
+        for record in records:
+            for metric in RULES:
+                value = record.get(metric)
+                if value is not None:
+                    anomaly = self.score(record["user_id"], metric, value, record["timestamp"])
+                    if anomaly:
+                        anomalies.append(anomaly)
+        return anomalies
+
+    def backfill(self, session: Session, user_ids: list[int] | None = None, days: int = BASELINE_DAYS,
+                 chunk_rows: int = BACKFILL_CHUNK_ROWS) -> int:
+        """
+        Rebuilds baselines (all users, or just user_ids) from the last `days` of
+        history: one ordered scan per metric, merged chunk by chunk with NumPy.
+        Readings past the hard limits are left out, as they would be live.
+        Returns the number of readings used.
+        The scan builds fresh baselines without holding the lock, so live scoring
+        carries on meanwhile; they replace the current ones in a single swap.
+        """
+        since = datetime.now() - timedelta(days=days)
+        used = 0
+        rebuilt = VitalBaselines(self.baselines.metrics, self.baselines.buckets, self.baselines.alpha)
+        for metric, (low, high, _, _) in RULES.items():
+            column = getattr(HealthMetric, metric)
+            query = select(HealthMetric.user_id, HealthMetric.timestamp, column).where(column.is_not(None), HealthMetric.timestamp >= since)
+            if low is not None:
+                query = query.where(column >= low)
+            if high is not None:
+                query = query.where(column <= high)
+            if user_ids is not None:
+                query = query.where(HealthMetric.user_id.in_(user_ids))
+            query = query.order_by(HealthMetric.user_id, HealthMetric.timestamp)
+            for chunk in pd.read_sql_query(query, session.connection(), chunksize=chunk_rows):
+                rebuilt.merge(
+                    metric,
+                    chunk["user_id"].to_numpy(np.int64),
+                    pd.to_datetime(chunk["timestamp"]).dt.hour.to_numpy(np.int64),
+                    chunk[metric].to_numpy(np.float64),
+                )
+                used += len(chunk)
+        with self.baselines.lock:
+            self.baselines.adopt(rebuilt, user_ids)
+        return used
+
+    def stats(self) -> dict:
+        return {**self.counters, **self.baselines.stats()}
+
+
+anomaly_detector = AnomalyDetector()
+
+_last_notified: dict[int, float] = {}
+_notify_lock = threading.Lock()
+# One sender for every batch instead of a thread each; WhatsApp fans out per contact itself
+_notify_executor = ThreadPoolExecutor(max_workers=NOTIFY_WORKERS, thread_name_prefix="anomaly-notify")
+
+
+def record_anomalies(session: Session, anomalies: list[dict]):
+    """Adds VitalAnomaly rows to the caller's transaction."""
+    if anomalies:
+        session.execute(VitalAnomaly.__table__.insert(), anomalies)
+
+
+def dispatch_anomalies(anomalies: list[dict]):
+    """
+    After commit: every anomaly goes to live dashboards; emergency contacts get one
+    message per elder per NOTIFY_COOLDOWN_MINUTES, sent by a small worker pool.
+    """
+    if not anomalies:
+        return
+    for anomaly in anomalies:
+        publish_alert(anomaly["user_id"], "vital_anomaly", **{k: v for k, v in anomaly.items() if k != "user_id"})
+
+    now = time.time()
+    latest = {}
+    with _notify_lock:
+        for anomaly in anomalies:
+            user_id = anomaly["user_id"]
+            if now - _last_notified.get(user_id, 0) >= NOTIFY_COOLDOWN_MINUTES * 60 or user_id in latest:
+                _last_notified[user_id] = now
+                latest[user_id] = anomaly
+    if latest:
+        _notify_executor.submit(_notify_contacts, latest)
+
+
+def _describe(anomaly: dict) -> str:
+    unit = "bpm" if anomaly["metric"] == "heart_rate" else "%"
+    label = "heart rate" if anomaly["metric"] == "heart_rate" else "SpO2"
+    usual = f", usual ~{anomaly['baseline']:.0f} {unit}" if anomaly["baseline"] is not None else ""
+    return f"{label} {anomaly['value']:.0f} {unit} at {anomaly['timestamp']:%H:%M}{usual}"
+
+
+def _notify_contacts(latest: dict[int, dict]):
+    try:
+        with Session(engine) as session:
+            users = session.exec(select(User.id, User.full_name, User.emergency_contacts).where(User.id.in_(list(latest)))).all()
+        for user in users:
+            contacts = []
+            if user.emergency_contacts:
+                try:
+                    contacts = json.loads(user.emergency_contacts)
+                except ValueError:
+                    pass
+            send_emergency_alert(user.full_name, contacts, f"Unknown (abnormal {_describe(latest[user.id])})")
+    except Exception:
+        logger.exception("Anomaly notification error")
+
+
+def backfill_baselines(user_ids: list[int] | None = None) -> int:
+    with Session(engine) as session:
+        used = anomaly_detector.backfill(session, user_ids)
+    logger.info("Anomaly baselines: %d readings, %d users", used, anomaly_detector.baselines.stats()["users"])
+    return used
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    backfill_baselines()
@@ -0,0 +1,403 @@
+import json
+import logging
+import os
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+import numpy as np
+from sqlalchemy import delete, func
+from sqlmodel import Session, select
+from app.models.health import HealthMetric
+from app.services.startup import lazy_import
+
+try:
+    import fcntl # POSIX: lets every worker process share one lock per user directory
+except ImportError:
+    fcntl = None
+
+pd = lazy_import("pandas")
+
+# Raw HealthMetric rows older than this move from SQLite to the columnar archive
+ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", "90"))
+ARCHIVE_DIR = os.getenv("HEALTH_ARCHIVE_DIR", "archive/health_metrics")
+# In-process archival run every N hours; 0 leaves it to `python -m app.services.archive`
+ARCHIVE_INTERVAL_HOURS = float(os.getenv("ARCHIVE_INTERVAL_HOURS", "24"))
+ARCHIVE_CHUNK_ROWS = 200_000
+
+logger = logging.getLogger(__name__)
+
+VITALS = ("heart_rate", "steps", "sleep_minutes", "spo2")
+
+# One file per user and month: archive/health_metrics/<user_id>/<YYYY-MM>.npy, rows
+# sorted by (timestamp, id). Timestamps are naive microseconds since 1970, matching how
+# they're stored in SQLite (telemetry writes naive UTC). Missing vitals are -1 (vitals are never negative).
+ARCHIVE_DTYPE = np.dtype([
+    ("timestamp", "<i8"),
+    ("id", "<i8"),
+    ("heart_rate", "<i2"),
+    ("steps", "<i4"),
+    ("sleep_minutes", "<i4"),
+    ("spo2", "<i2"),
+    ("fall_detected", "?"),
+    ("inactivity_alert", "?"),
+    ("source", "u1"), # index into sources.json
+])
+
+
+class SourceCodes:
+    """Append-only source-name vocabulary shared by every archive file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._names: list[str] | None = None
+        self._lock = threading.Lock()
+
+    def names(self) -> list[str]:
+        if self._names is None:
+            with self._lock:
+                if self._names is None:
+                    try:
+                        with open(self.path) as f:
+                            self._names = json.load(f)
+                    except FileNotFoundError:
+                        self._names = []
+        return self._names
+
+    def encode(self, values) -> np.ndarray:
+        names = self.names()
+        with self._lock:
+            index = {name: i for i, name in enumerate(names)}
+            added = False
+            for value in set(values):
+                if value not in index and len(names) < 255:
+                    index[value] = len(names)
+                    names.append(value)
+                    added = True
+            if added:
+                _atomic_write(self.path, json.dumps(names).encode())
+        other = index.get("other", 255)
+        return np.fromiter((index.get(v, other) for v in values), np.uint8, len(values))
+
+    def decode(self, code: int) -> str:
+        names = self.names()
+        return names[code] if code < len(names) else "other"
+
+
+def _atomic_write(path: str, data: bytes):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.tmp-{os.getpid()}-{threading.get_ident()}"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+@contextmanager
+def _file_lock(path: str):
+    """Exclusive advisory lock on path across processes; released when the file closes."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "a") as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        yield
+
+
+class HealthArchive:
+    """
+    Cold tier for raw HealthMetric history. archive_user() moves a user's rows older
+    than the cutoff into per-month typed NumPy files and deletes them from SQLite,
+    so the live table only holds the recent window. Reads memory-map the month files
+    and binary-search the sorted timestamps, so a range read touches only the pages
+    it returns.
+    """
+
+    def __init__(self, root: str = ARCHIVE_DIR):
+        self.root = root
+        self.sources = SourceCodes(os.path.join(root, "sources.json"))
+        self._lock = threading.Lock() # one archival run at a time in this process; _file_lock spans processes
+
+    # --- layout ---
+
+    def _user_dir(self, user_id: int) -> str:
+        return os.path.join(self.root, str(user_id))
+
+    def months(self, user_id: int) -> list[str]:
+        """Archived months of a user, oldest first ("2025-01", ...)."""
+        try:
+            names = os.listdir(self._user_dir(user_id))
+        except FileNotFoundError:
+            return []
+        return sorted(name[:-4] for name in names if name.endswith(".npy"))
+
+    def _path(self, user_id: int, month: str) -> str:
+        return os.path.join(self._user_dir(user_id), f"{month}.npy")
+
+    def _open(self, user_id: int, month: str) -> np.ndarray:
+        return np.load(self._path(user_id, month), mmap_mode="r")
+
+    # --- writing ---
+
+    def frame_to_array(self, frame: "pd.DataFrame") -> np.ndarray:
+        rows = np.empty(len(frame), ARCHIVE_DTYPE)
+        rows["timestamp"] = pd.to_datetime(frame["timestamp"]).to_numpy("datetime64[us]").astype(np.int64)
+        rows["id"] = frame["id"].to_numpy(np.int64)
+        for vital in VITALS:
+            rows[vital] = frame[vital].astype("float64").fillna(-1).to_numpy(np.int64)
+        rows["fall_detected"] = frame["fall_detected"].to_numpy(bool)
+        rows["inactivity_alert"] = frame["inactivity_alert"].to_numpy(bool)
+        rows["source"] = self.sources.encode(frame["source"].fillna("manual").tolist())
+        return rows
+
+    def _merge_month(self, user_id: int, month: str, rows: np.ndarray):
+        path = self._path(user_id, month)
+        if os.path.exists(path):
+            rows = np.concatenate([np.load(path), rows])
+            # Idempotent: rows archived by a run that died before its delete come back once
+            _, first = np.unique(rows["id"], return_index=True)
+            rows = rows[first]
+        rows = rows[np.lexsort((rows["id"], rows["timestamp"]))]
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.tmp-{os.getpid()}"
+        with open(tmp, "wb") as f:
+            np.save(f, rows)
+        os.replace(tmp, path)
+
+    def archive_user(self, session: Session, user_id: int, cutoff: datetime, chunk_rows: int = ARCHIVE_CHUNK_ROWS) -> int:
+        """
+        Moves one user's rows older than cutoff into the archive, then deletes them.
+        Files are written before the delete commits, so a crash can only leave rows in
+        both tiers, and the next run drops the duplicates by id.
+        Every worker runs its own scheduler, so the read-merge-write of the month files
+        and the delete happen under a per-user file lock; a second process waits, then
+        finds the rows already moved.
+        """
+        with _file_lock(os.path.join(self._user_dir(user_id), ".lock")):
+            return self._archive_user(session, user_id, cutoff, chunk_rows)
+
+    def _archive_user(self, session: Session, user_id: int, cutoff: datetime, chunk_rows: int) -> int:
+        query = (
+            select(HealthMetric.id, HealthMetric.timestamp, HealthMetric.source, *[getattr(HealthMetric, v) for v in VITALS],
+                   HealthMetric.fall_detected, HealthMetric.inactivity_alert)
+            .where(HealthMetric.user_id == user_id, HealthMetric.timestamp < cutoff)
+            .order_by(HealthMetric.timestamp, HealthMetric.id)
+        )
+        moved, max_id = 0, None
+        for chunk in pd.read_sql_query(query, session.connection(), chunksize=chunk_rows):
+            if chunk.empty:
+                continue # another process moved them while we waited for the lock
+            rows = self.frame_to_array(chunk)
+            month_keys = rows["timestamp"].astype("datetime64[us]").astype("datetime64[M]").astype(str)
+            for month in np.unique(month_keys):
+                self._merge_month(user_id, month, rows[month_keys == month])
+            moved += len(rows)
+            max_id = max(max_id or 0, int(rows["id"].max()))
+        if moved:
+            # Rows inserted meanwhile have larger ids and stay live until the next run
+            session.execute(
+                delete(HealthMetric).where(HealthMetric.user_id == user_id, HealthMetric.timestamp < cutoff, HealthMetric.id <= max_id)
+            )
+            session.commit()
+        return moved
+
+    def archive(self, session: Session, older_than_days: int = ARCHIVE_AFTER_DAYS) -> dict:
+        """Archives every user's rows older than the given age. Returns counts."""
+        # Naive UTC like the telemetry rows, so the cutoff doesn't shift with the server's zone
+        cutoff = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(days=older_than_days)
+        with self._lock:
+            # The (user_id, timestamp) index answers this without a table scan
+            user_ids = session.exec(
+                select(HealthMetric.user_id).group_by(HealthMetric.user_id).having(func.min(HealthMetric.timestamp) < cutoff)
+            ).all()
+            moved = {user_id: self.archive_user(session, user_id, cutoff) for user_id in user_ids}
+        return {"cutoff": cutoff, "users": len(moved), "rows": sum(moved.values())}
+
+    # --- reading ---
+
+    @staticmethod
+    def _us(value: datetime) -> int:
+        return int(np.datetime64(value, "us").astype(np.int64))
+
+    def read_range(self, user_id: int, start: datetime | None = None, end: datetime | None = None) -> np.ndarray:
+        """Archived rows with start <= timestamp < end, oldest first."""
+        start_us = self._us(start) if start else None
+        end_us = self._us(end) if end else None
+        first_month = start.strftime("%Y-%m") if start else ""
+        last_month = end.strftime("%Y-%m") if end else "9999-99"
+        parts = []
+        for month in self.months(user_id):
+            if not first_month <= month <= last_month:
+                continue
+            rows = self._open(user_id, month)
+            ts = rows["timestamp"]
+            lo = int(np.searchsorted(ts, start_us, "left")) if start_us is not None else 0
+            hi = int(np.searchsorted(ts, end_us, "left")) if end_us is not None else len(rows)
+            if hi > lo:
+                parts.append(np.array(rows[lo:hi]))
+        return np.concatenate(parts) if parts else np.empty(0, ARCHIVE_DTYPE)
+
+    def page_before(self, user_id: int, cursor: tuple[datetime, int] | None, limit: int) -> tuple[list[dict], bool]:
+        """
+        Newest-first page of archived rows strictly before the (timestamp, id) cursor,
+        continuing the live table's keyset pagination. Returns (rows, more).
+        """
+        cursor_us = self._us(cursor[0]) if cursor else None
+        picked, more = [], False
+        for month in reversed(self.months(user_id)):
+            if cursor and month > cursor[0].strftime("%Y-%m"):
+                continue
+            rows = self._open(user_id, month)
+            hi = len(rows)
+            if cursor_us is not None:
+                ts = rows["timestamp"]
+                hi = int(np.searchsorted(ts, cursor_us, "left"))
+                same = int(np.searchsorted(ts, cursor_us, "right"))
+                # Rows sharing the cursor's timestamp are ordered by id
+                hi += int(np.searchsorted(rows["id"][hi:same], cursor[1], "left"))
+            take = min(hi, limit - len(picked))
+            picked.extend(self.to_records(np.array(rows[hi - take:hi]), user_id)[::-1])
+            if len(picked) >= limit:
+                more = hi - take > 0 or month != self.months(user_id)[0]
+                break
+        return picked, more
+
+    def to_records(self, rows: np.ndarray, user_id: int) -> list[dict]:
+        """Archived rows as HealthMetric-shaped dicts."""
+        timestamps = rows["timestamp"].astype("datetime64[us]").astype(datetime)
+        columns = {vital: rows[vital].tolist() for vital in VITALS}
+        return [
+            {
+                "id": int(row_id),
+                "user_id": user_id,
+                "timestamp": timestamps[i],
+                "source": self.sources.decode(int(rows["source"][i])),
+                **{vital: (None if columns[vital][i] < 0 else columns[vital][i]) for vital in VITALS},
+                "fall_detected": bool(rows["fall_detected"][i]),
+                "inactivity_alert": bool(rows["inactivity_alert"][i]),
+                "archived": True,
+            }
+            for i, row_id in enumerate(rows["id"])
+        ]
+
+    def iter_frames(self, user_id: int | None = None):
+        """Every archived month as a HealthMetric-shaped DataFrame (NaN for missing vitals)."""
+        if user_id is None:
+            try:
+                user_ids = sorted(int(name) for name in os.listdir(self.root) if name.isdigit())
+            except FileNotFoundError:
+                return
+        else:
+            user_ids = [user_id]
+        for uid in user_ids:
+            for month in self.months(uid):
+                rows = np.load(self._path(uid, month))
+                frame = pd.DataFrame({
+                    "user_id": uid,
+                    "timestamp": rows["timestamp"].astype("datetime64[us]"),
+                    **{vital: np.where(rows[vital] < 0, np.nan, rows[vital]) for vital in VITALS},
+                })
+                yield frame
+
+    def stats(self) -> dict:
+        files, size = 0, 0
+        for dirpath, _, names in os.walk(self.root):
+            for name in names:
+                if name.endswith(".npy"):
+                    files += 1
+                    size += os.path.getsize(os.path.join(dirpath, name))
+        return {"files": files, "bytes": size}
+
+
+health_archive = HealthArchive()
+
+
+def series_between(session: Session, user_id: int, metric: str, start: datetime, end: datetime, limit: int) -> dict:
+    """
+    Raw readings of one vital in [start, end) from both tiers, oldest first, as columns.
+    Archived months are memory-mapped; the recent part comes from SQLite.
+    """
+    archived = health_archive.read_range(user_id, start, end)
+    archived = archived[archived[metric] >= 0]
+    column = getattr(HealthMetric, metric)
+    live = session.exec(
+        select(HealthMetric.timestamp, column)
+        .where(HealthMetric.user_id == user_id, HealthMetric.timestamp >= start, HealthMetric.timestamp < end, column.is_not(None))
+        .order_by(HealthMetric.timestamp)
+        .limit(max(limit - len(archived), 0) + 1) # one past the page, so truncated is exact
+    ).all()
+    t = archived["timestamp"].astype("datetime64[us]").astype(datetime).tolist() + [row[0] for row in live]
+    values = archived[metric].tolist() + [row[1] for row in live]
+    return {
+        "metric": metric,
+        "archived": len(archived),
+        "live": len(live),
+        "truncated": len(t) > limit,
+        "t": t[:limit],
+        "values": values[:limit],
+    }
+
+
+class ArchiveScheduler:
+    """Runs the archival pass every ARCHIVE_INTERVAL_HOURS on a background thread."""
+
+    def __init__(self, archive: HealthArchive, engine, interval_hours: float = ARCHIVE_INTERVAL_HOURS):
+        self.archive = archive
+        self.engine = engine
+        self.interval = interval_hours * 3600
+        self.last_run: dict | None = None
+        self.counters = {"runs": 0, "failures": 0, "rows": 0}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if not self.interval or (self._thread and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="health-archive", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(5)
+            self._thread = None
+
+    def run_once(self) -> dict:
+        """One archival pass; errors propagate to the caller after being counted."""
+        try:
+            with Session(self.engine) as session:
+                result = self.archive.archive(session)
+        except Exception:
+            self.counters["failures"] += 1
+            raise
+        self.last_run = result
+        self.counters["runs"] += 1
+        self.counters["rows"] += result["rows"]
+        logger.info("Health archive: moved %d rows of %d users", result["rows"], result["users"])
+        return result
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.run_once()
+            except Exception:
+                # Keep the thread alive for the next interval; the traceback goes to the log
+                logger.exception("Health archive run failed")
+
+    def stats(self) -> dict:
+        return {**self.counters, "last_rows": self.last_run["rows"] if self.last_run else 0}
+
+
+if __name__ == "__main__":
+    # python -m app.services.archive [days] [--vacuum]
+    import sys
+    from sqlalchemy import text
+    from app.db import engine, init_db
+    init_db()
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    with Session(engine) as session:
+        result = health_archive.archive(session, int(args[0]) if args else ARCHIVE_AFTER_DAYS)
+    print(f"Archived {result['rows']} rows of {result['users']} users older than {result['cutoff']:%Y-%m-%d}")
+    if "--vacuum" in sys.argv:
+        # SQLite reuses freed pages on its own; VACUUM gives them back to the filesystem
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.execute(text("VACUUM"))
+        print(f"Vacuumed, database is now {os.path.getsize(engine.url.database) / 1e6:.1f} MB")
@@ -0,0 +1,216 @@
+import gzip
+import hashlib
+import mimetypes
+import os
+import threading
+from dataclasses import dataclass, field
+
+from fastapi.concurrency import run_in_threadpool
+from fastapi.templating import Jinja2Templates
+from starlette.datastructures import Headers
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.staticfiles import StaticFiles
+
+try:
+    import brotli # optional: pip install brotli for br variants next to gzip
+except ImportError:
+    brotli = None
+
+STATIC_DIR = "static"
+STATIC_URL = "/static"
+# Off for template/CSS work without restarts: pages render per request, /static is served from disk
+ASSET_CACHE = os.getenv("ASSET_CACHE", "true").lower() == "true"
+# User uploads stay on disk; everything else under static/ is loaded into memory
+SKIP_DIRS = {"uploads"}
+COMPRESSIBLE = {".css", ".js", ".mjs", ".svg", ".html", ".json", ".txt", ".map", ".xml"}
+MIN_COMPRESS_BYTES = 256
+
+IMMUTABLE = "public, max-age=31536000, immutable" # fingerprinted URLs never change content
+REVALIDATE = "no-cache" # plain URLs and pages: reuse the copy after a 304 check
+
+
+@dataclass
+class CachedBody:
+    """One response body with its precompressed variants and a strong ETag per encoding."""
+    media_type: str
+    digest: str
+    variants: dict[str, bytes] = field(default_factory=dict) # "identity" / "br" / "gzip" -> bytes
+
+    def etag(self, encoding: str) -> str:
+        return f'"{self.digest}"' if encoding == "identity" else f'"{self.digest}-{encoding}"'
+
+
+def build_cached(body: bytes, media_type: str, compress: bool) -> CachedBody:
+    cached = CachedBody(media_type, hashlib.sha256(body).hexdigest()[:20], {"identity": body})
+    if compress and len(body) >= MIN_COMPRESS_BYTES:
+        # Deterministic output (mtime=0), so restarts and replicas agree on bytes and ETags
+        candidates = {"gzip": gzip.compress(body, 9, mtime=0)}
+        if brotli is not None:
+            candidates["br"] = brotli.compress(body, quality=11)
+        for encoding, data in candidates.items():
+            if len(data) < len(body):
+                cached.variants[encoding] = data
+    return cached
+
+
+def negotiate(accept_encoding: str, available) -> str:
+    """Picks br, then gzip, then identity among what the client accepts (q=0 means refused)."""
+    accepted = set()
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        if params.strip().replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+        accepted.add(name.strip())
+    for encoding in ("br", "gzip"):
+        if encoding in available and (encoding in accepted or "*" in accepted):
+            return encoding
+    return "identity"
+
+
+def _etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # Weak comparison, as If-None-Match requires
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+
+def cached_response(headers: Headers, method: str, cached: CachedBody, cache_control: str) -> Response:
+    """200 with the best encoding the client accepts, or 304 when its ETag still matches."""
+    encoding = negotiate(headers.get("accept-encoding", ""), cached.variants)
+    etag = cached.etag(encoding)
+    response_headers = {"ETag": etag, "Cache-Control": cache_control, "Vary": "Accept-Encoding"}
+    if encoding != "identity":
+        response_headers["Content-Encoding"] = encoding
+    if _etag_matches(headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=response_headers)
+
+    body = cached.variants[encoding]
+    if method == "HEAD":
+        response_headers["Content-Length"] = str(len(body))
+        body = b""
+    return Response(body, media_type=cached.media_type, headers=response_headers)
+
+
+class AssetStore:
+    """
+    Files under static/ (minus uploads) held in memory with gzip/brotli variants.
+    Each gets a fingerprinted URL (styles.<hash>.css) that can be cached forever;
+    the plain URL still works and revalidates by ETag.
+    """
+
+    def __init__(self, root: str = STATIC_DIR, url_prefix: str = STATIC_URL):
+        self.root = root
+        self.url_prefix = url_prefix
+        self._assets: dict[str, CachedBody] = {} # relative path -> body
+        self._fingerprinted: dict[str, str] = {} # fingerprinted relative path -> relative path
+        self._urls: dict[str, str] = {} # relative path -> fingerprinted URL
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self.loaded = False
+
+    def load(self):
+        assets, fingerprinted, urls = {}, {}, {}
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            if dirpath == self.root:
+                dirnames[:] = [d for d in dirnames if d not in SKIP_DIRS]
+            for filename in filenames:
+                full_path = os.path.join(dirpath, filename)
+                rel = os.path.relpath(full_path, self.root).replace(os.sep, "/")
+                stem, ext = os.path.splitext(rel)
+                with open(full_path, "rb") as f:
+                    body = f.read()
+                media_type = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+                if media_type.startswith("text/") or media_type in ("application/javascript", "image/svg+xml"):
+                    media_type += "; charset=utf-8"
+                cached = build_cached(body, media_type, ext.lower() in COMPRESSIBLE)
+                assets[rel] = cached
+                fingerprinted[f"{stem}.{cached.digest[:10]}{ext}"] = rel
+                urls[rel] = f"{self.url_prefix}/{stem}.{cached.digest[:10]}{ext}"
+        with self._lock:
+            self._assets, self._fingerprinted, self._urls = assets, fingerprinted, urls
+            self.loaded = True
+
+    def ensure_loaded(self):
+        if not self.loaded:
+            with self._load_lock:
+                if not self.loaded:
+                    self.load()
+
+    def url(self, path: str) -> str:
+        """Fingerprinted URL for a path relative to static/ (templates: {{ asset_url('css/styles.css') }})."""
+        if not ASSET_CACHE:
+            return f"{self.url_prefix}/{path}"
+        self.ensure_loaded()
+        return self._urls.get(path, f"{self.url_prefix}/{path}")
+
+    def lookup(self, path: str) -> tuple[CachedBody, bool] | None:
+        """(body, immutable) for a path relative to static/, plain or fingerprinted."""
+        rel = self._fingerprinted.get(path)
+        if rel is not None:
+            return self._assets[rel], True
+        cached = self._assets.get(path)
+        return (cached, False) if cached is not None else None
+
+    def stats(self) -> dict:
+        with self._lock:
+            assets = list(self._assets.values())
+        sizes = {"identity": 0, "gzip": 0, "br": 0}
+        for cached in assets:
+            for encoding, data in cached.variants.items():
+                sizes[encoding] += len(data)
+        return {"files": len(assets), "bytes": sizes["identity"], "gzip_bytes": sizes["gzip"], "br_bytes": sizes["br"]}
+
+
+asset_store = AssetStore()
+
+
+class CachedStaticFiles(StaticFiles):
+    """StaticFiles serving the in-memory assets; paths it doesn't hold (uploads) come from disk as before."""
+
+    async def get_response(self, path: str, scope) -> Response:
+        if ASSET_CACHE and scope["method"] in ("GET", "HEAD"):
+            if not asset_store.loaded:
+                await run_in_threadpool(asset_store.ensure_loaded)
+            found = asset_store.lookup(path.replace(os.sep, "/"))
+            if found is not None:
+                cached, immutable = found
+                return cached_response(Headers(scope=scope), scope["method"], cached, IMMUTABLE if immutable else REVALIDATE)
+        return await super().get_response(path, scope)
+
+
+class PageCache:
+    """
+    Page shells rendered once per template. They carry no per-user context
+    (auth happens client-side), so every visitor gets the same bytes and a
+    repeat visit is a 304.
+    """
+
+    def __init__(self, templates: Jinja2Templates):
+        self.templates = templates
+        self._pages: dict[str, CachedBody] = {}
+        self._lock = threading.Lock()
+
+    def get(self, name: str) -> CachedBody:
+        cached = self._pages.get(name)
+        if cached is None:
+            html = self.templates.get_template(name).render()
+            cached = build_cached(html.encode(), "text/html; charset=utf-8", compress=True)
+            with self._lock:
+                cached = self._pages.setdefault(name, cached)
+        return cached
+
+    def warm(self):
+        for name in self.templates.env.list_templates():
+            if name != "base.html":
+                self.get(name)
+
+    def response(self, request: Request, name: str) -> Response:
+        if not ASSET_CACHE:
+            return self.templates.TemplateResponse(name, {"request": request})
+        return cached_response(request.headers, request.method, self.get(name), REVALIDATE)
+
+    def stats(self) -> dict:
+        return {"pages": len(self._pages)}
@@ -0,0 +1,38 @@
+import hashlib
+import os
+import uuid
+
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+
+
+def blob_path(upload_dir: str, digest: str, extension: str) -> str:
+    return f"{upload_dir}/{digest}{extension}"
+
+
+def store_upload(source, upload_dir: str, extension: str) -> tuple[str, str, bool]:
+    """
+    Content-addressed storage: streams the upload to a temp file in fixed-size chunks
+    while hashing, then moves it to <sha256><ext>. If that blob already exists the
+    temp file is discarded, so identical uploads share one file on disk.
+    Returns (sha256 hex digest, blob path, deduplicated). Runs in a worker thread.
+    """
+    os.makedirs(upload_dir, exist_ok=True)
+    temp_path = f"{upload_dir}/.incoming-{uuid.uuid4().hex}"
+    digest = hashlib.sha256()
+    try:
+        with open(temp_path, "wb") as out:
+            while True:
+                chunk = source.read(UPLOAD_CHUNK_BYTES)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                out.write(chunk)
+
+        path = blob_path(upload_dir, digest.hexdigest(), extension)
+        if os.path.exists(path):
+            return digest.hexdigest(), path, True
+        os.replace(temp_path, path)
+        return digest.hexdigest(), path, False
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
@@ -0,0 +1,172 @@
+import os
+from datetime import datetime, timedelta
+from sqlalchemy import or_
+from sqlmodel import Session, select
+from app.models.health import HealthMetric
+from app.models.medical import MedicalReport
+from app.models.user import CaregiverElderLink, User
+from app.services.auth_cache import TTLCache
+
+# Fall/inactivity alerts newer than this are shown as open
+OPEN_ALERT_HOURS = float(os.getenv("OPEN_ALERT_HOURS", "24"))
+SNAPSHOT_CACHE_SIZE = int(os.getenv("SNAPSHOT_CACHE_SIZE", "10000"))
+# Safety net only: write paths call invalidate_elders for the elders they touched
+SNAPSHOT_CACHE_TTL = float(os.getenv("SNAPSHOT_CACHE_TTL", "300"))
+
+VITALS = ("heart_rate", "steps", "sleep_minutes", "spo2")
+
+# elder id -> overview snapshot dict
+snapshot_cache = TTLCache(SNAPSHOT_CACHE_SIZE, SNAPSHOT_CACHE_TTL)
+
+
+def invalidate_elders(user_ids):
+    """Call after committing any write to an elder's metrics, alerts, reports or profile."""
+    for user_id in set(user_ids):
+        snapshot_cache.invalidate(user_id)
+
+
+def linked_elders(session: Session, caregiver_id: int) -> list[User]:
+    return session.exec(
+        select(User)
+        .join(CaregiverElderLink, CaregiverElderLink.elder_id == User.id)
+        .where(CaregiverElderLink.caregiver_id == caregiver_id)
+        .order_by(User.full_name)
+    ).all()
+
+
+def _latest_vitals(session: Session, elder_ids: list[int]) -> dict[int, dict]:
+    """
+    Newest non-null reading of each vital per elder, in two queries. Each correlated
+    LIMIT 1 subquery is one seek in that vital's partial (user_id, timestamp) index,
+    also for a vital the elder never records.
+    """
+    def latest_id(vital: str):
+        inner = HealthMetric.__table__.alias(f"latest_{vital}")
+        return (
+            select(inner.c.id)
+            .where(inner.c.user_id == User.id, inner.c[vital].is_not(None))
+            .order_by(inner.c.timestamp.desc(), inner.c.id.desc())
+            .limit(1)
+            .correlate(User)
+            .scalar_subquery()
+        )
+
+    rows = session.exec(select(User.id, *(latest_id(v) for v in VITALS)).where(User.id.in_(elder_ids))).all()
+    metric_ids = {metric_id for row in rows for metric_id in row[1:] if metric_id is not None}
+    metrics = {m.id: m for m in session.exec(select(HealthMetric).where(HealthMetric.id.in_(metric_ids))).all()} if metric_ids else {}
+
+    vitals = {}
+    for elder_id, *ids in rows:
+        readings = {
+            vital: {"value": getattr(metrics[metric_id], vital), "timestamp": metrics[metric_id].timestamp}
+            for vital, metric_id in zip(VITALS, ids) if metric_id in metrics
+        }
+        if readings:
+            vitals[elder_id] = readings
+    return vitals
+
+
+def _open_alerts(session: Session, elder_ids: list[int], since: datetime) -> dict[int, list[HealthMetric]]:
+    rows = session.exec(
+        select(HealthMetric)
+        .where(
+            HealthMetric.user_id.in_(elder_ids),
+            HealthMetric.timestamp >= since,
+            or_(HealthMetric.fall_detected == True, HealthMetric.inactivity_alert == True), # noqa: E712
+        )
+        .order_by(HealthMetric.timestamp.desc())
+    ).all()
+    alerts: dict[int, list[HealthMetric]] = {}
+    for row in rows:
+        alerts.setdefault(row.user_id, []).append(row)
+    return alerts
+
+
+def _newest_reports(session: Session, elder_ids: list[int]) -> dict[int, MedicalReport]:
+    inner = MedicalReport.__table__.alias("newest")
+    newest_id = (
+        select(inner.c.id)
+        .where(inner.c.user_id == MedicalReport.user_id)
+        .order_by(inner.c.upload_date.desc(), inner.c.id.desc())
+        .limit(1)
+        .correlate(MedicalReport)
+        .scalar_subquery()
+    )
+    rows = session.exec(
+        select(MedicalReport).where(MedicalReport.user_id.in_(elder_ids), MedicalReport.id == newest_id)
+    ).all()
+    return {row.user_id: row for row in rows}
+
+
+def build_snapshots(session: Session, elders: list[User]) -> dict[int, dict]:
+    """
+    Snapshots for many elders with four set-based queries (two for vitals, alerts,
+    reports), regardless of how many elders are asked for.
+    """
+    if not elders:
+        return {}
+    ids = [elder.id for elder in elders]
+    vitals = _latest_vitals(session, ids)
+    alerts = _open_alerts(session, ids, datetime.now() - timedelta(hours=OPEN_ALERT_HOURS))
+    reports = _newest_reports(session, ids)
+
+    snapshots = {}
+    for elder in elders:
+        report = reports.get(elder.id)
+        snapshots[elder.id] = {
+            "elder": {
+                "id": elder.id,
+                "full_name": elder.full_name,
+                "age": elder.age,
+                "phone_number": elder.phone_number,
+                "handling_instructions": elder.handling_instructions,
+            },
+            "latest_vitals": vitals.get(elder.id),
+            "open_alerts": [
+                {
+                    "type": "fall" if a.fall_detected else "inactivity",
+                    "timestamp": a.timestamp,
+                    "source": a.source,
+                }
+                for a in alerts.get(elder.id, [])
+            ],
+            "newest_report": {
+                "id": report.id,
+                "title": report.title,
+                "status": report.status,
+                "upload_date": report.upload_date,
+                "summary": report.summary,
+            } if report else None,
+        }
+    return snapshots
+
+
+def caregiver_overview(session: Session, caregiver_id: int) -> dict:
+    """
+    One row per linked elder. Cached snapshots are reused; only elders whose data
+    changed since (cache invalidated) are queried again.
+    """
+    elders = linked_elders(session, caregiver_id)
+    snapshots, stale = {}, []
+    for elder in elders:
+        cached = snapshot_cache.get(elder.id)
+        if cached is None:
+            stale.append(elder)
+        else:
+            snapshots[elder.id] = cached
+    for elder_id, snapshot in build_snapshots(session, stale).items():
+        snapshot_cache.set(elder_id, snapshot)
+        snapshots[elder_id] = snapshot
+
+    # Inactivity status is live in-memory state, so it's not part of the cached snapshot
+    # (imported here: the inactivity service imports this module for invalidation)
+    from app.services.inactivity import inactivity_monitor
+
+    return {
+        "generated_at": datetime.now(),
+        "refreshed": len(stale),
+        "elders": [
+            {**snapshots[elder.id], "inactivity": inactivity_monitor.status(elder.id)}
+            for elder in elders
+        ],
+    }
@@ -0,0 +1,169 @@
+import json
+import logging
+from datetime import datetime, timedelta
+from sqlalchemy import func
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlmodel import Session, select
+from app.models.cognitive import BehaviorLog, BehaviorWeekStat, CognitiveAnalysis, CognitiveAnalysisCache
+
+logger = logging.getLogger(__name__)
+
+SEVERITIES = ("Low", "Medium", "High")
+# The prompt gets the newest RECENT_LOGS logs verbatim plus FEATURE_WEEKS of weekly counts
+RECENT_LOGS = 30
+FEATURE_WEEKS = 12
+TREND_WEEKS = 4
+
+
+def week_start(ts: datetime) -> datetime:
+    day = ts.replace(hour=0, minute=0, second=0, microsecond=0)
+    return day - timedelta(days=day.weekday())
+
+
+def normalize_severity(severity: str) -> str:
+    value = (severity or "").strip().capitalize()
+    return value if value in SEVERITIES else "Other"
+
+
+def record_log(session: Session, log: BehaviorLog):
+    """Bumps the weekly severity counter for a new log; caller commits with the log."""
+    stmt = sqlite_insert(BehaviorWeekStat.__table__).values(
+        user_id=log.user_id,
+        week_start=week_start(log.timestamp),
+        severity=normalize_severity(log.severity),
+        count=1,
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["user_id", "week_start", "severity"],
+        set_={"count": BehaviorWeekStat.__table__.c["count"] + 1},
+    )
+    session.exec(stmt)
+
+
+def backfill_week_stats(session: Session, user_id: int | None = None) -> int:
+    """Rebuilds the weekly counters (all users, or one) from raw logs in a single pass."""
+    logs = select(BehaviorLog.user_id, BehaviorLog.timestamp, BehaviorLog.severity)
+    clear = BehaviorWeekStat.__table__.delete()
+    if user_id is not None:
+        logs = logs.where(BehaviorLog.user_id == user_id)
+        clear = clear.where(BehaviorWeekStat.__table__.c.user_id == user_id)
+    counts: dict[tuple, int] = {}
+    for uid, ts, severity in session.exec(logs):
+        key = (uid, week_start(ts), normalize_severity(severity))
+        counts[key] = counts.get(key, 0) + 1
+    session.exec(clear)
+    if counts:
+        session.exec(
+            BehaviorWeekStat.__table__.insert(),
+            params=[{"user_id": u, "week_start": w, "severity": s, "count": n} for (u, w, s), n in counts.items()],
+        )
+    session.commit()
+    return sum(counts.values())
+
+
+def ensure_week_stats(session: Session):
+    """Startup hook: builds the counters once for databases that predate them."""
+    has_stats = session.exec(select(BehaviorWeekStat.user_id).limit(1)).first() is not None
+    has_logs = session.exec(select(BehaviorLog.id).limit(1)).first() is not None
+    if has_logs and not has_stats:
+        logger.info("Weekly behavior counters built from %d logs", backfill_week_stats(session))
+
+
+def weekly_features(session: Session, user_id: int, now: datetime | None = None, weeks: int = FEATURE_WEEKS) -> dict:
+    """
+    Severity counts for the last `weeks` weeks (oldest first), plus the average weekly
+    volume of the last TREND_WEEKS weeks against the TREND_WEEKS before them.
+    """
+    first_week = week_start(now or datetime.now()) - timedelta(weeks=weeks - 1)
+    rows = session.exec(
+        select(BehaviorWeekStat).where(BehaviorWeekStat.user_id == user_id, BehaviorWeekStat.week_start >= first_week)
+    ).all()
+    by_week = {first_week + timedelta(weeks=i): {s: 0 for s in SEVERITIES} for i in range(weeks)}
+    for row in rows:
+        by_week.setdefault(row.week_start, {s: 0 for s in SEVERITIES})[row.severity] = row.count
+    totals = [sum(counts.values()) for counts in by_week.values()]
+
+    recent = sum(totals[-TREND_WEEKS:]) / TREND_WEEKS
+    previous = sum(totals[-2 * TREND_WEEKS:-TREND_WEEKS]) / TREND_WEEKS
+    if recent > previous * 1.25 and recent - previous >= 1:
+        trend = "rising"
+    elif recent < previous * 0.75 and previous - recent >= 1:
+        trend = "falling"
+    else:
+        trend = "stable"
+    return {
+        "weeks": [(week, counts) for week, counts in sorted(by_week.items())],
+        "recent_per_week": round(recent, 1),
+        "previous_per_week": round(previous, 1),
+        "trend": trend,
+        "high_in_window": sum(counts.get("High", 0) for counts in by_week.values()),
+    }
+
+
+def build_logs_text(recent_logs: list[BehaviorLog], features: dict) -> str:
+    """Bounded prompt body: weekly summary features, then the newest logs oldest-first."""
+    week_lines = [
+        f"- week of {week:%Y-%m-%d}: " + ", ".join(f"{s} {counts.get(s, 0)}" for s in SEVERITIES)
+        for week, counts in features["weeks"]
+    ]
+    log_lines = [f"- [{l.timestamp}] ({l.severity}): {l.description}" for l in reversed(recent_logs)]
+    return "\n".join([
+        f"Weekly log counts by severity (last {len(week_lines)} weeks):",
+        *week_lines,
+        f"Trend: {features['recent_per_week']} logs/week over the last {TREND_WEEKS} weeks vs "
+        f"{features['previous_per_week']} before ({features['trend']}); "
+        f"{features['high_in_window']} high-severity events in the window.",
+        f"Most recent {len(log_lines)} logs:",
+        *log_lines,
+    ])
+
+
+def analyze_user(session: Session, user_id: int) -> CognitiveAnalysis:
+    """
+    Returns the cached analysis while no newer log exists, otherwise runs the model on
+    the bounded recent window + weekly features and caches the result.
+    """
+    from app.services import ai_service
+
+    latest_id = session.exec(select(func.max(BehaviorLog.id)).where(BehaviorLog.user_id == user_id)).one()
+    if latest_id is None:
+        return CognitiveAnalysis(stage="Unknown", score=0, advice=["Not enough data. Log daily behaviors for analysis."])
+
+    cached = session.get(CognitiveAnalysisCache, user_id)
+    if cached is not None and cached.last_log_id == latest_id:
+        return CognitiveAnalysis(stage=cached.stage, score=cached.score, advice=json.loads(cached.advice))
+
+    recent_logs = session.exec(
+        select(BehaviorLog)
+        .where(BehaviorLog.user_id == user_id)
+        .order_by(BehaviorLog.timestamp.desc(), BehaviorLog.id.desc())
+        .limit(RECENT_LOGS)
+    ).all()
+    result = ai_service.analyze_cognitive_state(build_logs_text(recent_logs, weekly_features(session, user_id)))
+    analysis = CognitiveAnalysis(stage=result["stage"], score=result["score"], advice=result["advice"])
+
+    # Simulation and error results are not worth keeping
+    if ai_service.HF_TOKEN and analysis.stage != "Error":
+        # Upsert: two first analyses (a double dashboard load) both miss the cache; an
+        # analysis of an older log never replaces one of a newer log
+        table = CognitiveAnalysisCache.__table__
+        values = {
+            "user_id": user_id, "last_log_id": latest_id, "stage": analysis.stage, "score": analysis.score,
+            "advice": json.dumps(analysis.advice), "created_at": datetime.now(),
+        }
+        insert = sqlite_insert(table).values(**values)
+        session.execute(insert.on_conflict_do_update(
+            index_elements=["user_id"],
+            set_={k: insert.excluded[k] for k in values if k != "user_id"},
+            where=insert.excluded.last_log_id >= table.c.last_log_id,
+        ))
+        session.commit()
+    return analysis
+
+
+if __name__ == "__main__":
+    # python -m app.services.cognitive_analysis  -> rebuild weekly counters from raw logs
+    from app.db import engine, init_db
+    init_db()
+    with Session(engine) as session:
+        print(f"Weekly counters rebuilt from {backfill_week_stats(session)} logs")
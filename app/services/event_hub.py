@@ -0,0 +1,107 @@
+import asyncio
+import os
+import threading
+import time
+
+SUBSCRIBER_QUEUE_SIZE = int(os.getenv("STREAM_QUEUE_SIZE", "256"))
+
+
+class Subscription:
+    """One connected dashboard: a bounded queue living on the subscriber's event loop."""
+
+    def __init__(self, topics: set, loop: asyncio.AbstractEventLoop, max_queue: int):
+        self.topics = topics
+        self.loop = loop
+        self.queue: asyncio.Queue = asyncio.Queue(max_queue)
+        self.dropped = 0 # events lost since the last get(); the client should resync
+
+    def _offer(self, event: dict):
+        # Runs on the subscriber's loop
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.dropped += 1
+
+    async def get(self, timeout: float) -> dict | None:
+        """Next event, a {"type": "resync"} marker after drops, or None on timeout."""
+        if self.dropped:
+            # The client refetches on resync, so whatever is still queued is stale too
+            dropped, self.dropped = self.dropped + self.queue.qsize(), 0
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            return {"type": "resync", "dropped": dropped}
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class EventHub:
+    """
+    In-process pub/sub keyed by elder id. publish() is safe from any thread (telemetry
+    writer, inactivity monitor, sync routes) and never blocks: each event is handed to
+    the subscriber's loop, and a subscriber whose queue is full loses the event instead
+    of slowing the publisher or other subscribers.
+    """
+
+    def __init__(self, max_queue: int = SUBSCRIBER_QUEUE_SIZE):
+        self.max_queue = max_queue
+        self._topics: dict[int, set[Subscription]] = {}
+        self._lock = threading.Lock()
+        self.counters = {"published": 0, "fanned_out": 0}
+
+    def subscribe(self, topics) -> Subscription:
+        subscription = Subscription(set(topics), asyncio.get_running_loop(), self.max_queue)
+        with self._lock:
+            for topic in subscription.topics:
+                self._topics.setdefault(topic, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            for topic in subscription.topics:
+                subscribers = self._topics.get(topic)
+                if subscribers:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self._topics[topic]
+
+    def publish(self, topic: int, event_type: str, data):
+        with self._lock:
+            subscribers = list(self._topics.get(topic, ()))
+            self.counters["published"] += 1
+            self.counters["fanned_out"] += len(subscribers)
+        if not subscribers:
+            return
+        event = {"type": event_type, "user_id": topic, "data": data, "published_at": time.time()}
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription._offer, event)
+            except RuntimeError: # loop already closed; the stream's finally will unsubscribe
+                pass
+
+    def stats(self) -> dict:
+        with self._lock:
+            subscriptions = {s for subs in self._topics.values() for s in subs}
+            return {
+                **self.counters,
+                "topics": len(self._topics),
+                "subscribers": len(subscriptions),
+                "queued": sum(s.queue.qsize() for s in subscriptions),
+            }
+
+
+event_hub = EventHub()
+
+
+def publish_metrics(records: list[dict], max_rows_per_user: int = 50):
+    """Publishes freshly written HealthMetric rows, one event per user (newest rows last)."""
+    by_user: dict[int, list[dict]] = {}
+    for record in records:
+        by_user.setdefault(record["user_id"], []).append(record)
+    for user_id, rows in by_user.items():
+        event_hub.publish(user_id, "metrics", rows[-max_rows_per_user:])
+
+
+def publish_alert(user_id: int, alert_type: str, **details):
+    event_hub.publish(user_id, "alert", {"type": alert_type, **details})
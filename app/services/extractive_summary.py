@@ -0,0 +1,106 @@
+import re
+from collections import Counter
+import numpy as np
+
+LOCAL_SUMMARY_MODEL = "local-textrank"
+
+# Long reports are truncated to this many sentences before ranking, which bounds
+# the similarity matrix at MAX_SENTENCES^2 floats.
+MAX_SENTENCES = 1500
+DAMPING = 0.85
+ITERATIONS = 50
+TOLERANCE = 1e-6
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+(?=[A-Z0-9(\"'])|\n{2,}|\n(?=\s*[-*•]|\s*\d+[.)]\s)")
+_WORD = re.compile(r"[a-z][a-z0-9\-]+")
+# Titles and common abbreviations in medical reports that end with a period
+_ABBREVIATIONS = {"dr", "mr", "mrs", "ms", "vs", "no", "approx", "e.g", "i.e", "mg", "ml", "pt", "hr", "min", "fig"}
+_STOPWORDS = frozenset("""
+a about above after again against all am an and any are as at be because been before being below between both but by
+can could did do does doing down during each few for from further had has have having he her here hers him his how i
+if in into is it its itself just me more most my no nor not now of off on once only or other our out over own same she
+should so some such than that the their them then there these they this those through to too under until up very was
+we were what when where which while who whom why will with would you your also per patient report page
+""".split())
+
+
+def split_sentences(text: str) -> list[str]:
+    """Rule-based segmentation; rejoins splits that follow a known abbreviation."""
+    text = re.sub(r"[ \t\r\f\v]+", " ", text)
+    sentences = []
+    for part in _SENTENCE_END.split(text):
+        part = " ".join(part.split())
+        if not part:
+            continue
+        if sentences:
+            last_word = sentences[-1].rsplit(" ", 1)[-1].rstrip(".").lower()
+            if last_word in _ABBREVIATIONS:
+                sentences[-1] = f"{sentences[-1]} {part}"
+                continue
+        sentences.append(part)
+    return sentences
+
+
+def _tfidf(tokenized: list[list[str]]) -> np.ndarray:
+    vocab: dict[str, int] = {}
+    rows, cols, counts = [], [], []
+    for i, words in enumerate(tokenized):
+        for word, n in Counter(words).items():
+            rows.append(i)
+            cols.append(vocab.setdefault(word, len(vocab)))
+            counts.append(n)
+
+    matrix = np.zeros((len(tokenized), max(1, len(vocab))), dtype=np.float32)
+    if not counts:
+        return matrix
+    matrix[rows, cols] = counts
+    doc_freq = np.count_nonzero(matrix, axis=0)
+    matrix = np.log1p(matrix) * np.log((1 + len(tokenized)) / (1 + doc_freq) + 1)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.where(norms == 0, 1, norms)
+
+
+def rank_sentences(sentences: list[str]) -> np.ndarray:
+    """
+    TextRank: PageRank over the cosine-similarity graph of TF-IDF sentence vectors.
+    Returns one score per sentence.
+    """
+    tokenized = [[w for w in _WORD.findall(s.lower()) if w not in _STOPWORDS] for s in sentences]
+    vectors = _tfidf(tokenized)
+    similarity = vectors @ vectors.T
+    np.fill_diagonal(similarity, 0)
+
+    n = len(sentences)
+    out_weight = similarity.sum(axis=1, keepdims=True)
+    # Sentences with no similar neighbours spread their rank uniformly
+    transition = np.where(out_weight > 0, similarity / np.where(out_weight == 0, 1, out_weight), 1.0 / n)
+    scores = np.full(n, 1.0 / n, dtype=np.float32)
+    for _ in range(ITERATIONS):
+        updated = (1 - DAMPING) / n + DAMPING * (transition.T @ scores)
+        if np.abs(updated - scores).sum() < TOLERANCE:
+            return updated
+        scores = updated
+    return scores
+
+
+def summarize_extractive(text: str, max_sentences: int = 5, max_chars: int = 1200) -> str:
+    """
+    Picks the highest-ranked sentences and returns them in document order.
+    Runs in-process with no network; a 30-page report takes a few milliseconds.
+    """
+    sentences = [s for s in split_sentences(text) if len(s) >= 20][:MAX_SENTENCES]
+    if not sentences:
+        return " ".join(text.split())[:max_chars]
+    if len(sentences) <= max_sentences:
+        return " ".join(sentences)[:max_chars]
+
+    scores = rank_sentences(sentences)
+    chosen, length = [], 0
+    for index in np.argsort(-scores, kind="stable"):
+        if len(chosen) == max_sentences:
+            break
+        if chosen and length + len(sentences[index]) > max_chars:
+            continue
+        chosen.append(int(index))
+        length += len(sentences[index]) + 1
+    return " ".join(sentences[i] for i in sorted(chosen))[:max_chars]
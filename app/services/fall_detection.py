@@ -0,0 +1,182 @@
+import os
+import threading
+import time
+import warnings
+from collections import OrderedDict
+import numpy as np
+
+# MediaPipe Pose landmark indices (33 landmarks, each x, y, z, visibility; y grows downward)
+N_LANDMARKS = 33
+NOSE, L_SHOULDER, R_SHOULDER, L_HIP, R_HIP = 0, 11, 12, 23, 24
+
+# Per-session ring buffer: ~4 s of history at 30 fps. 128 x 33 x 4 float32 = 66 KB per session.
+WINDOW_FRAMES = int(os.getenv("FALL_WINDOW_FRAMES", "128"))
+MAX_SESSIONS = int(os.getenv("FALL_MAX_SESSIONS", "1000"))
+SESSION_IDLE_SECONDS = float(os.getenv("FALL_SESSION_IDLE_SECONDS", "300"))
+MIN_VISIBILITY = 0.3
+
+# Decision thresholds, in normalized image units (frame height = 1.0)
+IMPACT_VELOCITY = 0.8       # peak downward hip/head speed, frame-heights per second
+LYING_TORSO_DEGREES = 55.0  # torso angle from vertical after the impact
+LYING_ASPECT = 1.0          # landmark bounding box width / height after the impact
+STILL_SECONDS = 1.0         # how long the person must stay down before we fire
+STILL_MOTION = 0.02         # max std-dev of the hip midpoint while "still"
+COOLDOWN_SECONDS = 30.0     # no repeat alerts from the same camera within this window
+
+
+class PoseSession:
+    """
+    Fixed-size ring buffer of pose frames for one camera stream.
+    """
+    __slots__ = ("user_id", "frames", "times", "head", "count", "last_seen", "cooldown_until", "lock")
+
+    def __init__(self, user_id: int, window: int = WINDOW_FRAMES):
+        self.user_id = user_id
+        self.frames = np.full((window, N_LANDMARKS, 4), np.nan, dtype=np.float32)
+        self.times = np.zeros(window, dtype=np.float64)
+        self.head = 0
+        self.count = 0
+        self.last_seen = time.monotonic()
+        self.cooldown_until = 0.0
+        self.lock = threading.Lock()
+
+    def extend(self, frames: np.ndarray, times: np.ndarray):
+        window = len(self.times)
+        if len(frames) > window:
+            frames, times = frames[-window:], times[-window:]
+        slots = (self.head + np.arange(len(frames))) % window
+        self.frames[slots] = frames
+        self.times[slots] = times
+        self.head = int((self.head + len(frames)) % window)
+        self.count = min(self.count + len(frames), window)
+        self.last_seen = time.monotonic()
+
+    def ordered(self):
+        """Buffered frames and timestamps, oldest first."""
+        window = len(self.times)
+        idx = (self.head - self.count + np.arange(self.count)) % window
+        return self.frames[idx], self.times[idx]
+
+
+def _midpoint(frames: np.ndarray, a: int, b: int) -> np.ndarray:
+    return np.nanmean(frames[:, [a, b], :2], axis=1)
+
+
+def compute_features(frames: np.ndarray, times: np.ndarray) -> dict | None:
+    """
+    Window features over (n, 33, 4) frames, all as array operations:
+    peak downward hip/head velocity, torso angle and bounding-box aspect after the
+    impact, and hip motion during the trailing stillness period.
+    """
+    if len(frames) < 3:
+        return None
+
+    frames = frames.copy()
+    frames[frames[:, :, 3] < MIN_VISIBILITY] = np.nan
+
+    # Occluded frames are NaN; nan-reductions over them are expected to warn
+    with np.errstate(invalid="ignore", divide="ignore"), warnings.catch_warnings():
+        warnings.simplefilter("ignore", category=RuntimeWarning)
+        hips = _midpoint(frames, L_HIP, R_HIP)
+        shoulders = _midpoint(frames, L_SHOULDER, R_SHOULDER)
+        head_y = frames[:, NOSE, 1]
+
+        dt = np.diff(times)
+        dt[dt <= 0] = np.nan
+        hip_velocity = np.diff(hips[:, 1]) / dt
+        head_velocity = np.diff(head_y) / dt
+        downward = np.fmax(hip_velocity, head_velocity)
+        if np.all(np.isnan(downward)):
+            return None
+        impact_index = int(np.nanargmax(downward))
+        impact_time = times[impact_index + 1]
+
+        torso = shoulders - hips
+        torso_angle = np.degrees(np.arctan2(np.abs(torso[:, 0]), np.abs(torso[:, 1])))
+
+        xs, ys = frames[:, :, 0], frames[:, :, 1]
+        width = np.nanmax(xs, axis=1) - np.nanmin(xs, axis=1)
+        height = np.nanmax(ys, axis=1) - np.nanmin(ys, axis=1)
+        aspect = width / np.where(height > 1e-6, height, np.nan)
+
+        after = times > impact_time
+        still = times >= times[-1] - STILL_SECONDS
+        post = after & still
+        stillness = float(np.nanmax(np.nanstd(hips[post], axis=0))) if post.sum() >= 2 else np.nan
+
+        features = {
+            "peak_down_velocity": downward[impact_index],
+            "seconds_since_impact": times[-1] - impact_time,
+            "torso_angle": np.nanmedian(torso_angle[post]) if post.any() else np.nan,
+            "aspect_ratio": np.nanmedian(aspect[post]) if post.any() else np.nan,
+            "stillness": stillness,
+        }
+    # NaN (not enough visible landmarks) becomes None so features stay JSON-serializable
+    return {k: None if np.isnan(v) else round(float(v), 4) for k, v in features.items()}
+
+
+def is_fall(features: dict | None) -> bool:
+    if not features or any(v is None for v in features.values()):
+        return False
+    lying = features["torso_angle"] >= LYING_TORSO_DEGREES or features["aspect_ratio"] >= LYING_ASPECT
+    return bool(
+        features["peak_down_velocity"] >= IMPACT_VELOCITY
+        and features["seconds_since_impact"] >= STILL_SECONDS
+        and lying
+        and features["stillness"] <= STILL_MOTION
+    )
+
+
+class FallDetector:
+    """
+    Tracks many concurrent camera sessions with bounded memory: at most MAX_SESSIONS
+    ring buffers, least-recently-seen sessions are evicted first.
+    """
+
+    def __init__(self, max_sessions: int = MAX_SESSIONS, window: int = WINDOW_FRAMES):
+        self.max_sessions = max_sessions
+        self.window = window
+        self._sessions: OrderedDict[tuple, PoseSession] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _session(self, key: tuple, user_id: int) -> PoseSession:
+        with self._lock:
+            session = self._sessions.get(key)
+            if session is None:
+                session = PoseSession(user_id, self.window)
+                self._sessions[key] = session
+            self._sessions.move_to_end(key)
+            now = time.monotonic()
+            session.last_seen = now
+            while self._sessions:
+                oldest_key, oldest = next(iter(self._sessions.items()))
+                if len(self._sessions) <= self.max_sessions and now - oldest.last_seen < SESSION_IDLE_SECONDS:
+                    break
+                del self._sessions[oldest_key]
+            return session
+
+    def push(self, user_id: int, camera_id: str, frames: np.ndarray, times: np.ndarray):
+        """
+        Appends a batch of frames and evaluates the window.
+        Returns (fired, features); fired is True at most once per cooldown.
+        """
+        session = self._session((user_id, camera_id), user_id)
+        with session.lock:
+            session.extend(frames.astype(np.float32, copy=False), times.astype(np.float64, copy=False))
+            features = compute_features(*session.ordered())
+            fired = False
+            if is_fall(features) and time.monotonic() >= session.cooldown_until:
+                session.cooldown_until = time.monotonic() + COOLDOWN_SECONDS
+                fired = True
+        return fired, features
+
+    def reset(self, user_id: int, camera_id: str):
+        with self._lock:
+            self._sessions.pop((user_id, camera_id), None)
+
+    @property
+    def active_sessions(self) -> int:
+        return len(self._sessions)
+
+
+fall_detector = FallDetector()
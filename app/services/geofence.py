@@ -0,0 +1,339 @@
+import json
+import math
+import os
+import threading
+from dataclasses import dataclass, field, replace
+from datetime import datetime, timezone
+from sqlmodel import Session, select
+from app.db import engine
+from app.models.location import Geofence, GeofenceCreate, GeofenceEvent, LocationFix, LocationSample
+
+# Grid cell edge in degrees (0.01 deg of latitude ~ 1.1 km)
+GEOFENCE_CELL_DEG = float(os.getenv("GEOFENCE_CELL_DEG", "0.01"))
+# Fences spanning more cells than this skip the grid and are always checked
+GEOFENCE_MAX_CELLS = int(os.getenv("GEOFENCE_MAX_CELLS", "4096"))
+# Debounce: a breach/return needs this many consecutive fixes spanning this long
+GEOFENCE_CONFIRM_FIXES = int(os.getenv("GEOFENCE_CONFIRM_FIXES", "3"))
+GEOFENCE_CONFIRM_SECONDS = float(os.getenv("GEOFENCE_CONFIRM_SECONDS", "60"))
+# Fixes less accurate than this are stored but not evaluated
+GEOFENCE_MAX_ACCURACY_M = float(os.getenv("GEOFENCE_MAX_ACCURACY_M", "150"))
+
+MAX_FIXES_PER_BATCH = 500
+EARTH_RADIUS_M = 6371000.0
+METERS_PER_DEG_LAT = 111320.0
+
+
+def distance_m(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Haversine distance in meters."""
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp, dl = p2 - p1, math.radians(lon2 - lon1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(math.sqrt(a))
+
+
+@dataclass
+class Fence:
+    id: int
+    user_id: int
+    name: str
+    kind: str
+    center: tuple[float, float] | None = None
+    radius_m: float | None = None
+    polygon: list[tuple[float, float]] = field(default_factory=list)
+    bbox: tuple[float, float, float, float] = (0, 0, 0, 0) # min_lat, min_lon, max_lat, max_lon
+
+    @classmethod
+    def from_row(cls, row: Geofence) -> "Fence":
+        if row.kind == "circle":
+            lat, lon = row.center_lat, row.center_lon
+            dlat = row.radius_m / METERS_PER_DEG_LAT
+            dlon = row.radius_m / (METERS_PER_DEG_LAT * max(math.cos(math.radians(lat)), 1e-6))
+            return cls(row.id, row.user_id, row.name, "circle", (lat, lon), row.radius_m,
+                       bbox=(lat - dlat, lon - dlon, lat + dlat, lon + dlon))
+        polygon = [(lat, lon) for lat, lon in json.loads(row.polygon)]
+        lats, lons = [p[0] for p in polygon], [p[1] for p in polygon]
+        return cls(row.id, row.user_id, row.name, "polygon", polygon=polygon,
+                   bbox=(min(lats), min(lons), max(lats), max(lons)))
+
+    def contains(self, lat: float, lon: float) -> bool:
+        min_lat, min_lon, max_lat, max_lon = self.bbox
+        if not (min_lat <= lat <= max_lat and min_lon <= lon <= max_lon):
+            return False
+        if self.kind == "circle":
+            return distance_m(lat, lon, *self.center) <= self.radius_m
+        # Ray casting in lat/lon space; fine at geofence scale
+        inside = False
+        points = self.polygon
+        for (lat1, lon1), (lat2, lon2) in zip(points, points[1:] + points[:1]):
+            if (lon1 > lon) != (lon2 > lon):
+                if lat < lat1 + (lon - lon1) * (lat2 - lat1) / (lon2 - lon1):
+                    inside = not inside
+        return inside
+
+
+@dataclass
+class FenceState:
+    state: str | None = None # confirmed "inside"/"outside"
+    pending: str | None = None # candidate state being debounced
+    pending_since: float = 0.0
+    pending_count: int = 0
+
+
+@dataclass
+class Evaluation:
+    """Outcome of GeofenceIndex.plan(): events plus the user's state after them, not yet applied."""
+    user_id: int
+    events: list[dict]
+    last_fix: float | None = None
+    states: dict[int, FenceState] = field(default_factory=dict) # touched fences only
+    watch: set[int] = field(default_factory=set)
+
+
+class GeofenceIndex:
+    """
+    Uniform grid hash over every active fence. A fix only tests the fences whose
+    bounding box overlaps its cell, plus the user's fences that are currently
+    "inside" or mid-debounce (those must notice the user leaving). So a fix costs
+    O(fences near it), not O(all fences).
+
+    State changes are debounced: a breach or return is confirmed only after
+    GEOFENCE_CONFIRM_FIXES consecutive fixes spanning GEOFENCE_CONFIRM_SECONDS,
+    so GPS jitter at the boundary doesn't flap alerts.
+    """
+
+    def __init__(self, cell_deg: float = GEOFENCE_CELL_DEG, confirm_fixes: int = GEOFENCE_CONFIRM_FIXES,
+                 confirm_seconds: float = GEOFENCE_CONFIRM_SECONDS, max_accuracy_m: float = GEOFENCE_MAX_ACCURACY_M):
+        self.cell_deg = cell_deg
+        self.confirm_fixes = confirm_fixes
+        self.confirm_seconds = confirm_seconds
+        self.max_accuracy_m = max_accuracy_m
+        self.loaded = False
+        self._fences: dict[int, Fence] = {}
+        self._states: dict[int, FenceState] = {}
+        self._cells: dict[tuple[int, int, int], list[Fence]] = {} # (user_id, row, col) -> fences
+        self._large: dict[int, list[Fence]] = {} # user_id -> fences too big for the grid
+        self._watch: dict[int, set[int]] = {} # user_id -> fence ids inside or pending
+        self._last_fix: dict[int, float] = {}
+        self._lock = threading.RLock()
+        self.counters = {"fixes": 0, "skipped": 0, "candidates": 0, "events": 0}
+
+    def _cell(self, value: float) -> int:
+        return math.floor(value / self.cell_deg)
+
+    def _cells_of(self, fence: Fence):
+        min_lat, min_lon, max_lat, max_lon = fence.bbox
+        rows = range(self._cell(min_lat), self._cell(max_lat) + 1)
+        cols = range(self._cell(min_lon), self._cell(max_lon) + 1)
+        if len(rows) * len(cols) > GEOFENCE_MAX_CELLS:
+            return None
+        return [(fence.user_id, r, c) for r in rows for c in cols]
+
+    def load(self, rows: list[Geofence]):
+        with self._lock:
+            self._fences.clear()
+            self._states.clear()
+            self._cells.clear()
+            self._large.clear()
+            self._watch.clear()
+            for row in rows:
+                self.add(row)
+            self.loaded = True
+
+    def add(self, row: Geofence):
+        with self._lock:
+            self.remove(row.id)
+            fence = Fence.from_row(row)
+            self._fences[fence.id] = fence
+            self._states[fence.id] = FenceState(state=row.state)
+            cells = self._cells_of(fence)
+            if cells is None:
+                self._large.setdefault(fence.user_id, []).append(fence)
+            else:
+                for cell in cells:
+                    self._cells.setdefault(cell, []).append(fence)
+            if row.state == "inside":
+                self._watch.setdefault(fence.user_id, set()).add(fence.id)
+
+    def remove(self, fence_id: int):
+        with self._lock:
+            fence = self._fences.pop(fence_id, None)
+            if fence is None:
+                return
+            self._states.pop(fence_id, None)
+            self._watch.get(fence.user_id, set()).discard(fence_id)
+            cells = self._cells_of(fence)
+            if cells is None:
+                self._large[fence.user_id].remove(fence)
+            else:
+                for cell in cells:
+                    bucket = self._cells[cell]
+                    bucket.remove(fence)
+                    if not bucket:
+                        del self._cells[cell]
+
+    def evaluate(self, user_id: int, fixes: list[dict]) -> list[dict]:
+        """plan() and apply() in one step, for callers with nothing to persist in between."""
+        evaluation = self.plan(user_id, fixes)
+        self.apply(evaluation)
+        return evaluation.events
+
+    def plan(self, user_id: int, fixes: list[dict]) -> Evaluation:
+        """
+        Runs fixes (dicts with timestamp, latitude, longitude, accuracy_m) through
+        the debouncer and returns confirmed breach/return events. Confirmed state
+        changes are also returned as events with kind None (first entry into a fence
+        whose state was unknown), so callers can persist every state.
+        Works on copies: nothing changes until apply(), so a caller whose commit
+        fails can drop the result and the fixes are evaluated again on retry.
+        """
+        with self._lock:
+            evaluation = Evaluation(user_id, [], self._last_fix.get(user_id), watch=set(self._watch.get(user_id, ())))
+            for fix in sorted(fixes, key=lambda f: f["timestamp"]):
+                at = fix["timestamp"].timestamp()
+                accuracy = fix.get("accuracy_m")
+                if at <= (evaluation.last_fix or 0) or (accuracy is not None and accuracy > self.max_accuracy_m):
+                    self.counters["skipped"] += 1
+                    continue
+                evaluation.last_fix = at
+                self.counters["fixes"] += 1
+
+                lat, lon = fix["latitude"], fix["longitude"]
+                candidates = self._cells.get((user_id, self._cell(lat), self._cell(lon)), []) + self._large.get(user_id, [])
+                self.counters["candidates"] += len(candidates)
+                inside = {fence.id for fence in candidates if fence.contains(lat, lon)}
+                for fence_id in inside | evaluation.watch:
+                    st = evaluation.states.get(fence_id)
+                    if st is None:
+                        st = evaluation.states[fence_id] = replace(self._states[fence_id])
+                    kind = self._observe(st, evaluation.watch, fence_id, fence_id in inside, at)
+                    if kind is not False:
+                        fence = self._fences[fence_id]
+                        evaluation.events.append({
+                            "geofence_id": fence_id, "name": fence.name, "kind": kind,
+                            "state": st.state, "timestamp": fix["timestamp"],
+                            "latitude": lat, "longitude": lon,
+                        })
+        return evaluation
+
+    def apply(self, evaluation: Evaluation):
+        """Makes a plan() result current; call once its events and states are committed."""
+        with self._lock:
+            user_id = evaluation.user_id
+            if evaluation.last_fix is not None:
+                self._last_fix[user_id] = max(evaluation.last_fix, self._last_fix.get(user_id, 0))
+            watch = self._watch.setdefault(user_id, set())
+            for fence_id, st in evaluation.states.items():
+                if fence_id not in self._fences:
+                    continue # removed meanwhile
+                self._states[fence_id] = st
+                if fence_id in evaluation.watch:
+                    watch.add(fence_id)
+                else:
+                    watch.discard(fence_id)
+            self.counters["events"] += sum(1 for e in evaluation.events if e["kind"])
+
+    def _observe(self, st: FenceState, watch: set[int], fence_id: int, is_inside: bool, at: float):
+        """Returns "breach"/"return"/None on a confirmed change, False otherwise."""
+        observed = "inside" if is_inside else "outside"
+        if observed == (st.state or "outside"):
+            st.pending = None
+            if st.state != "inside":
+                watch.discard(fence_id)
+            return False
+        if st.pending != observed:
+            st.pending, st.pending_since, st.pending_count = observed, at, 0
+            watch.add(fence_id)
+        st.pending_count += 1
+        if st.pending_count < self.confirm_fixes or at - st.pending_since < self.confirm_seconds:
+            return False
+
+        previous, st.state, st.pending = st.state, observed, None
+        if observed == "inside":
+            watch.add(fence_id)
+            return "return" if previous == "outside" else None
+        watch.discard(fence_id)
+        return "breach"
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                **self.counters,
+                "fences": len(self._fences),
+                "cells": len(self._cells),
+                "large_fences": sum(len(f) for f in self._large.values()),
+                "watched": sum(len(w) for w in self._watch.values()),
+            }
+
+
+geofence_index = GeofenceIndex()
+
+
+def ensure_loaded():
+    """Builds the index from every active fence on first use (or at startup warm-up)."""
+    if geofence_index.loaded:
+        return
+    with geofence_index._lock:
+        if geofence_index.loaded:
+            return
+        with Session(engine) as session:
+            geofence_index.load(session.exec(select(Geofence).where(Geofence.active == True)).all()) # noqa: E712
+
+
+def geofence_from_request(request: GeofenceCreate, user_id: int) -> Geofence:
+    """Validates a create request; raises ValueError with a client-facing message."""
+    if request.kind == "circle":
+        if request.center_lat is None or request.center_lon is None or request.radius_m is None:
+            raise ValueError("A circle needs center_lat, center_lon and radius_m")
+        return Geofence(user_id=user_id, name=request.name, kind="circle", center_lat=request.center_lat,
+                        center_lon=request.center_lon, radius_m=request.radius_m)
+    if request.kind == "polygon":
+        points = request.polygon or []
+        if len(points) < 3 or any(len(p) != 2 or not (-90 <= p[0] <= 90 and -180 <= p[1] <= 180) for p in points):
+            raise ValueError("A polygon needs at least 3 [lat, lon] vertices")
+        return Geofence(user_id=user_id, name=request.name, kind="polygon", polygon=json.dumps(points))
+    raise ValueError("kind must be 'circle' or 'polygon'")
+
+
+def _naive_utc(timestamp: datetime) -> datetime:
+    # Same convention as telemetry.sample_to_record: aware client times (toISOString's "Z")
+    # become naive UTC, as does the server's own clock for fixes without a timestamp
+    if timestamp.tzinfo is not None:
+        return timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+    return timestamp
+
+
+def record_fixes(session: Session, user_id: int, samples: list[LocationSample]) -> list[dict]:
+    """
+    Stores a batch of fixes, evaluates them against the user's fences and persists
+    the resulting state changes and breach/return events in the same commit.
+    Returns the breach/return events for the caller to dispatch.
+    """
+    ensure_loaded()
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    fixes = [
+        {"user_id": user_id, "timestamp": _naive_utc(s.timestamp or now), "latitude": s.latitude,
+         "longitude": s.longitude, "accuracy_m": s.accuracy_m, "source": s.source}
+        for s in samples
+    ]
+    session.execute(LocationFix.__table__.insert(), fixes)
+
+    # Evaluated on copies and applied only after the commit: a failed commit (locked DB)
+    # leaves the in-memory debounce state matching the DB, and a retry re-detects the breach
+    evaluation = geofence_index.plan(user_id, fixes)
+    changes = evaluation.events
+    states = {}
+    for change in changes:
+        states[change["geofence_id"]] = change["state"]
+        if change["kind"]:
+            session.add(GeofenceEvent(
+                geofence_id=change["geofence_id"], user_id=user_id, kind=change["kind"],
+                timestamp=change["timestamp"], latitude=change["latitude"], longitude=change["longitude"],
+            ))
+    for fence_id, state in states.items():
+        fence = session.get(Geofence, fence_id)
+        if fence:
+            fence.state = state
+            session.add(fence)
+    session.commit()
+    geofence_index.apply(evaluation)
+    return [change for change in changes if change["kind"]]
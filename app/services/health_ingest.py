@@ -0,0 +1,138 @@
+import os
+import time
+from sqlmodel import Session
+from app.models.health import HealthMetric
+from app.services.rollups import apply_rollups
+from app.services.startup import lazy_import
+
+pd = lazy_import("pandas")
+
+# Rows parsed and inserted per round trip. 50k rows of watch data is a few MB of frame.
+CHUNK_ROWS = int(os.getenv("HEALTH_UPLOAD_CHUNK_ROWS", "50000"))
+
+# Accepted CSV headers per HealthMetric column, matched case-insensitively.
+COLUMN_ALIASES = {
+    "timestamp": ("time", "timestamp", "datetime", "date"),
+    "heart_rate": ("heartrate", "heart_rate", "hr"),
+    "steps": ("steps", "step_count"),
+    "sleep_minutes": ("sleepminutes", "sleep_minutes", "sleep"),
+    "spo2": ("spo2", "oxygen_saturation"),
+}
+VITAL_COLUMNS = ("heart_rate", "steps", "sleep_minutes", "spo2")
+# Accepted value range per vital; anything outside (or unparsable) is dropped from the row
+VITAL_RANGES = {
+    "heart_rate": (0, 300),
+    "steps": (0, 2**31 - 1),
+    "sleep_minutes": (0, 2**31 - 1),
+    "spo2": (0, 100),
+}
+
+
+def map_columns(columns) -> dict:
+    """
+    Resolves CSV headers to HealthMetric columns. Returns {metric_column: csv_header}.
+    """
+    lowered = {str(c).strip().lower(): c for c in columns}
+    mapping = {}
+    for target, aliases in COLUMN_ALIASES.items():
+        for alias in aliases:
+            if alias in lowered:
+                mapping[target] = lowered[alias]
+                break
+    return mapping
+
+
+def normalize_chunk(chunk: "pd.DataFrame", mapping: dict, user_id: int, source: str):
+    """
+    Maps one raw CSV chunk to HealthMetric columns with vectorized operations.
+    Returns (frame, rejected) where rejected counts rows with no usable timestamp or vitals.
+    """
+    frame = pd.DataFrame(index=chunk.index)
+    # utc=True also handles mixed offsets; stored as naive UTC like pushed telemetry
+    timestamps = pd.to_datetime(chunk[mapping["timestamp"]], errors="coerce", utc=True)
+    frame["timestamp"] = timestamps.dt.tz_convert(None)
+
+    for column in VITAL_COLUMNS:
+        if column in mapping:
+            low, high = VITAL_RANGES[column]
+            values = pd.to_numeric(chunk[mapping[column]], errors="coerce").astype("float64")
+            frame[column] = values.where((values >= low) & (values <= high)).round().astype("Int64")
+        else:
+            frame[column] = pd.Series(pd.NA, index=chunk.index, dtype="Int64")
+
+    valid = frame["timestamp"].notna() & frame[list(VITAL_COLUMNS)].notna().any(axis=1)
+    frame = frame[valid]
+    frame["user_id"] = user_id
+    frame["source"] = source
+    return frame, int((~valid).sum())
+
+
+def frame_to_records(frame: "pd.DataFrame") -> list[dict]:
+    """
+    Converts a normalized frame to plain-Python row dicts suitable for a DBAPI executemany.
+    """
+    columns = {
+        "user_id": frame["user_id"].tolist(),
+        "timestamp": frame["timestamp"].astype(object).tolist(),
+        "source": frame["source"].tolist(),
+        "fall_detected": [False] * len(frame),
+        "inactivity_alert": [False] * len(frame),
+    }
+    for column in VITAL_COLUMNS:
+        series = frame[column].astype(object)
+        columns[column] = series.where(frame[column].notna(), None).tolist()
+    names = list(columns)
+    return [dict(zip(names, row)) for row in zip(*columns.values())]
+
+
+def insert_metric_records(session: Session, records: list[dict]):
+    """
+    Writes many HealthMetric rows with a single Core executemany insert and folds them
+    into the rollup tables in the same transaction.
+    Bypasses the ORM unit of work, so every record must carry all non-null columns.
+    """
+    if not records:
+        return
+    session.execute(HealthMetric.__table__.insert(), records)
+    apply_rollups(session, records)
+
+
+def ingest_csv(fileobj, user_id: int, session: Session, source: str = "samsung_watch", chunk_rows: int = CHUNK_ROWS) -> dict:
+    """
+    Streams a watch export CSV in chunks and bulk-inserts each chunk.
+    The whole upload is one transaction: either every accepted row lands or none do.
+    """
+    started = time.perf_counter()
+    imported = 0
+    rejected = 0
+    chunks = 0
+    mapping = None
+
+    for chunk in pd.read_csv(fileobj, chunksize=chunk_rows, encoding="utf-8"):
+        if mapping is None:
+            mapping = map_columns(chunk.columns)
+            if "timestamp" not in mapping:
+                raise ValueError("missing Time column")
+            if not any(c in mapping for c in VITAL_COLUMNS):
+                raise ValueError("no recognised vitals columns (HeartRate, Steps, SleepMinutes, SpO2)")
+
+        try:
+            frame, chunk_rejected = normalize_chunk(chunk, mapping, user_id, source)
+            records = frame_to_records(frame)
+        except (TypeError, AttributeError, OverflowError) as e:
+            # Values pandas can't coerce; surfaced to the client as a 400
+            raise ValueError(f"could not parse rows {chunks * chunk_rows + 1}-{chunks * chunk_rows + len(chunk)}: {e}")
+        insert_metric_records(session, records)
+        imported += len(frame)
+        rejected += chunk_rejected
+        chunks += 1
+
+    session.commit()
+    elapsed = time.perf_counter() - started
+    return {
+        "imported": imported,
+        "rejected": rejected,
+        "chunks": chunks,
+        "elapsed_seconds": round(elapsed, 3),
+        "rows_per_second": round((imported + rejected) / elapsed, 1) if elapsed > 0 else None,
+    }
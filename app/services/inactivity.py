@@ -0,0 +1,240 @@
+import heapq
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from sqlmodel import Session, select
+from app.db import engine
+from app.models.health import HealthMetric, InactivitySetting
+from app.models.user import User, UserRole
+from app.services.caregiver_overview import invalidate_elders
+from app.services.event_hub import publish_alert
+from app.services.whatsapp import send_emergency_alert
+
+logger = logging.getLogger(__name__)
+
+# Default window before an elder with no activity triggers an alert (6 hours)
+DEFAULT_WINDOW_MINUTES = int(os.getenv("INACTIVITY_WINDOW_MINUTES", "360"))
+
+
+class InactivityMonitor:
+    """
+    In-memory last-activity index plus a deadline min-heap.
+
+    touch() is an O(1) dict write on the hot path. The heap holds one entry per
+    monitored user; when an entry comes due the monitor compares it with the user's
+    real deadline (last activity + window) and either re-arms it or fires. So the
+    timer thread only wakes for expirations and at most one re-arm per user per
+    window, never for a full table scan.
+    """
+
+    def __init__(self, on_expire, default_window_minutes: int = DEFAULT_WINDOW_MINUTES):
+        self._on_expire = on_expire
+        self.default_window = default_window_minutes * 60
+        self._last: dict[int, float] = {}
+        self._windows: dict[int, float] = {} # per-user overrides, seconds; 0 disables
+        self._scheduled: dict[int, float] = {} # user_id -> deadline of their live heap entry
+        self._alerted: set[int] = set()
+        self._heap: list[tuple[float, int]] = []
+        self._cond = threading.Condition()
+        self._thread = None
+        self._stopping = False
+        self.fired = 0
+
+    def window(self, user_id: int) -> float:
+        return self._windows.get(user_id, self.default_window)
+
+    def touch(self, user_id: int, at: float | None = None):
+        """Records activity for a user (ingest, fall alert, authenticated request)."""
+        at = at or time.time()
+        if at <= self._last.get(user_id, 0):
+            return
+        self._last[user_id] = at
+        if user_id in self._scheduled and user_id not in self._alerted:
+            return # live heap entry will be re-armed lazily when it comes due
+        with self._cond:
+            self._alerted.discard(user_id)
+            self._schedule(user_id)
+
+    def set_window(self, user_id: int, minutes: int | None, enabled: bool = True):
+        with self._cond:
+            if not enabled:
+                self._windows[user_id] = 0
+            elif minutes is None:
+                self._windows.pop(user_id, None)
+            else:
+                self._windows[user_id] = minutes * 60
+            if user_id in self._last:
+                self._schedule(user_id)
+
+    def status(self, user_id: int) -> dict:
+        last = self._last.get(user_id)
+        window = self.window(user_id)
+        return {
+            "status": "inactive" if user_id in self._alerted else "active",
+            "last_activity": datetime.fromtimestamp(last) if last else None,
+            "window_minutes": int(window // 60) if window else None,
+            "next_check": datetime.fromtimestamp(self._scheduled[user_id]) if user_id in self._scheduled else None,
+        }
+
+    def load(self, last_activity: dict[int, float], windows: dict[int, tuple[int, bool]], alerted: set[int] = frozenset()):
+        """
+        Bulk-initializes the index (startup rebuild) and heapifies once. Safe to call
+        after start(): the monitor may already be running when the rebuild lands.
+        Users in `alerted` were already alerted for their current silence; they stay
+        unscheduled until their next activity, so a restart doesn't alert them again.
+        """
+        with self._cond:
+            for user_id, (minutes, enabled) in windows.items():
+                self._windows[user_id] = minutes * 60 if enabled else 0
+            for user_id, last in last_activity.items():
+                # Activity touched while the index was loading is newer; keep it
+                if last > self._last.get(user_id, 0):
+                    self._last[user_id] = last
+                    if user_id in alerted:
+                        self._alerted.add(user_id)
+            entries = []
+            for user_id, last in self._last.items():
+                if user_id in self._alerted:
+                    continue
+                window = self.window(user_id)
+                if window:
+                    self._scheduled[user_id] = last + window
+                    entries.append((last + window, user_id))
+            self._heap = entries
+            heapq.heapify(self._heap)
+            self._cond.notify()
+
+    def start(self):
+        with self._cond:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name="inactivity-monitor", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        if self._thread:
+            self._thread.join(5)
+            self._thread = None
+
+    def _schedule(self, user_id: int):
+        # Caller holds self._cond
+        window = self.window(user_id)
+        if not window:
+            self._scheduled.pop(user_id, None)
+            return
+        deadline = self._last[user_id] + window
+        self._scheduled[user_id] = deadline
+        heapq.heappush(self._heap, (deadline, user_id))
+        if self._heap[0] == (deadline, user_id):
+            self._cond.notify()
+
+    def _collect_expired(self, now: float) -> list[tuple[int, float]]:
+        # Caller holds self._cond
+        expired = []
+        while self._heap and self._heap[0][0] <= now:
+            deadline, user_id = heapq.heappop(self._heap)
+            if self._scheduled.get(user_id) != deadline:
+                continue # stale entry, superseded by a later schedule
+            del self._scheduled[user_id]
+            window = self.window(user_id)
+            if not window:
+                continue
+            actual = self._last[user_id] + window
+            if actual > now:
+                self._scheduled[user_id] = actual
+                heapq.heappush(self._heap, (actual, user_id))
+                continue
+            self._alerted.add(user_id)
+            expired.append((user_id, self._last[user_id]))
+        return expired
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if self._stopping:
+                    return
+                expired = self._collect_expired(time.time())
+                if not expired:
+                    timeout = max(0.0, self._heap[0][0] - time.time()) if self._heap else None
+                    self._cond.wait(timeout)
+                    continue
+            for user_id, last in expired:
+                self.fired += 1
+                try:
+                    self._on_expire(user_id, last)
+                except Exception:
+                    logger.exception("Inactivity alert error for user %s", user_id)
+
+
+def record_inactivity_alert(user_id: int, last_activity: float):
+    """
+    Expiration handler: stores an inactivity_alert metric and notifies emergency contacts.
+    """
+    with Session(engine) as session:
+        user = session.get(User, user_id)
+        if user is None:
+            return
+        # Naive UTC like the activity rows, so rebuild_index can compare the two
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        session.add(HealthMetric(user_id=user_id, timestamp=now, source="inactivity_monitor", inactivity_alert=True))
+        session.commit()
+        invalidate_elders([user_id])
+        publish_alert(user_id, "inactivity", last_activity=datetime.fromtimestamp(last_activity, timezone.utc).replace(tzinfo=None))
+
+        contacts = []
+        if user.emergency_contacts:
+            try:
+                contacts = json.loads(user.emergency_contacts)
+            except ValueError:
+                pass
+
+    since = datetime.fromtimestamp(last_activity).strftime("%Y-%m-%d %H:%M")
+    send_emergency_alert(user.full_name, contacts, f"Unknown (no activity since {since})")
+
+
+def rebuild_index(monitor: "InactivityMonitor"):
+    """
+    Startup rebuild: every elder's latest real activity and latest inactivity alert in
+    one query, plus the (small) settings table. Alert rows (inactivity, fall) are not
+    activity; an elder whose newest alert postdates their last activity stays alerted.
+    """
+    activity = HealthMetric.__table__.alias("activity")
+    alert = HealthMetric.__table__.alias("alert")
+
+    def latest(table, *conditions):
+        # Correlated LIMIT 1: a backwards walk of a (user_id, timestamp) index
+        return (
+            select(table.c.timestamp)
+            .where(table.c.user_id == User.id, *conditions)
+            .order_by(table.c.timestamp.desc())
+            .limit(1)
+            .correlate(User)
+            .scalar_subquery()
+        )
+
+    with Session(engine) as session:
+        rows = session.exec(
+            select(
+                User.id,
+                latest(activity, activity.c.inactivity_alert == False, activity.c.fall_detected == False), # noqa: E712
+                latest(alert, alert.c.inactivity_alert == True), # noqa: E712
+            )
+            .where(User.role == UserRole.ELDER)
+        ).all()
+        settings = session.exec(select(InactivitySetting)).all()
+    monitor.load(
+        # Stored timestamps are naive UTC; .timestamp() alone would read them as local time
+        {user_id: last.replace(tzinfo=timezone.utc).timestamp() for user_id, last, _ in rows if last is not None},
+        {s.user_id: (s.window_minutes, s.enabled) for s in settings},
+        {user_id for user_id, last, alerted_at in rows if last is not None and alerted_at is not None and alerted_at >= last},
+    )
+
+
+inactivity_monitor = InactivityMonitor(record_inactivity_alert)
@@ -0,0 +1,322 @@
+import asyncio
+import contextvars
+import logging
+import os
+import re
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable
+
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+# When set, GET /metrics requires "Authorization: Bearer <token>"
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+METRICS_PREFIX = "eldercare"
+# How often the event loop / threadpool lag probe runs
+LAG_PROBE_SECONDS = float(os.getenv("METRICS_LAG_PROBE_SECONDS", "0.5"))
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5, 1.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250)
+
+
+class Histogram:
+    """
+    Prometheus-style histogram with fixed buckets. Per label set it keeps one count
+    per bucket plus sum and count; cumulative counts are only computed on render.
+    """
+
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...], buckets: tuple[float, ...]):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = buckets
+        self._series: dict[tuple, list] = {} # labels -> [bucket counts (+Inf last), sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = [(labels, list(counts), total) for labels, (counts, total) in self._series.items()]
+        for labels, counts, total in sorted(series):
+            base = _labels(self.labelnames, labels)
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), counts):
+                cumulative += count
+                le = f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{{{base + ',' if base else ''}{le}}} {cumulative}")
+            suffix = f"{{{base}}}" if base else ""
+            lines.append(f"{self.name}_sum{suffix} {total}")
+            lines.append(f"{self.name}_count{suffix} {cumulative}")
+        return lines
+
+
+def _labels(names: tuple[str, ...], values: tuple) -> str:
+    return ",".join(f'{name}="{str(value)}"' for name, value in zip(names, values))
+
+
+def _metric_name(*parts: str) -> str:
+    return re.sub(r"[^a-zA-Z0-9_]", "_", "_".join(parts))
+
+
+def _flatten(prefix: str, value, out: list[tuple[str, float]]):
+    # Numbers and booleans become gauges; strings, lists and None are skipped
+    if isinstance(value, bool):
+        out.append((prefix, int(value)))
+    elif isinstance(value, (int, float)):
+        out.append((prefix, value))
+    elif isinstance(value, dict):
+        for key, item in value.items():
+            _flatten(f"{prefix}_{key}", item, out)
+
+
+class MetricsRegistry:
+    """
+    Histograms recorded in-process plus "collectors": the stats() of existing
+    services, read only when /metrics is scraped and exported as gauges.
+    """
+
+    def __init__(self, prefix: str = METRICS_PREFIX):
+        self.prefix = prefix
+        self.histograms: list[Histogram] = []
+        self.collectors: dict[str, Callable[[], dict]] = {}
+
+    def histogram(self, name: str, help: str, labelnames: tuple[str, ...] = (), buckets: tuple[float, ...] = LATENCY_BUCKETS) -> Histogram:
+        histogram = Histogram(_metric_name(self.prefix, name), help, labelnames, buckets)
+        self.histograms.append(histogram)
+        return histogram
+
+    def register(self, name: str, collector: Callable[[], dict]):
+        self.collectors[name] = collector
+
+    def render(self) -> str:
+        lines = []
+        for histogram in self.histograms:
+            lines.extend(histogram.render())
+        for name, collector in self.collectors.items():
+            try:
+                values = []
+                _flatten(_metric_name(self.prefix, name), collector(), values)
+            except Exception:
+                logger.exception("Metrics collector %s failed", name)
+                continue
+            for metric, value in values:
+                lines.append(f"# TYPE {metric} gauge")
+                lines.append(f"{metric} {value}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+
+http_duration = metrics.histogram(
+    "http_request_duration_seconds", "Time until the response body finished, by route template",
+    ("method", "route", "status"),
+)
+request_statements = metrics.histogram(
+    "db_statements_per_request", "SQL statements executed while serving one request (N+1 queries show up here)",
+    ("route",), QUERY_COUNT_BUCKETS,
+)
+request_db_time = metrics.histogram(
+    "db_seconds_per_request", "Time spent in SQL statements while serving one request", ("route",),
+)
+statement_duration = metrics.histogram(
+    "db_statement_duration_seconds", "Duration of single SQL statements; context is request or background",
+    ("operation", "context"), STATEMENT_BUCKETS,
+)
+external_duration = metrics.histogram(
+    "external_call_duration_seconds", "Calls to external APIs by outcome (ok/error), one sample per attempt",
+    ("service", "operation", "outcome"),
+)
+loop_lag = metrics.histogram("event_loop_lag_seconds", "How late the event loop ran a timer")
+threadpool_lag = metrics.histogram("threadpool_lag_seconds", "Wait for a threadpool worker to pick up a sync route or call")
+
+
+# --- Per-request accounting ---
+
+class RequestStats:
+    __slots__ = ("statements", "db_seconds", "done")
+
+    def __init__(self):
+        self.statements = 0
+        self.db_seconds = 0.0
+        self.done = False # response sent; later statements (background tasks) aren't the request's
+
+
+# Set by the middleware; run_in_threadpool copies the context, so sync routes share it
+_current_request: contextvars.ContextVar[RequestStats | None] = contextvars.ContextVar("metrics_request", default=None)
+
+
+def _route_label(scope) -> str:
+    route = scope.get("route")
+    if route is not None:
+        return route.path
+    if scope.get("endpoint") is not None:
+        # Mounted apps (static files): one label for the whole mount
+        return f"{scope.get('root_path', '')}/{{path}}"
+    return "unmatched"
+
+
+class MetricsMiddleware:
+    """
+    Plain ASGI middleware (no BaseHTTPMiddleware, so responses aren't re-wrapped).
+    Records latency by route template and the SQL statements each request ran, up to
+    the last body chunk: Starlette runs BackgroundTasks before the app call returns,
+    and neither their time nor their SQL belongs to the request.
+    Server-sent event streams are counted but kept out of the latency histogram.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        started = time.perf_counter()
+        stats = RequestStats()
+        token = _current_request.set(stats)
+        status = 500
+        streaming = False
+
+        def record():
+            if stats.done:
+                return
+            stats.done = True
+            route = _route_label(scope)
+            if not streaming:
+                http_duration.observe(time.perf_counter() - started, scope["method"], route, f"{status // 100}xx")
+            request_statements.observe(stats.statements, route)
+            if stats.statements:
+                request_db_time.observe(stats.db_seconds, route)
+
+        async def send_with_status(message):
+            nonlocal status, streaming
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                for key, value in message.get("headers", ()):
+                    if key == b"content-type" and value.startswith(b"text/event-stream"):
+                        streaming = True
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                record()
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            _current_request.reset(token)
+            record() # no final body (error, disconnect)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info["metrics_started"] = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.pop("metrics_started", None)
+    if started is None:
+        return
+    elapsed = time.perf_counter() - started
+    operation = statement.lstrip().split(None, 1)[0].upper() if statement else "OTHER"
+    if operation not in ("SELECT", "INSERT", "UPDATE", "DELETE"):
+        operation = "OTHER"
+    stats = _current_request.get()
+    if stats is not None and stats.done:
+        stats = None
+    if stats is not None:
+        stats.statements += 1
+        stats.db_seconds += elapsed
+    statement_duration.observe(elapsed, operation, "request" if stats is not None else "background")
+
+
+def instrument_engine(engine):
+    """Times every statement on a (sync) engine; pass async_engine.sync_engine for async ones."""
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+@contextmanager
+def external_call(service: str, operation: str):
+    """Times one call to an external API; an exception counts as outcome "error"."""
+    started = time.perf_counter()
+    outcome = "error"
+    try:
+        yield
+        outcome = "ok"
+    finally:
+        external_duration.observe(time.perf_counter() - started, service, operation, outcome)
+
+
+# --- Event loop / threadpool lag ---
+
+def _now():
+    return time.perf_counter()
+
+
+class LagMonitor:
+    """
+    Every LAG_PROBE_SECONDS: how late a timer fired on the event loop (blocking
+    code in async routes) and how long a threadpool job waited for a worker
+    (sync routes queueing behind each other).
+    """
+
+    def __init__(self, interval: float = LAG_PROBE_SECONDS):
+        self.interval = interval
+        self.loop_lag = 0.0
+        self.threadpool_lag = 0.0
+        self.threadpool_busy = 0
+        self.threadpool_size = 0
+        self._task = None
+
+    def start(self):
+        """Call from within the running event loop (an async startup hook)."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        from anyio import to_thread
+        from fastapi.concurrency import run_in_threadpool
+
+        loop = asyncio.get_running_loop()
+        while True:
+            scheduled = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self.loop_lag = max(0.0, loop.time() - scheduled)
+            loop_lag.observe(self.loop_lag)
+
+            limiter = to_thread.current_default_thread_limiter()
+            self.threadpool_busy = limiter.borrowed_tokens
+            self.threadpool_size = limiter.total_tokens
+            submitted = time.perf_counter()
+            self.threadpool_lag = max(0.0, await run_in_threadpool(_now) - submitted)
+            threadpool_lag.observe(self.threadpool_lag)
+
+    def stats(self) -> dict:
+        return {
+            "loop_lag_seconds": round(self.loop_lag, 6),
+            "threadpool_lag_seconds": round(self.threadpool_lag, 6),
+            "threadpool_busy": self.threadpool_busy,
+            "threadpool_size": self.threadpool_size,
+        }
+
+
+lag_monitor = LagMonitor()
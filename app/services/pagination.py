@@ -0,0 +1,54 @@
+import base64
+from datetime import datetime
+from fastapi import HTTPException, Request, Response
+from sqlalchemy import tuple_
+from sqlmodel import Session
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 500
+
+
+def encode_cursor(timestamp: datetime, row_id: int) -> str:
+    raw = f"{timestamp.isoformat()}|{row_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        timestamp, row_id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(timestamp), int(row_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def keyset_page(session: Session, statement, timestamp_column, id_column, limit: int, before: str | None = None):
+    """
+    Newest-first keyset pagination over (timestamp, id).
+    The caller's statement carries the user filter; with a (user_id, timestamp) index
+    each page is an index range scan, so page N costs the same as page 1.
+    Returns (rows, next_cursor) where next_cursor is None on the last page.
+    """
+    if before:
+        cursor_ts, cursor_id = decode_cursor(before)
+        statement = statement.where(tuple_(timestamp_column, id_column) < tuple_(cursor_ts, cursor_id))
+    statement = statement.order_by(timestamp_column.desc(), id_column.desc()).limit(limit + 1)
+
+    rows = session.exec(statement).all()
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor(getattr(last, timestamp_column.key), last.id)
+
+
+def set_next_cursor(request: Request, response: Response, next_cursor: str | None):
+    """
+    Exposes the next page as an X-Next-Cursor header plus an RFC 8288 Link header,
+    keeping the list body unchanged for existing clients.
+    """
+    if next_cursor is None:
+        return
+    response.headers["X-Next-Cursor"] = next_cursor
+    next_url = request.url.include_query_params(before=next_cursor)
+    response.headers["Link"] = f'<{next_url}>; rel="next"'
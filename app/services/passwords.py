@@ -0,0 +1,118 @@
+# Password hashing off the request threadpool. bcrypt runs in a dedicated process
+# pool with admission control, so a login burst can't starve other sync endpoints.
+# Keep this module free of app imports: pool workers are spawned and import it fresh.
+import asyncio
+import multiprocessing
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from passlib.context import CryptContext
+
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+PASSWORD_WORKERS = int(os.getenv("PASSWORD_WORKERS", str(min(4, os.cpu_count() or 1))))
+PASSWORD_QUEUE_LIMIT = int(os.getenv("PASSWORD_QUEUE_LIMIT", str(PASSWORD_WORKERS * 8)))
+RETRY_AFTER_SECONDS = 2
+
+# Hashes made with other cost settings verify fine and are flagged for rehash
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
+
+
+class PasswordPoolBusy(Exception):
+    """Raised when the hashing queue is at PASSWORD_QUEUE_LIMIT."""
+
+
+def _hash(password: str):
+    started = time.time()
+    return pwd_context.hash(password), started, time.time()
+
+
+def _verify_and_update(password: str, hashed_password: str):
+    started = time.time()
+    try:
+        ok, new_hash = pwd_context.verify_and_update(password, hashed_password)
+    except ValueError: # malformed/unknown hash in the database
+        ok, new_hash = False, None
+    return (ok, new_hash), started, time.time()
+
+
+def _warm():
+    return os.getpid()
+
+
+class PasswordHasher:
+    def __init__(self, workers: int = PASSWORD_WORKERS, queue_limit: int = PASSWORD_QUEUE_LIMIT):
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self._executor = None
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self.rejected = 0
+        self.rehashed = 0
+        self.hash_seconds = deque(maxlen=1024) # time spent hashing in the worker
+        self.queue_wait_seconds = deque(maxlen=1024) # submit -> worker start
+
+    def start(self):
+        """Spawns the workers up front so the first login doesn't pay process start-up."""
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+                )
+                for _ in range(self.workers):
+                    self._executor.submit(_warm)
+        return self._executor
+
+    def stop(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True, cancel_futures=True)
+                self._executor = None
+
+    async def _run(self, fn, *args):
+        with self._lock:
+            if self._in_flight >= self.queue_limit:
+                self.rejected += 1
+                raise PasswordPoolBusy()
+            self._in_flight += 1
+        try:
+            submitted = time.time()
+            executor = self._executor or self.start()
+            result, started, finished = await asyncio.get_running_loop().run_in_executor(executor, fn, *args)
+            self.queue_wait_seconds.append(max(0.0, started - submitted))
+            self.hash_seconds.append(finished - started)
+            return result
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+    async def hash(self, password: str) -> str:
+        return await self._run(_hash, password)
+
+    async def verify(self, password: str, hashed_password: str) -> tuple[bool, str | None]:
+        """
+        Returns (ok, new_hash). new_hash is set when the stored hash used outdated
+        cost parameters and should be replaced.
+        """
+        ok, new_hash = await self._run(_verify_and_update, password, hashed_password)
+        if new_hash:
+            self.rehashed += 1
+        return ok, new_hash
+
+    def stats(self) -> dict:
+        def mean_ms(samples):
+            return round(sum(samples) / len(samples) * 1000, 2) if samples else None
+
+        return {
+            "workers": self.workers,
+            "in_flight": self._in_flight,
+            "queue_limit": self.queue_limit,
+            "rejected": self.rejected,
+            "rehashed": self.rehashed,
+            "hash_ms_mean": mean_ms(list(self.hash_seconds)),
+            "queue_wait_ms_mean": mean_ms(list(self.queue_wait_seconds)),
+        }
+
+
+password_hasher = PasswordHasher()
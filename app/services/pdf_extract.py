@@ -0,0 +1,133 @@
+# PDF text extraction off the request path. Large documents are split into page
+# ranges that are extracted in parallel in a process pool, under per-document page
+# and time budgets. Keep this module free of app imports: pool workers are spawned
+# and import it fresh.
+import multiprocessing
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_EXCEPTION, ProcessPoolExecutor, wait
+from dataclasses import dataclass
+
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", str(min(4, os.cpu_count() or 1))))
+PDF_MAX_PAGES = int(os.getenv("PDF_MAX_PAGES", "300"))
+PDF_TIME_BUDGET = float(os.getenv("PDF_TIME_BUDGET", "60"))
+# Pages per pool task; documents up to this size are extracted inline
+PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", "8"))
+
+
+@dataclass
+class ExtractionResult:
+    text: str
+    pages_total: int
+    pages_extracted: int
+    truncated: bool # more pages than PDF_MAX_PAGES
+    timed_out: bool # PDF_TIME_BUDGET ran out before every page was read
+    seconds: float
+
+
+def _extract_range(path: str, start: int, stop: int, deadline: float):
+    """Extracts pages [start, stop), stopping early once the deadline passes."""
+    import PyPDF2
+
+    texts = []
+    with open(path, "rb") as pdf_file:
+        reader = PyPDF2.PdfReader(pdf_file)
+        for index in range(start, stop):
+            if time.time() > deadline:
+                break
+            texts.append(reader.pages[index].extract_text() or "")
+    return start, texts
+
+
+class PdfExtractor:
+    def __init__(self, workers: int = PDF_WORKERS, max_pages: int = PDF_MAX_PAGES,
+                 time_budget: float = PDF_TIME_BUDGET, pages_per_task: int = PDF_PAGES_PER_TASK):
+        self.workers = workers
+        self.max_pages = max_pages
+        self.time_budget = time_budget
+        self.pages_per_task = pages_per_task
+        self._executor = None
+        self._lock = threading.Lock()
+        self.timings = deque(maxlen=1024) # (seconds, pages extracted) per document
+        self.timeouts = 0
+
+    def _pool(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+                )
+            return self._executor
+
+    def stop(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True, cancel_futures=True)
+                self._executor = None
+
+    def extract(self, path: str) -> ExtractionResult:
+        """
+        Returns the document text with pages in order. Raises the PyPDF2 error if the
+        file can't be parsed at all.
+        """
+        import PyPDF2
+
+        started = time.time()
+        deadline = started + self.time_budget
+        with open(path, "rb") as pdf_file:
+            pages_total = len(PyPDF2.PdfReader(pdf_file).pages)
+        pages = min(pages_total, self.max_pages)
+
+        if pages <= self.pages_per_task:
+            chunks = [_extract_range(path, 0, pages, deadline)]
+        else:
+            executor = self._pool()
+            futures = [
+                executor.submit(_extract_range, path, start, min(start + self.pages_per_task, pages), deadline)
+                for start in range(0, pages, self.pages_per_task)
+            ]
+            # Workers check the deadline per page; the grace period covers the page in progress
+            done, pending = wait(futures, timeout=max(0.0, deadline - time.time()) + 5, return_when=FIRST_EXCEPTION)
+            for future in pending:
+                future.cancel()
+            chunks = sorted(f.result() for f in done)
+
+        # Pages in order; ranges cut short by the deadline leave a visible gap marker
+        texts, extracted, expected = [], 0, 0
+        for start, chunk in chunks:
+            if start > expected:
+                texts.append(f"[pages {expected + 1}-{start} not extracted: time budget]")
+            texts.extend(chunk)
+            extracted += len(chunk)
+            expected = start + len(chunk)
+        if expected < pages:
+            texts.append(f"[pages {expected + 1}-{pages} not extracted: time budget]")
+
+        seconds = time.time() - started
+        timed_out = extracted < pages
+        if timed_out:
+            self.timeouts += 1
+        self.timings.append((seconds, extracted))
+        return ExtractionResult(
+            text="\n".join(texts),
+            pages_total=pages_total,
+            pages_extracted=extracted,
+            truncated=pages_total > pages,
+            timed_out=timed_out,
+            seconds=seconds,
+        )
+
+    def stats(self) -> dict:
+        timings = list(self.timings)
+        return {
+            "workers": self.workers,
+            "documents": len(timings),
+            "timeouts": self.timeouts,
+            "seconds_mean": round(sum(t for t, _ in timings) / len(timings), 3) if timings else None,
+            "pages_per_second": round(sum(p for _, p in timings) / max(1e-9, sum(t for t, _ in timings)), 1) if timings else None,
+        }
+
+
+pdf_extractor = PdfExtractor()
@@ -0,0 +1,349 @@
+import heapq
+import itertools
+import logging
+import os
+import re
+import threading
+from functools import lru_cache
+import time
+from dataclasses import dataclass
+from datetime import datetime, time as dtime, timedelta
+from sqlalchemy import update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlmodel import Session, select
+from app.db import engine
+from app.models.health import DoseLog, Medication
+from app.models.user import User
+from app.services.event_hub import publish_alert
+from app.services.whatsapp import dispatcher
+
+logger = logging.getLogger(__name__)
+
+# A reminded dose not confirmed within this window is recorded as missed
+MISSED_AFTER_MINUTES = float(os.getenv("MED_MISSED_AFTER_MINUTES", "60"))
+# Doses due within this many seconds of the first one go out in the same batch
+REMINDER_COALESCE_SECONDS = float(os.getenv("MED_REMINDER_COALESCE_SECONDS", "30"))
+# How far ahead of its time a dose can be confirmed as taken
+EARLY_CONFIRM_MINUTES = float(os.getenv("MED_EARLY_CONFIRM_MINUTES", "60"))
+# How far back a late confirmation still counts (overrides "missed")
+LATE_CONFIRM_HOURS = float(os.getenv("MED_LATE_CONFIRM_HOURS", "12"))
+# Doses per DB round trip / WhatsApp fan-out when a large batch falls due together
+REMINDER_CHUNK_SIZE = 500
+
+NAMED_TIMES = {
+    "morning": (8, 0), "breakfast": (8, 0), "noon": (12, 0), "lunch": (13, 0),
+    "afternoon": (15, 0), "evening": (18, 0), "dinner": (19, 0), "night": (21, 0), "bedtime": (22, 0),
+}
+_SEPARATORS = re.compile(r"\s*(?:,|;|/|\band\b|&)\s*", re.I)
+_CLOCK = re.compile(r"(\d{1,2})(?:[:.h](\d{2}))?\s*(am|pm|a\.m\.|p\.m\.)?", re.I)
+
+
+@lru_cache(maxsize=4096)
+def parse_timing(timing: str | None) -> tuple[dtime, ...]:
+    """
+    Parses the free-form Medication.timing ("08:00, 20:00", "8am and 9:30 pm",
+    "morning, night") into sorted clock times. Unrecognized parts are ignored.
+    Cached: most prescriptions share a handful of timing strings.
+    """
+    times = set()
+    for part in _SEPARATORS.split((timing or "").strip()):
+        part = part.strip().lower()
+        if part in NAMED_TIMES:
+            times.add(dtime(*NAMED_TIMES[part]))
+            continue
+        match = _CLOCK.fullmatch(part)
+        if not match:
+            continue
+        hour, minute, meridiem = int(match.group(1)), int(match.group(2) or 0), (match.group(3) or "").replace(".", "")
+        if meridiem:
+            if not 1 <= hour <= 12:
+                continue
+            hour = hour % 12 + (12 if meridiem == "pm" else 0)
+        if hour < 24 and minute < 60:
+            times.add(dtime(hour, minute))
+    return tuple(sorted(times))
+
+
+@dataclass(frozen=True)
+class DoseSchedule:
+    medication_id: int
+    user_id: int
+    times: tuple[dtime, ...]
+    start: datetime | None = None
+    end: datetime | None = None # a midnight end_date includes that whole day
+
+    @classmethod
+    def from_medication(cls, med: Medication) -> "DoseSchedule":
+        end = med.end_date
+        if end is not None and end.time() == dtime(0):
+            end = end + timedelta(days=1) - timedelta(microseconds=1)
+        return cls(med.id, med.user_id, parse_timing(med.timing), med.start_date, end)
+
+    def next_after(self, after: datetime) -> datetime | None:
+        """First dose strictly after `after` within start/end, or None when the course is over."""
+        if not self.times:
+            return None
+        if self.start and self.start > after:
+            after = self.start - timedelta(microseconds=1)
+        day = after.date()
+        for offset in range(2):
+            for clock in self.times:
+                due = datetime.combine(day + timedelta(days=offset), clock)
+                if due > after:
+                    return None if self.end and due > self.end else due
+        return None
+
+    def latest_between(self, earliest: datetime, latest: datetime) -> datetime | None:
+        """The last scheduled dose in [earliest, latest]."""
+        found, due = None, self.next_after(earliest - timedelta(microseconds=1))
+        while due is not None and due <= latest:
+            found, due = due, self.next_after(due)
+        return found
+
+
+class ReminderScheduler:
+    """
+    One min-heap of every active prescription's next dose, plus deferred missed-dose
+    checks. The thread sleeps until the earliest entry is due, so the cost is per due
+    dose, never per prescription. Updates are incremental: upsert() pushes a new
+    entry and bumps the medication's live deadline, remove() forgets it, and stale
+    heap entries are skipped when they surface (as in the inactivity monitor).
+    """
+
+    def __init__(self, on_due, on_check, coalesce_seconds: float = REMINDER_COALESCE_SECONDS,
+                 missed_after_minutes: float = MISSED_AFTER_MINUTES):
+        self._on_due = on_due
+        self._on_check = on_check
+        self.coalesce = coalesce_seconds
+        self.missed_after = missed_after_minutes * 60
+        self._schedules: dict[int, DoseSchedule] = {}
+        self._next: dict[int, float] = {} # medication_id -> deadline of its live heap entry
+        self._heap: list[tuple[float, int, str, object]] = [] # (due, seq, "dose"|"check", payload)
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._thread = None
+        self._stopping = False
+        self.counters = {"reminders": 0, "batches": 0, "checks": 0}
+
+    def _push(self, due: float, kind: str, payload):
+        # Caller holds self._cond
+        entry = (due, next(self._seq), kind, payload)
+        heapq.heappush(self._heap, entry)
+        if self._heap[0] is entry:
+            self._cond.notify()
+
+    def _arm(self, schedule: DoseSchedule, after: datetime):
+        # Caller holds self._cond
+        due = schedule.next_after(after)
+        if due is None:
+            self._schedules.pop(schedule.medication_id, None)
+            self._next.pop(schedule.medication_id, None)
+            return
+        self._schedules[schedule.medication_id] = schedule
+        self._next[schedule.medication_id] = due.timestamp()
+        self._push(due.timestamp(), "dose", schedule.medication_id)
+
+    def upsert(self, med: Medication):
+        """Call after a medication is created or changed."""
+        with self._cond:
+            self._arm(DoseSchedule.from_medication(med), datetime.now())
+
+    def remove(self, medication_id: int):
+        with self._cond:
+            self._schedules.pop(medication_id, None)
+            self._next.pop(medication_id, None)
+
+    def load(self, meds: list[Medication]):
+        """Bulk-initializes from every medication (startup) and heapifies once."""
+        now = datetime.now()
+        with self._cond:
+            for med in meds:
+                schedule = DoseSchedule.from_medication(med)
+                due = schedule.next_after(now)
+                if due is not None and med.id not in self._schedules:
+                    self._schedules[med.id] = schedule
+                    self._next[med.id] = due.timestamp()
+                    self._heap.append((due.timestamp(), next(self._seq), "dose", med.id))
+            heapq.heapify(self._heap)
+            self._cond.notify()
+
+    def schedule_check(self, at: float, cutoff: datetime):
+        with self._cond:
+            self._push(at, "check", cutoff)
+
+    def start(self):
+        with self._cond:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name="medication-reminders", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        if self._thread:
+            self._thread.join(5)
+            self._thread = None
+
+    def _collect_due(self, now: float) -> tuple[list[tuple[DoseSchedule, datetime]], list[datetime]]:
+        # Caller holds self._cond. Takes everything due now plus what falls due within
+        # the coalescing window, so doses at the same clock time form one batch.
+        doses, checks = [], []
+        horizon = now + self.coalesce
+        while self._heap and self._heap[0][0] <= horizon and (doses or checks or self._heap[0][0] <= now):
+            due, _, kind, payload = heapq.heappop(self._heap)
+            if kind == "check":
+                checks.append(payload)
+                continue
+            if self._next.get(payload) != due:
+                continue # stale entry: medication removed or rescheduled
+            schedule = self._schedules[payload]
+            scheduled_for = datetime.fromtimestamp(due)
+            doses.append((schedule, scheduled_for))
+            self._arm(schedule, scheduled_for)
+        return doses, checks
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if self._stopping:
+                    return
+                doses, checks = self._collect_due(time.time())
+                if not doses and not checks:
+                    timeout = max(0.0, self._heap[0][0] - time.time()) if self._heap else None
+                    self._cond.wait(timeout)
+                    continue
+            if doses:
+                self.counters["reminders"] += len(doses)
+                self.counters["batches"] += 1
+                try:
+                    self._on_due(doses)
+                except Exception:
+                    logger.exception("Medication reminder error")
+                self.schedule_check(time.time() + self.missed_after, max(d for _, d in doses))
+            for cutoff in checks:
+                self.counters["checks"] += 1
+                try:
+                    self._on_check(cutoff)
+                except Exception:
+                    logger.exception("Missed-dose check error")
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {**self.counters, "active": len(self._schedules), "heap": len(self._heap)}
+
+
+def send_due_reminders(doses: list[tuple[DoseSchedule, datetime]]):
+    """
+    Batch handler: records a "reminded" DoseLog per dose and sends one WhatsApp
+    message per elder for the doses this process recorded (not ones confirmed early
+    or already reminded by another worker).
+    """
+    # Chunked by elder so each elder's doses stay in one message
+    doses = sorted(doses, key=lambda dose: dose[0].user_id)
+    for i in range(0, len(doses), REMINDER_CHUNK_SIZE):
+        _send_chunk(doses[i:i + REMINDER_CHUNK_SIZE])
+
+
+def _send_chunk(doses: list[tuple[DoseSchedule, datetime]]):
+    now = datetime.now()
+    med_ids = {schedule.medication_id for schedule, _ in doses}
+    with Session(engine) as session:
+        # Plain rows rather than ORM objects: they're used after the commit below
+        meds = {m.id: m for m in session.exec(
+            select(Medication.id, Medication.user_id, Medication.name, Medication.dosage, Medication.instructions)
+            .where(Medication.id.in_(med_ids))
+        ).all()}
+        users = {u.id: u for u in session.exec(
+            select(User.id, User.full_name, User.phone_number).where(User.id.in_({m.user_id for m in meds.values()}))
+        ).all()}
+
+        # The unique (medication_id, scheduled_for) row decides who reminds: a dose confirmed
+        # early, or already claimed by another worker's scheduler, conflicts and isn't returned
+        candidates = [(meds[s.medication_id], due) for s, due in doses if s.medication_id in meds]
+        if not candidates:
+            return
+        table = DoseLog.__table__
+        claimed = set(session.execute(
+            sqlite_insert(table)
+            .values([{"medication_id": med.id, "user_id": med.user_id, "scheduled_for": due, "status": "reminded", "reminded_at": now}
+                     for med, due in candidates])
+            .on_conflict_do_nothing()
+            .returning(table.c.medication_id, table.c.scheduled_for)
+        ).all())
+        session.commit()
+        due_now = [(med, due) for med, due in candidates if (med.id, due) in claimed]
+        if not due_now:
+            return
+
+    by_user: dict[int, list] = {}
+    for med, due in due_now:
+        by_user.setdefault(med.user_id, []).append((med, due))
+    messages = []
+    for user_id, items in by_user.items():
+        publish_alert(user_id, "medication_reminder", doses=[
+            {"medication_id": med.id, "name": med.name, "dosage": med.dosage, "scheduled_for": due} for med, due in items
+        ])
+        user = users.get(user_id)
+        if user and user.phone_number:
+            lines = [f"- {med.name} {med.dosage}" + (f" ({med.instructions})" if med.instructions else "") for med, _ in items]
+            messages.append((user.phone_number, f"Medication reminder for {user.full_name} ({items[0][1]:%H:%M}):\n" + "\n".join(lines)))
+    dispatcher.send_many(messages)
+
+
+def mark_missed(cutoff: datetime):
+    """Records every reminded dose scheduled at or before cutoff and still unconfirmed as missed."""
+    with Session(engine) as session:
+        rows = session.exec(
+            select(DoseLog.id, DoseLog.user_id, DoseLog.medication_id, DoseLog.scheduled_for)
+            .where(DoseLog.status == "reminded", DoseLog.scheduled_for <= cutoff)
+        ).all()
+        if not rows:
+            return
+        session.execute(
+            update(DoseLog).where(DoseLog.status == "reminded", DoseLog.scheduled_for <= cutoff).values(status="missed")
+        )
+        session.commit()
+    for row in rows:
+        publish_alert(row.user_id, "missed_dose", medication_id=row.medication_id, scheduled_for=row.scheduled_for)
+
+
+def confirm_dose(session: Session, med: Medication, at: datetime | None = None) -> DoseLog | None:
+    """
+    Marks the dose nearest before `at` (or up to EARLY_CONFIRM_MINUTES ahead of it)
+    as taken, even if it was already recorded as missed. None if no dose is in range.
+    """
+    at = at or datetime.now()
+    schedule = DoseSchedule.from_medication(med)
+    earliest = at - timedelta(hours=LATE_CONFIRM_HOURS)
+    if med.created_at and med.created_at > earliest:
+        earliest = med.created_at # no dose was due before the prescription existed
+    due = schedule.latest_between(earliest, at + timedelta(minutes=EARLY_CONFIRM_MINUTES))
+    if due is None:
+        return None
+    session.execute(
+        sqlite_insert(DoseLog.__table__)
+        .values(medication_id=med.id, user_id=med.user_id, scheduled_for=due, status="taken", confirmed_at=at)
+        .on_conflict_do_update(
+            index_elements=["medication_id", "scheduled_for"],
+            set_={"status": "taken", "confirmed_at": at},
+        )
+    )
+    session.commit()
+    return session.exec(select(DoseLog).where(DoseLog.medication_id == med.id, DoseLog.scheduled_for == due)).first()
+
+
+def load_schedules(scheduler: "ReminderScheduler"):
+    """Startup: one pass over the medication table to arm every active prescription."""
+    with Session(engine) as session:
+        now = datetime.now()
+        meds = session.exec(
+            select(Medication.id, Medication.user_id, Medication.timing, Medication.start_date, Medication.end_date)
+            .where((Medication.end_date == None) | (Medication.end_date >= now - timedelta(days=1))) # noqa: E711
+        ).all()
+    scheduler.load(meds)
+
+
+reminder_scheduler = ReminderScheduler(send_due_reminders, mark_missed)
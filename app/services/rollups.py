@@ -0,0 +1,217 @@
+from datetime import datetime, timedelta
+from sqlalchemy import delete, func, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlmodel import Session
+from app.models.health import HealthMetric, HealthRollup
+from app.services.startup import lazy_import
+
+pd = lazy_import("pandas")
+
+ROLLUP_METRICS = ("heart_rate", "steps", "sleep_minutes", "spo2")
+
+# Rollup resolutions, finest first: name -> (bucket seconds, pandas floor frequency)
+RESOLUTIONS = {
+    "minute": (60, "min"),
+    "hour": (3600, "h"),
+    "day": (86400, "D"),
+}
+
+BACKFILL_CHUNK_ROWS = 200_000
+
+# Buckets are aligned on naive wall-clock time, matching how timestamps are stored.
+EPOCH = datetime(1970, 1, 1)
+
+# Bucket sizes offered when the client does not ask for one: 1m .. 1w
+AUTO_STEPS = (60, 300, 900, 3600, 6 * 3600, 86400, 7 * 86400)
+MAX_POINTS = 500
+
+
+def aggregate_frame(frame: "pd.DataFrame") -> "pd.DataFrame":
+    """
+    Aggregates raw metric rows (user_id, timestamp, <metrics>) into rollup rows for
+    every resolution in one vectorized pass. Null readings are ignored.
+    """
+    metrics = [m for m in ROLLUP_METRICS if m in frame.columns]
+    if frame.empty or not metrics:
+        return pd.DataFrame(columns=["user_id", "resolution", "metric", "bucket_start", "count", "total", "min_value", "max_value"])
+
+    long = frame.melt(id_vars=["user_id", "timestamp"], value_vars=metrics, var_name="metric", value_name="value")
+    long = long[long["value"].notna()]
+    long["value"] = long["value"].astype("float64")
+    long["timestamp"] = pd.to_datetime(long["timestamp"])
+
+    parts = []
+    for resolution, (_, freq) in RESOLUTIONS.items():
+        grouped = (
+            long.assign(bucket_start=long["timestamp"].dt.floor(freq))
+            .groupby(["user_id", "metric", "bucket_start"], sort=False)["value"]
+            .agg(count="count", total="sum", min_value="min", max_value="max")
+            .reset_index()
+        )
+        grouped["resolution"] = resolution
+        parts.append(grouped)
+    return pd.concat(parts, ignore_index=True)
+
+
+def upsert_rollups(session: Session, rollups: "pd.DataFrame"):
+    """
+    Merges partial aggregates into HealthRollup, adding counts/totals and widening min/max.
+    """
+    if rollups.empty:
+        return
+    columns = {
+        "user_id": rollups["user_id"].astype("int64").tolist(),
+        "resolution": rollups["resolution"].tolist(),
+        "metric": rollups["metric"].tolist(),
+        "bucket_start": rollups["bucket_start"].astype(object).tolist(),
+        "count": rollups["count"].astype("int64").tolist(),
+        "total": rollups["total"].astype("float64").tolist(),
+        "min_value": rollups["min_value"].astype("float64").tolist(),
+        "max_value": rollups["max_value"].astype("float64").tolist(),
+    }
+    names = list(columns)
+    rows = [dict(zip(names, row)) for row in zip(*columns.values())]
+    stmt = sqlite_insert(HealthRollup.__table__)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["user_id", "resolution", "metric", "bucket_start"],
+        set_={
+            "count": HealthRollup.__table__.c["count"] + stmt.excluded["count"],
+            "total": HealthRollup.__table__.c.total + stmt.excluded.total,
+            "min_value": func.min(HealthRollup.__table__.c.min_value, stmt.excluded.min_value),
+            "max_value": func.max(HealthRollup.__table__.c.max_value, stmt.excluded.max_value),
+        },
+    )
+    session.execute(stmt, rows)
+
+
+def apply_rollups(session: Session, records):
+    """
+    Incremental maintenance hook: folds newly inserted rows (dicts or a DataFrame)
+    into the rollup tables inside the caller's transaction.
+    """
+    frame = records if isinstance(records, pd.DataFrame) else pd.DataFrame.from_records(records)
+    if frame.empty:
+        return
+    upsert_rollups(session, aggregate_frame(frame))
+
+
+def backfill_rollups(session: Session, user_id: int | None = None, chunk_rows: int = BACKFILL_CHUNK_ROWS) -> int:
+    """
+    Rebuilds rollups from raw HealthMetric history, live and archived. Reads raw rows in
+    chunks and lets the upsert merge partial aggregates, so memory stays bounded for any
+    history size.
+    Returns the number of raw rows scanned.
+    """
+    clear = delete(HealthRollup)
+    query = select(HealthMetric.user_id, HealthMetric.timestamp, *[getattr(HealthMetric, m) for m in ROLLUP_METRICS])
+    if user_id is not None:
+        clear = clear.where(HealthRollup.user_id == user_id)
+        query = query.where(HealthMetric.user_id == user_id)
+    session.execute(clear)
+
+    scanned = 0
+    for chunk in pd.read_sql_query(query, session.connection(), chunksize=chunk_rows):
+        apply_rollups(session, chunk)
+        scanned += len(chunk)
+    # Archived history still counts (imported here: the archive is optional for rollups)
+    from app.services.archive import health_archive
+    for frame in health_archive.iter_frames(user_id):
+        apply_rollups(session, frame)
+        scanned += len(frame)
+    session.commit()
+    return scanned
+
+
+def parse_resolution(value: str) -> int:
+    """
+    Parses "30s", "15m", "6h", "1d", "1w" (or a bare rollup name) into bucket seconds.
+    """
+    if value in RESOLUTIONS:
+        return RESOLUTIONS[value][0]
+    units = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800}
+    try:
+        amount, unit = int(value[:-1]), value[-1].lower()
+        seconds = amount * units[unit]
+    except (ValueError, KeyError, IndexError):
+        raise ValueError(f"Invalid resolution '{value}'")
+    if seconds < 60:
+        raise ValueError("Resolution must be at least 1m")
+    return seconds
+
+
+def auto_resolution(start: datetime, end: datetime, max_points: int = MAX_POINTS) -> int:
+    """
+    Smallest standard bucket size that keeps [start, end) under max_points.
+    """
+    span = max((end - start).total_seconds(), 1)
+    for seconds in AUTO_STEPS:
+        if span / seconds <= max_points:
+            return seconds
+    return AUTO_STEPS[-1]
+
+
+def choose_rollup(bucket_seconds: int) -> str:
+    """
+    Picks the coarsest rollup whose buckets evenly tile the requested bucket size.
+    """
+    chosen = "minute"
+    for name, (seconds, _) in RESOLUTIONS.items():
+        if bucket_seconds % seconds == 0:
+            chosen = name
+    return chosen
+
+
+def query_series(session: Session, user_id: int, metric: str, start: datetime, end: datetime, bucket_seconds: int) -> dict:
+    """
+    Returns min/max/mean/count/sum points for [start, end) at bucket_seconds, served from
+    the coarsest rollup that can satisfy it. Cost scales with points, not raw row count.
+    """
+    rollup = choose_rollup(bucket_seconds)
+    statement = (
+        select(HealthRollup.bucket_start, HealthRollup.count, HealthRollup.total, HealthRollup.min_value, HealthRollup.max_value)
+        .where(
+            HealthRollup.user_id == user_id,
+            HealthRollup.resolution == rollup,
+            HealthRollup.metric == metric,
+            HealthRollup.bucket_start >= start,
+            HealthRollup.bucket_start < end,
+        )
+        .order_by(HealthRollup.bucket_start)
+    )
+
+    points = {}
+    for bucket_start, count, total, min_value, max_value in session.execute(statement):
+        key = int((bucket_start - EPOCH).total_seconds()) // bucket_seconds * bucket_seconds
+        point = points.get(key)
+        if point is None:
+            points[key] = [count, total, min_value, max_value]
+        else:
+            point[0] += count
+            point[1] += total
+            point[2] = min(point[2], min_value)
+            point[3] = max(point[3], max_value)
+
+    return {
+        "metric": metric,
+        "resolution_seconds": bucket_seconds,
+        "source_rollup": rollup,
+        "points": [
+            {
+                "t": EPOCH + timedelta(seconds=key),
+                "count": count,
+                "sum": total,
+                "mean": total / count if count else None,
+                "min": min_value,
+                "max": max_value,
+            }
+            for key, (count, total, min_value, max_value) in points.items()
+        ],
+    }
+
+
+if __name__ == "__main__":
+    # python -m app.services.rollups  -> rebuild every user's rollups from raw history
+    from app.db import engine, init_db
+    init_db()
+    with Session(engine) as session:
+        print(f"Rollups rebuilt from {backfill_rollups(session)} raw rows")
@@ -0,0 +1,131 @@
+import importlib
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable
+
+logger = logging.getLogger(__name__)
+
+
+class StartupProfile:
+    """
+    Wall-clock timings of startup steps and module imports, in the order they ran.
+    Import timings are cumulative: a module's shared dependencies are charged to
+    whichever module imported them first (python -X importtime gives the full tree).
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.steps: list[tuple[str, str, float]] = [] # (phase, name, seconds)
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def timed(self, name: str, phase: str = "critical"):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.steps.append((phase, name, time.perf_counter() - started))
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            steps = list(self.steps)
+        return {
+            "uptime_seconds": round(time.perf_counter() - self.started, 3),
+            "steps": [{"phase": phase, "name": name, "ms": round(seconds * 1000, 1)} for phase, name, seconds in steps],
+        }
+
+    def report(self, phase: str):
+        with self._lock:
+            steps = [(name, seconds) for p, name, seconds in self.steps if p == phase]
+        lines = [f"Startup ({phase}): {sum(s for _, s in steps) * 1000:.0f} ms"]
+        lines += [f"  {seconds * 1000:8.1f} ms  {name}" for name, seconds in sorted(steps, key=lambda step: -step[1])]
+        logger.info("\n".join(lines))
+
+
+startup_profile = StartupProfile()
+
+
+class LazyModule:
+    """
+    Stands in for a heavy module and imports it on first attribute access, so
+    `pd = lazy_import("pandas")` costs nothing until pandas is actually used.
+    """
+
+    def __init__(self, name: str):
+        self._name = name
+        self._module = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    with startup_profile.timed(self._name, phase="lazy"):
+                        self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self.load(), attr)
+
+
+def timed_import(name: str):
+    """Imports a module eagerly, recording how long it took in the startup profile."""
+    with startup_profile.timed(name):
+        return importlib.import_module(name)
+
+
+_lazy_modules: dict[str, LazyModule] = {}
+
+
+def lazy_import(name: str) -> LazyModule:
+    return _lazy_modules.setdefault(name, LazyModule(name))
+
+
+class Readiness:
+    """
+    Two-level readiness: "critical" once the DB and auth/alert routes can serve,
+    "warm" once the background warm-up (heavy imports, indexes, resumed jobs) finished.
+    """
+
+    def __init__(self):
+        self.critical = False
+        self.warm = False
+        self.pending: list[str] = []
+        self.failed: dict[str, str] = {}
+        self._thread = None
+
+    def mark_critical(self):
+        self.critical = True
+        startup_profile.report("critical")
+
+    def warm_in_background(self, tasks: list[tuple[str, Callable[[], object]]]):
+        self.pending = [name for name, _ in tasks]
+        self._thread = threading.Thread(target=self._warm, args=(tasks,), name="warmup", daemon=True)
+        self._thread.start()
+
+    def _warm(self, tasks):
+        for name, task in tasks:
+            try:
+                with startup_profile.timed(name, phase="warm"):
+                    task()
+            except Exception as e:
+                logger.exception("Warm-up step %s failed", name)
+                self.failed[name] = str(e)
+            self.pending.remove(name)
+        self.warm = True
+        startup_profile.report("warm")
+
+    def status(self) -> dict:
+        return {
+            "status": "warm" if self.warm else "ready" if self.critical else "starting",
+            "critical": self.critical,
+            "warm": self.warm,
+            "pending": list(self.pending),
+            "failed": dict(self.failed),
+        }
+
+
+readiness = Readiness()
@@ -0,0 +1,41 @@
+import hashlib
+from datetime import datetime
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlmodel import Session
+from app.models.medical import SummaryCache
+
+
+def summary_key(text: str, model: str) -> str:
+    return hashlib.sha256(f"{model}\n{text}".encode("utf-8")).hexdigest()
+
+
+def get_cached_summary(session: Session, text: str) -> str | None:
+    from app.services import ai_service
+
+    hit = session.get(SummaryCache, summary_key(text, ai_service.primary_summary_model()))
+    return hit.summary if hit is not None else None
+
+
+def cached_summarize(session: Session, text: str) -> str:
+    """
+    Persistent memo of summarize_medical_report keyed by (primary model, extracted text).
+    Only results from the primary model are cached: placeholders and local fallback
+    summaries are not, so a later upload still gets the remote summary.
+    """
+    from app.services import ai_service
+
+    hit = get_cached_summary(session, text)
+    if hit is not None:
+        return hit
+
+    primary = ai_service.primary_summary_model()
+    summary, model = ai_service.summarize_with_model(text)
+    if model == primary:
+        # Two reports with the same text can finish together; the first insert wins
+        session.execute(
+            sqlite_insert(SummaryCache.__table__)
+            .values(key=summary_key(text, model), model=model, summary=summary, created_at=datetime.now())
+            .on_conflict_do_nothing(index_elements=["key"])
+        )
+        session.commit()
+    return summary
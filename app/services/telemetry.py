@@ -0,0 +1,192 @@
+import logging
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from sqlalchemy.exc import OperationalError
+from sqlmodel import Session
+from app.db import engine
+from app.services.anomaly import anomaly_detector, dispatch_anomalies, record_anomalies
+from app.services.caregiver_overview import invalidate_elders
+from app.services.event_hub import publish_metrics
+from app.services.health_ingest import insert_metric_records
+
+# Queue bounds: rows held in memory before producers get backpressure,
+# rows per bulk insert, and the longest a sample may wait before it is written.
+QUEUE_MAX_ROWS = int(os.getenv("TELEMETRY_QUEUE_MAX_ROWS", "100000"))
+BATCH_ROWS = int(os.getenv("TELEMETRY_BATCH_ROWS", "5000"))
+FLUSH_SECONDS = float(os.getenv("TELEMETRY_FLUSH_SECONDS", "1.0"))
+# A batch that hits a locked or unavailable DB is retried with exponential backoff
+# (capped at RETRY_MAX_SECONDS) until it lands; once stop() is draining, after RETRY_ON_STOP tries.
+RETRY_BASE_SECONDS = float(os.getenv("TELEMETRY_RETRY_BASE_SECONDS", "0.5"))
+RETRY_MAX_SECONDS = float(os.getenv("TELEMETRY_RETRY_MAX_SECONDS", "30"))
+RETRY_ON_STOP = int(os.getenv("TELEMETRY_RETRY_ON_STOP", "3"))
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBehindQueue:
+    """
+    In-process write-behind buffer for HealthMetric rows.
+    Producers call offer() from request handlers; a single writer thread coalesces
+    rows from every user into one bulk insert per batch, bounded by size and age.
+    """
+
+    def __init__(self, engine, max_rows: int = QUEUE_MAX_ROWS, batch_rows: int = BATCH_ROWS, flush_seconds: float = FLUSH_SECONDS):
+        self._engine = engine
+        self.max_rows = max_rows
+        self.batch_rows = batch_rows
+        self.flush_seconds = flush_seconds
+        self._rows = deque()
+        self._oldest = None  # monotonic time the oldest buffered row arrived
+        self._cond = threading.Condition()
+        self._thread = None
+        self._stopping = False
+        self.counters = {"accepted": 0, "rejected_full": 0, "written": 0, "failed": 0, "batches": 0, "write_errors": 0, "retries": 0}
+
+    @property
+    def pending(self) -> int:
+        return len(self._rows)
+
+    def start(self):
+        with self._cond:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name="telemetry-writer", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 30.0):
+        """
+        Drains everything still buffered, then stops the writer thread.
+        """
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def offer(self, records: list[dict]) -> bool:
+        """
+        Enqueues rows all-or-nothing. Returns False when the queue is full,
+        in which case the caller should shed load (503 + Retry-After).
+        """
+        if not records:
+            return True
+        with self._cond:
+            if len(self._rows) + len(records) > self.max_rows:
+                self.counters["rejected_full"] += len(records)
+                return False
+            if not self._rows:
+                self._oldest = time.monotonic()
+            self._rows.extend(records)
+            self.counters["accepted"] += len(records)
+            if len(self._rows) >= self.batch_rows:
+                self._cond.notify()
+        return True
+
+    def flush(self):
+        """
+        Synchronously writes everything buffered so far on the calling thread.
+        """
+        while True:
+            with self._cond:
+                batch = self._take()
+            if not batch:
+                return
+            self._write(batch)
+
+    def stats(self) -> dict:
+        return {**self.counters, "pending": self.pending, "max_rows": self.max_rows}
+
+    def _take(self) -> list[dict]:
+        count = min(len(self._rows), self.batch_rows)
+        batch = [self._rows.popleft() for _ in range(count)]
+        if not self._rows:
+            self._oldest = None
+        return batch
+
+    def _due(self) -> bool:
+        if len(self._rows) >= self.batch_rows:
+            return True
+        return self._oldest is not None and time.monotonic() - self._oldest >= self.flush_seconds
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._stopping and not self._due():
+                    timeout = self.flush_seconds
+                    if self._oldest is not None:
+                        timeout = max(0.0, self.flush_seconds - (time.monotonic() - self._oldest))
+                    self._cond.wait(timeout)
+                batch = self._take()
+                stopping = self._stopping
+            if batch:
+                self._write(batch)
+            elif stopping:
+                return
+
+    def _write(self, batch: list[dict]):
+        """
+        Writes one batch. The rows were already acknowledged with 202, so a locked or
+        unavailable DB is retried with backoff instead of dropping them; the buffer keeps
+        filling meanwhile and producers get backpressure once it is full.
+        Other errors (bad rows) would fail again on every retry and drop the batch.
+        """
+        anomalies = anomaly_detector.score_records(batch) # once: scoring updates the baselines
+        attempt = 0
+        while True:
+            try:
+                with Session(self._engine) as session:
+                    insert_metric_records(session, batch)
+                    record_anomalies(session, anomalies)
+                    session.commit()
+                break
+            except OperationalError as e:
+                self.counters["write_errors"] += 1
+                attempt += 1
+                if self._stopping and attempt >= RETRY_ON_STOP:
+                    self.counters["failed"] += len(batch)
+                    logger.error("Telemetry flush failed %d times while stopping, %d rows dropped: %s", attempt, len(batch), e.orig)
+                    return
+                delay = min(RETRY_BASE_SECONDS * 2 ** (attempt - 1), RETRY_MAX_SECONDS)
+                self.counters["retries"] += 1
+                logger.warning("Telemetry flush failed (%d rows, attempt %d), retrying in %.1fs: %s", len(batch), attempt, delay, e.orig)
+                stopping = self._stopping
+                with self._cond: # stop() cuts the wait short
+                    self._cond.wait_for(lambda: self._stopping != stopping, delay)
+            except Exception:
+                self.counters["write_errors"] += 1
+                self.counters["failed"] += len(batch)
+                logger.exception("Telemetry flush error (%d rows dropped)", len(batch))
+                return
+        invalidate_elders(r["user_id"] for r in batch)
+        publish_metrics(batch)
+        dispatch_anomalies(anomalies)
+        self.counters["written"] += len(batch)
+        self.counters["batches"] += 1
+
+
+telemetry_queue = WriteBehindQueue(engine)
+
+
+def sample_to_record(sample, user_id: int, received_at: datetime) -> dict:
+    """
+    Converts a validated TelemetrySample into a full HealthMetric row for the bulk insert.
+    """
+    timestamp = sample.timestamp or received_at
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+    return {
+        "user_id": user_id,
+        "timestamp": timestamp,
+        "source": sample.source,
+        "heart_rate": sample.heart_rate,
+        "steps": sample.steps,
+        "sleep_minutes": sample.sleep_minutes,
+        "spo2": sample.spo2,
+        "fall_detected": False,
+        "inactivity_alert": False,
+    }
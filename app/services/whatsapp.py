@@ -1,48 +1,174 @@
+import logging
 import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait
 import requests
+from requests.adapters import HTTPAdapter
+from app.services.metrics import external_call
+
+logger = logging.getLogger(__name__)
 
 WHATSAPP_PHONE_NUMBER_ID = os.getenv("WHATSAPP_PHONE_NUMBER_ID")
 WHATSAPP_ACCESS_TOKEN = os.getenv("WHATSAPP_ACCESS_TOKEN")
 APP_ENV = os.getenv("APP_ENV", "development")
 
+# Graph API base; point at a local stand-in server for load/latency testing
+WHATSAPP_API_BASE = os.getenv("WHATSAPP_API_BASE", "https://graph.facebook.com/v17.0")
+
+# Dispatcher tuning
+CONNECT_TIMEOUT = float(os.getenv("WHATSAPP_CONNECT_TIMEOUT", "3"))
+READ_TIMEOUT = float(os.getenv("WHATSAPP_READ_TIMEOUT", "5"))
+MAX_ATTEMPTS = int(os.getenv("WHATSAPP_MAX_ATTEMPTS", "3"))
+BACKOFF_BASE = float(os.getenv("WHATSAPP_BACKOFF_BASE", "0.25"))
+MAX_WORKERS = int(os.getenv("WHATSAPP_MAX_WORKERS", "16"))
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class AlertDispatcher:
+    """
+    Sends WhatsApp messages over one pooled keep-alive session, fanning out to all
+    contacts concurrently. Each message gets connect/read timeouts and up to
+    MAX_ATTEMPTS tries with full-jitter exponential backoff on network errors and
+    429/5xx. Per-message latency and outcome are recorded in a bounded window.
+    """
+
+    def __init__(self, api_base: str = WHATSAPP_API_BASE, max_workers: int = MAX_WORKERS, max_attempts: int = MAX_ATTEMPTS,
+                 timeout: tuple = (CONNECT_TIMEOUT, READ_TIMEOUT), backoff_base: float = BACKOFF_BASE, history: int = 2048):
+        self.api_base = api_base.rstrip("/")
+        self.max_attempts = max_attempts
+        self.timeout = timeout
+        self.backoff_base = backoff_base
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers)
+        self._session.mount("https://", adapter)
+        self._session.mount("http://", adapter)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="whatsapp")
+        self._lock = threading.Lock()
+        self.deliveries = deque(maxlen=history) # (latency_s, outcome, attempts)
+        self.fanouts = deque(maxlen=history) # time-to-last-contact per alert, seconds
+        self.counters = {"sent": 0, "failed": 0, "retries": 0, "simulated": 0}
+
+    def _post(self, to_number: str, message: str) -> dict:
+        url = f"{self.api_base}/{WHATSAPP_PHONE_NUMBER_ID}/messages"
+        headers = {
+            "Authorization": f"Bearer {WHATSAPP_ACCESS_TOKEN}",
+            "Content-Type": "application/json"
+        }
+        data = {
+            "messaging_product": "whatsapp",
+            "to": to_number,
+            "type": "text",
+            "text": {"body": message}
+        }
+        with external_call("whatsapp", "send_message"):
+            response = self._session.post(url, headers=headers, json=data, timeout=self.timeout)
+            if response.status_code in RETRY_STATUSES:
+                raise _Retryable(f"HTTP {response.status_code}")
+            response.raise_for_status()
+            return response.json()
+
+    def send(self, to_number: str, message: str) -> dict:
+        """
+        Sends one message with retries. Never raises; returns the API response or an error dict.
+        """
+        if not WHATSAPP_PHONE_NUMBER_ID or not WHATSAPP_ACCESS_TOKEN:
+            logger.info("[SIMULATION] WhatsApp Message to %s: %s", to_number, message)
+            self._record(0.0, "simulated", 0)
+            return {"status": "simulated", "to": to_number, "message": message}
+
+        started = time.perf_counter()
+        error = None
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                result = self._post(to_number, message)
+                self._record(time.perf_counter() - started, "sent", attempt)
+                return result
+            except (_Retryable, requests.ConnectionError, requests.Timeout) as e:
+                error = e
+                if attempt < self.max_attempts:
+                    with self._lock:
+                        self.counters["retries"] += 1
+                    time.sleep(random.uniform(0, self.backoff_base * 2 ** (attempt - 1)))
+            except Exception as e:
+                error = e
+                break
+
+        logger.error("Error sending WhatsApp: %s", error)
+        # Fallback
+        logger.warning("[SIMULATION FAILED ALERT] WhatsApp Message to %s: %s", to_number, message)
+        self._record(time.perf_counter() - started, "failed", attempt)
+        return {"status": "error", "error": str(error)}
+
+    def send_many(self, messages: list[tuple[str, str]]) -> list[dict]:
+        """
+        Sends (to_number, message) pairs concurrently and waits for all of them.
+        Records the time until the last one finished.
+        """
+        if not messages:
+            return []
+        started = time.perf_counter()
+        futures = [self._executor.submit(self.send, to, msg) for to, msg in messages]
+        wait(futures)
+        with self._lock:
+            self.fanouts.append(time.perf_counter() - started)
+        return [f.result() for f in futures]
+
+    def _record(self, latency: float, outcome: str, attempts: int):
+        with self._lock:
+            self.deliveries.append((latency, outcome, attempts))
+            self.counters[outcome] += 1
+
+    def stats(self) -> dict:
+        """
+        Delivery counters plus p50/p95/p99 per-message latency and time-to-last-contact.
+        """
+        with self._lock:
+            latencies = sorted(d[0] for d in self.deliveries if d[1] != "simulated")
+            fanouts = sorted(self.fanouts)
+            counters = dict(self.counters)
+        return {
+            **counters,
+            "message_latency": _percentiles(latencies),
+            "time_to_last_contact": _percentiles(fanouts),
+        }
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+        self._session.close()
+
+
+class _Retryable(Exception):
+    pass
+
+
+def _percentiles(samples: list[float]) -> dict:
+    if not samples:
+        return {"count": 0, "p50": None, "p95": None, "p99": None}
+
+    def pick(q):
+        return round(samples[min(len(samples) - 1, int(q * len(samples)))], 4)
+
+    return {"count": len(samples), "p50": pick(0.50), "p95": pick(0.95), "p99": pick(0.99)}
+
+
+dispatcher = AlertDispatcher()
+
+
 def send_whatsapp_message(to_number: str, message: str):
     """
     Sends a WhatsApp message using Meta Cloud API.
     Falls back to simulation logging if credentials missing or in dev mode.
     """
-    if not WHATSAPP_PHONE_NUMBER_ID or not WHATSAPP_ACCESS_TOKEN:
-        print(f"[SIMULATION] WhatsApp Message to {to_number}: {message}")
-        return {"status": "simulated", "to": to_number, "message": message}
-
-    url = f"https://graph.facebook.com/v17.0/{WHATSAPP_PHONE_NUMBER_ID}/messages"
-    headers = {
-        "Authorization": f"Bearer {WHATSAPP_ACCESS_TOKEN}",
-        "Content-Type": "application/json"
-    }
-    data = {
-        "messaging_product": "whatsapp",
-        "to": to_number,
-        "type": "text",
-        "text": {"body": message}
-    }
-    
-    try:
-        response = requests.post(url, headers=headers, json=data)
-        response.raise_for_status()
-        return response.json()
-    except Exception as e:
-        print(f"Error sending WhatsApp: {e}")
-        # Fallback
-        print(f"[SIMULATION FAILED ALERT] WhatsApp Message to {to_number}: {message}")
-        return {"status": "error", "error": str(e)}
+    return dispatcher.send(to_number, message)
 
 def send_emergency_alert(user_name: str, contacts: list, location: str = "Unknown"):
     """
-    Iterates through contacts and sends alerts.
+    Sends the SOS alert to every contact concurrently.
     """
-    for contact in contacts:
-        # Assuming contact is a dict {name, phone, relation}
-        phone = contact.get('phone')
-        if phone:
-            msg = f"SOS ALERT! {user_name} needs help. Location: {location}. Please check the ElderEase App immediately."
-            send_whatsapp_message(phone, msg)
+    msg = f"SOS ALERT! {user_name} needs help. Location: {location}. Please check the ElderEase App immediately."
+    # Assuming contact is a dict {name, phone, relation}
+    messages = [(contact.get('phone'), msg) for contact in contacts if contact.get('phone')]
+    return dispatcher.send_many(messages)
@@ -0,0 +1,96 @@
+"""
+Emergency alert fan-out benchmark against a local stand-in for the WhatsApp Graph API.
+
+The stand-in answers POST /<phone_id>/messages after a random delay and fails a
+configurable fraction of requests with 503, so retries and timeouts are exercised.
+Reports p50/p95/p99 time-to-last-contact for the pooled concurrent dispatcher and,
+for comparison, the old one-connection-per-contact sequential loop.
+
+Usage: python -m benchmarks.alert_fanout --alerts 50 --contacts 5 --latency-ms 200
+"""
+import argparse
+import json
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def start_stub(latency_ms: float, error_rate: float) -> ThreadingHTTPServer:
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            time.sleep(random.uniform(0.5, 1.5) * latency_ms / 1000)
+            if random.random() < error_rate:
+                status, body = 503, b'{"error": "unavailable"}'
+            else:
+                status, body = 200, json.dumps({"messages": [{"id": "wamid.stub"}]}).encode()
+            try:
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            except (BrokenPipeError, ConnectionResetError):
+                pass # client already gave up (read timeout)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def percentile(samples, q):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--alerts", type=int, default=50)
+    parser.add_argument("--contacts", type=int, default=5)
+    parser.add_argument("--latency-ms", type=float, default=200)
+    parser.add_argument("--error-rate", type=float, default=0.05)
+    parser.add_argument("--skip-sequential", action="store_true")
+    args = parser.parse_args()
+
+    server = start_stub(args.latency_ms, args.error_rate)
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    # Credentials must be present before import or the module runs in simulation mode
+    os.environ.update({"WHATSAPP_API_BASE": base, "WHATSAPP_PHONE_NUMBER_ID": "bench", "WHATSAPP_ACCESS_TOKEN": "bench"})
+    import requests
+    from app.services import whatsapp
+
+    contacts = [{"name": f"c{i}", "phone": f"+1555000{i:04d}"} for i in range(args.contacts)]
+
+    if not args.skip_sequential:
+        sequential = []
+        for _ in range(args.alerts):
+            started = time.perf_counter()
+            for contact in contacts:
+                try:
+                    requests.post(f"{base}/bench/messages", json={"to": contact["phone"]})
+                except requests.RequestException:
+                    pass
+            sequential.append(time.perf_counter() - started)
+        print(f"sequential, new connection each: p50={percentile(sequential, .5):.3f}s "
+              f"p95={percentile(sequential, .95):.3f}s p99={percentile(sequential, .99):.3f}s")
+
+    for _ in range(args.alerts):
+        whatsapp.send_emergency_alert("Bench Elder", contacts, "Benchmark")
+    stats = whatsapp.dispatcher.stats()
+    ttl = stats["time_to_last_contact"]
+    print(f"pooled concurrent dispatcher:    p50={ttl['p50']:.3f}s p95={ttl['p95']:.3f}s p99={ttl['p99']:.3f}s")
+    print(json.dumps({k: stats[k] for k in ("sent", "failed", "retries", "message_latency")}, indent=2))
+    whatsapp.dispatcher.close()
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,347 @@
+"""
+Load and latency benchmark for the API hot paths, driven through the ASGI app in-process.
+
+Builds a synthetic database (elders with emergency contacts, linked caregivers, multi-year
+HealthMetric histories, behavior logs; see benchmarks.synthetic), starts the app with the
+Hugging Face client and the WhatsApp Graph API replaced by local stubs, then runs each
+scenario on its own at --concurrency for --duration seconds, followed by a weighted mix of
+all of them. Reports throughput and p50/p95/p99 latency per scenario.
+
+  login            POST /auth/login (real bcrypt verify)
+  stats            GET /health/stats, first page or a random page deep in history
+  csv_upload       POST /health/upload with a watch export of --csv-rows rows
+  medical_upload   POST /medical/upload with a distinct generated PDF (202 latency;
+                   extraction + summary run in the background and are reported as counts)
+  fall_alert       POST /safety/alert/fall; httpx's ASGI transport runs background tasks
+                   before returning, so this includes the WhatsApp fan-out to every contact
+  caregiver        GET /caregiver/overview
+
+--save writes the results as a JSON baseline; --compare checks a run against one and
+exits non-zero when p95 grew or throughput fell by more than --threshold.
+The same --seed gives the same data and the same request sequence per worker.
+
+Usage: python -m benchmarks.api_load --elders 50 --years 2 --duration 10 --save baseline.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from app.services.pagination import encode_cursor
+from benchmarks.alert_fanout import percentile, start_stub
+from benchmarks.synthetic import PASSWORD, make_pdf, make_report_text, make_watch_csv, populate
+
+SCENARIOS = ("login", "stats", "csv_upload", "medical_upload", "fall_alert", "caregiver")
+# Relative share of each scenario in the mixed run: mostly reads, some writes, rare alerts
+MIX_WEIGHTS = {"login": 1, "stats": 10, "csv_upload": 1, "medical_upload": 1, "fall_alert": 1, "caregiver": 4}
+
+
+class StubInferenceClient:
+    """Stands in for huggingface_hub.InferenceClient with a fixed per-call delay."""
+
+    def __init__(self, latency_ms: float):
+        self.latency = latency_ms / 1000
+        self.calls = 0
+
+    def summarization(self, text, model=None, parameters=None):
+        self.calls += 1
+        time.sleep(self.latency)
+
+        class Output:
+            summary_text = " ".join(text.split()[:40])
+        return Output()
+
+    def text_generation(self, prompt, model=None, max_new_tokens=None, temperature=None):
+        self.calls += 1
+        time.sleep(self.latency)
+        return "Stage: Mild Cognitive Impairment\nScore: 42\nAdvice: Keep a routine, Use reminders, Stay social"
+
+
+class Context:
+    def __init__(self, client, population, tokens, args):
+        self.client = client
+        self.population = population
+        self.tokens = tokens # email -> bearer header
+        self.args = args
+        self.oldest = datetime.now() - timedelta(days=365 * args.years)
+
+    def elder(self, rng):
+        return rng.choice(self.population.elders)
+
+
+async def op_login(ctx, rng):
+    email = rng.choice(ctx.population.elders + ctx.population.caregivers)
+    return await ctx.client.post("/auth/login", json={"email": email, "password": PASSWORD})
+
+
+async def op_stats(ctx, rng):
+    params = {"limit": 50}
+    if rng.random() < 0.5:
+        # A page somewhere in the history, as when a dashboard scrolls back
+        ts = ctx.oldest + (datetime.now() - ctx.oldest) * rng.random()
+        params["before"] = encode_cursor(ts, 2**62)
+    return await ctx.client.get("/health/stats", params=params, headers=ctx.tokens[ctx.elder(rng)])
+
+
+async def op_csv_upload(ctx, rng):
+    start = datetime.now() - timedelta(minutes=rng.randint(ctx.args.csv_rows, 60 * 24 * 30))
+    body = make_watch_csv(rng, ctx.args.csv_rows, start)
+    return await ctx.client.post(
+        "/health/upload", files={"file": ("export.csv", body, "text/csv")}, headers=ctx.tokens[ctx.elder(rng)]
+    )
+
+
+async def op_medical_upload(ctx, rng):
+    pdf = make_pdf([make_report_text(rng) for _ in range(ctx.args.pdf_pages)])
+    return await ctx.client.post(
+        "/medical/upload",
+        data={"title": f"Follow-up {rng.randint(1, 10**9)}", "doctor_name": "Dr. Bench", "report_type": "report"},
+        files={"file": ("report.pdf", pdf, "application/pdf")},
+        headers=ctx.tokens[ctx.elder(rng)],
+    )
+
+
+async def op_fall_alert(ctx, rng):
+    return await ctx.client.post("/safety/alert/fall", headers=ctx.tokens[ctx.elder(rng)])
+
+
+async def op_caregiver(ctx, rng):
+    return await ctx.client.get("/caregiver/overview", headers=ctx.tokens[rng.choice(ctx.population.caregivers)])
+
+
+OPERATIONS = {
+    "login": op_login, "stats": op_stats, "csv_upload": op_csv_upload,
+    "medical_upload": op_medical_upload, "fall_alert": op_fall_alert, "caregiver": op_caregiver,
+}
+
+
+async def run_phase(ctx, names: list[str], weights: list[int], concurrency: int, duration: float, seed: int) -> dict:
+    """Runs `concurrency` workers for `duration` seconds; each picks an operation by weight per request."""
+    samples = {name: [] for name in names}
+    errors = {name: {} for name in names}
+    deadline = time.perf_counter() + duration
+
+    async def worker(index):
+        rng = random.Random(seed * 1000 + index)
+        while time.perf_counter() < deadline:
+            name = rng.choices(names, weights)[0]
+            started = time.perf_counter()
+            try:
+                response = await OPERATIONS[name](ctx, rng)
+                status = response.status_code
+            except Exception as e:
+                status = type(e).__name__
+            elapsed = time.perf_counter() - started
+            if isinstance(status, int) and status < 400:
+                samples[name].append(elapsed)
+            else:
+                errors[name][str(status)] = errors[name].get(str(status), 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    wall = time.perf_counter() - started
+    return {name: summarize(samples[name], errors[name], wall) for name in names}
+
+
+def summarize(samples: list[float], errors: dict, wall: float) -> dict:
+    result = {"count": len(samples), "errors": sum(errors.values()), "rps": round(len(samples) / wall, 2)}
+    if errors:
+        result["error_statuses"] = errors
+    if samples:
+        result.update({
+            f"{label}_ms": round(percentile(samples, q) * 1000, 2)
+            for label, q in (("p50", .5), ("p95", .95), ("p99", .99))
+        })
+        result["mean_ms"] = round(sum(samples) / len(samples) * 1000, 2)
+        result["max_ms"] = round(max(samples) * 1000, 2)
+    return result
+
+
+def print_table(phases: dict):
+    print(f"{'phase':<16}{'scenario':<16}{'count':>7}{'err':>5}{'rps':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    for phase, results in phases.items():
+        for name, r in results.items():
+            print(f"{phase:<16}{name:<16}{r['count']:>7}{r['errors']:>5}{r['rps']:>9.1f}"
+                  f"{r.get('p50_ms', 0):>9.1f}{r.get('p95_ms', 0):>9.1f}{r.get('p99_ms', 0):>9.1f}")
+
+
+def compare(phases: dict, baseline: dict, threshold: float) -> list[str]:
+    """Regressions against a saved baseline: p95 up or throughput down by more than threshold."""
+    regressions = []
+    for phase, results in phases.items():
+        for name, r in results.items():
+            before = baseline.get("phases", {}).get(phase, {}).get(name)
+            if not before or not before.get("count") or not r.get("count"):
+                continue
+            if r["p95_ms"] > before["p95_ms"] * (1 + threshold):
+                regressions.append(f"{phase}/{name}: p95 {before['p95_ms']:.1f} -> {r['p95_ms']:.1f} ms")
+            if r["rps"] < before["rps"] * (1 - threshold):
+                regressions.append(f"{phase}/{name}: throughput {before['rps']:.1f} -> {r['rps']:.1f} req/s")
+            if r["errors"] > before["errors"]:
+                regressions.append(f"{phase}/{name}: errors {before['errors']} -> {r['errors']}")
+    return regressions
+
+
+def report_statuses(engine) -> dict:
+    from sqlalchemy import func
+    from sqlmodel import Session, select
+    from app.models.medical import MedicalReport
+
+    with Session(engine) as session:
+        return dict(session.exec(select(MedicalReport.status, func.count()).group_by(MedicalReport.status)).all())
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def bench(args) -> dict:
+    import httpx
+    from app import main as app_main
+    from app.routers import medical
+    from app.services import ai_service
+    from app.services.passwords import password_hasher
+    from app.services.startup import readiness
+    from app.services.whatsapp import dispatcher
+
+    stub_client = StubInferenceClient(args.hf_latency_ms)
+    ai_service._client = stub_client
+    # Uploaded blobs go to a throwaway dir; it must stay relative, file_path is served from /static
+    medical.UPLOAD_DIR = f"static/uploads/bench-{os.getpid()}"
+    os.makedirs(medical.UPLOAD_DIR, exist_ok=True)
+
+    try:
+        population = populate(
+            app_main.db.engine, args.elders, args.caregivers, args.years, args.interval_minutes,
+            args.logs_per_elder, contacts_per_elder=args.contacts, seed=args.seed,
+        )
+        print(f"Synthetic data: {len(population.elders)} elders, {len(population.caregivers)} caregivers, "
+              f"{population.metrics} metrics, {population.behavior_logs} behavior logs ({population.seconds:.1f}s)")
+
+        app = app_main.app
+        await app.router.startup()
+        while not readiness.warm:
+            await asyncio.sleep(0.1)
+        if args.archive:
+            app_main.archive_scheduler.run_once()
+
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+            tokens = {}
+            for email in population.elders + population.caregivers:
+                response = await client.post("/auth/login", json={"email": email, "password": PASSWORD})
+                response.raise_for_status()
+                tokens[email] = {"Authorization": f"Bearer {response.json()['access_token']}"}
+            ctx = Context(client, population, tokens, args)
+
+            phases = {}
+            for index, name in enumerate(args.scenarios):
+                print(f"Running {name} ...", flush=True)
+                phases[name] = await run_phase(ctx, [name], [1], args.concurrency, args.duration, args.seed + index)
+            if not args.skip_mixed:
+                print("Running mixed ...", flush=True)
+                phases["mixed"] = await run_phase(
+                    ctx, list(args.scenarios), [MIX_WEIGHTS[n] for n in args.scenarios],
+                    args.concurrency, args.duration, args.seed + len(args.scenarios),
+                )
+
+        # Let queued report processing finish so the counts cover every upload
+        deadline = time.perf_counter() + args.drain_seconds
+        while (reports := report_statuses(app_main.db.engine)).get("processing") and time.perf_counter() < deadline:
+            await asyncio.sleep(0.5)
+        background = {
+            "medical_reports": reports,
+            "hf_stub_calls": stub_client.calls,
+            "whatsapp": {k: v for k, v in dispatcher.stats().items() if k in ("sent", "failed", "retries")},
+            "password_hasher": password_hasher.stats(),
+        }
+        await app.router.shutdown()
+        return {"phases": phases, "background": background}
+    finally:
+        shutil.rmtree(medical.UPLOAD_DIR, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--elders", type=int, default=50)
+    parser.add_argument("--caregivers", type=int, default=10)
+    parser.add_argument("--contacts", type=int, default=3, help="emergency contacts per elder")
+    parser.add_argument("--years", type=float, default=2.0)
+    parser.add_argument("--interval-minutes", type=int, default=60)
+    parser.add_argument("--logs-per-elder", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per phase")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--skip-mixed", action="store_true")
+    parser.add_argument("--csv-rows", type=int, default=1440)
+    parser.add_argument("--pdf-pages", type=int, default=3)
+    parser.add_argument("--hf-latency-ms", type=float, default=300)
+    parser.add_argument("--whatsapp-latency-ms", type=float, default=150)
+    parser.add_argument("--archive", action="store_true", help="archive rows older than ARCHIVE_AFTER_DAYS before measuring")
+    parser.add_argument("--drain-seconds", type=float, default=30)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--save", help="write results to this JSON file")
+    parser.add_argument("--compare", help="baseline JSON from an earlier --save")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed relative regression (default 20%%)")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="eldercare-bench-")
+    server = start_stub(args.whatsapp_latency_ms, error_rate=0.0)
+    # Everything below is read at import time, so it is set before the app is imported
+    os.environ.update({
+        "DATABASE_URL": f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+        "HEALTH_ARCHIVE_DIR": os.path.join(workdir, "archive"),
+        "ARCHIVE_INTERVAL_HOURS": "0",
+        "HUGGINGFACE_API_KEY": "bench",
+        "WHATSAPP_API_BASE": f"http://127.0.0.1:{server.server_address[1]}",
+        "WHATSAPP_PHONE_NUMBER_ID": "bench",
+        "WHATSAPP_ACCESS_TOKEN": "bench",
+    })
+    try:
+        result = asyncio.run(bench(args))
+    finally:
+        server.shutdown()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print_table(result["phases"])
+    print(json.dumps(result["background"], indent=2, default=str))
+    report = {
+        "meta": {
+            "git_commit": git_commit(), "python": sys.version.split()[0], "platform": platform.platform(),
+            "cpus": os.cpu_count(), "created": datetime.now().isoformat(timespec="seconds"),
+            "args": {k: v for k, v in vars(args).items() if k not in ("save", "compare")},
+        },
+        **result,
+    }
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(report, f, indent=2, default=str)
+        print(f"Saved baseline to {args.save}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if baseline["meta"]["args"] != report["meta"]["args"]:
+            print("Warning: baseline was recorded with different arguments; the comparison may not be meaningful")
+        regressions = compare(result["phases"], baseline, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} regression(s) vs {args.compare} ({baseline['meta'].get('git_commit')}):")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print(f"No regressions beyond {args.threshold:.0%} vs {args.compare}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+"""
+Concurrent read/write throughput against SQLite, before and after the db.py tuning.
+
+Writers commit one HealthMetric row per transaction (like POST requests); readers run
+the newest-first history page query. Three configurations on fresh databases:
+
+  * baseline  rollback journal, synchronous=FULL, sync sessions (the old defaults)
+  * tuned     WAL, synchronous=NORMAL, busy_timeout, cache_size, sync sessions
+  * async     tuned pragmas, AsyncSession on aiosqlite, one event loop
+
+Usage: python -m benchmarks.db_concurrency --seconds 10 --writers 8 --readers 8
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel import SQLModel, Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.db import _apply_sqlite_pragmas
+from app.models.health import HealthMetric
+from app.models.user import User
+
+SEED_ROWS = 50_000
+USERS = 50
+
+
+def _baseline_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=DELETE")
+    cursor.execute("PRAGMA synchronous=FULL")
+    cursor.close()
+
+
+def prepare(path: str, pragmas):
+    engine = create_engine(f"sqlite:///{path}", pool_size=32, max_overflow=0)
+    event.listen(engine, "connect", pragmas)
+    SQLModel.metadata.create_all(engine, tables=[User.__table__, HealthMetric.__table__])
+    with engine.begin() as conn:
+        conn.connection.driver_connection.executemany(
+            "INSERT INTO healthmetric (user_id, timestamp, source, heart_rate, fall_detected, inactivity_alert) "
+            "VALUES (?, ?, 'device', ?, 0, 0)",
+            ((random.randint(1, USERS), datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f"), 70) for _ in range(SEED_ROWS)),
+        )
+    return engine
+
+
+def history_query(user_id: int):
+    return (
+        select(HealthMetric)
+        .where(HealthMetric.user_id == user_id)
+        .order_by(HealthMetric.timestamp.desc(), HealthMetric.id.desc())
+        .limit(50)
+    )
+
+
+def new_metric() -> HealthMetric:
+    return HealthMetric(user_id=random.randint(1, USERS), timestamp=datetime.now(), source="bench", heart_rate=random.randint(50, 120))
+
+
+class Results:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = {"read": [], "write": []}
+        self.errors = 0
+
+    def add(self, kind: str, seconds: float):
+        with self.lock:
+            self.latencies[kind].append(seconds * 1000)
+
+    def error(self):
+        with self.lock:
+            self.errors += 1
+
+    def report(self, name: str, seconds: float):
+        parts = [f"{name:9s}"]
+        for kind, samples in self.latencies.items():
+            samples.sort()
+            p95 = samples[int(len(samples) * 0.95)] if samples else float("nan")
+            median = statistics.median(samples) if samples else float("nan")
+            parts.append(f"{kind}s {len(samples) / seconds:8.0f}/s  p50 {median:6.2f} ms  p95 {p95:7.2f} ms")
+        parts.append(f"errors {self.errors}")
+        print("  ".join(parts))
+
+
+def run_threads(engine, seconds: float, writers: int, readers: int) -> Results:
+    results = Results()
+    deadline = time.time() + seconds
+
+    def writer():
+        while time.time() < deadline:
+            started = time.perf_counter()
+            try:
+                with Session(engine) as session:
+                    session.add(new_metric())
+                    session.commit()
+                results.add("write", time.perf_counter() - started)
+            except OperationalError:
+                results.error()
+
+    def reader():
+        while time.time() < deadline:
+            started = time.perf_counter()
+            try:
+                with Session(engine) as session:
+                    session.exec(history_query(random.randint(1, USERS))).all()
+                results.add("read", time.perf_counter() - started)
+            except OperationalError:
+                results.error()
+
+    threads = [threading.Thread(target=writer) for _ in range(writers)] + [threading.Thread(target=reader) for _ in range(readers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+async def run_async(path: str, seconds: float, writers: int, readers: int) -> Results:
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}", pool_size=32, max_overflow=0)
+    event.listen(engine.sync_engine, "connect", _apply_sqlite_pragmas)
+    results = Results()
+    deadline = time.time() + seconds
+
+    async def writer():
+        while time.time() < deadline:
+            started = time.perf_counter()
+            try:
+                async with AsyncSession(engine) as session:
+                    session.add(new_metric())
+                    await session.commit()
+                results.add("write", time.perf_counter() - started)
+            except OperationalError:
+                results.error()
+
+    async def reader():
+        while time.time() < deadline:
+            started = time.perf_counter()
+            try:
+                async with AsyncSession(engine) as session:
+                    (await session.exec(history_query(random.randint(1, USERS)))).all()
+                results.add("read", time.perf_counter() - started)
+            except OperationalError:
+                results.error()
+
+    await asyncio.gather(*[writer() for _ in range(writers)], *[reader() for _ in range(readers)])
+    await engine.dispose()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--writers", type=int, default=8)
+    parser.add_argument("--readers", type=int, default=8)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, pragmas in (("baseline", _baseline_pragmas), ("tuned", _apply_sqlite_pragmas)):
+            path = os.path.join(tmp, f"{name}.db")
+            engine = prepare(path, pragmas)
+            run_threads(engine, seconds=args.seconds, writers=args.writers, readers=args.readers).report(name, args.seconds)
+            engine.dispose()
+
+        path = os.path.join(tmp, "async.db")
+        prepare(path, _apply_sqlite_pragmas).dispose()
+        asyncio.run(run_async(path, args.seconds, args.writers, args.readers)).report("async", args.seconds)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Query benchmark for per-user history endpoints (/health/stats, /cognitive/logs, /medical/).
+
+Builds a throwaway SQLite database with one heavy user plus background users, then times
+the newest-first page query at increasing depths:
+
+  * no index, OFFSET paging     (the old behaviour: full scan + sort per request)
+  * (user_id, timestamp) index, OFFSET paging
+  * (user_id, timestamp) index, keyset paging (what the endpoints use)
+
+Usage: python -m benchmarks.history_queries --rows 1000000
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, text
+from sqlmodel import SQLModel, Session, select
+
+from app.models.health import HealthMetric
+from app.models.user import User
+from app.services.pagination import keyset_page
+
+PAGE = 50
+
+
+def build_database(path: str, rows: int, other_users: int):
+    engine = create_engine(f"sqlite:///{path}")
+    SQLModel.metadata.create_all(engine, tables=[User.__table__, HealthMetric.__table__])
+    start = datetime(2020, 1, 1)
+    heavy = ((1, start + timedelta(minutes=i), "samsung_watch", random.randint(50, 120), 0, 0) for i in range(rows))
+    noise = (
+        (random.randint(2, other_users + 1), start + timedelta(minutes=random.randint(0, rows)), "device", 70, 0, 0)
+        for _ in range(rows)
+    )
+    with engine.begin() as conn:
+        raw = conn.connection.driver_connection
+        for source in (heavy, noise):
+            raw.executemany(
+                "INSERT INTO healthmetric (user_id, timestamp, source, heart_rate, fall_detected, inactivity_alert) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                ((u, ts.strftime("%Y-%m-%d %H:%M:%S.%f"), s, hr, f, ia) for u, ts, s, hr, f, ia in source),
+            )
+    return engine
+
+
+def time_query(fn, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def offset_page(session: Session, page: int):
+    statement = (
+        select(HealthMetric)
+        .where(HealthMetric.user_id == 1)
+        .order_by(HealthMetric.timestamp.desc(), HealthMetric.id.desc())
+        .offset(page * PAGE)
+        .limit(PAGE)
+    )
+    return session.exec(statement).all()
+
+
+def keyset_to_page(session: Session, cursors: dict, page: int):
+    statement = select(HealthMetric).where(HealthMetric.user_id == 1)
+    return keyset_page(session, statement, HealthMetric.timestamp, HealthMetric.id, PAGE, cursors.get(page))
+
+
+def collect_cursors(session: Session, depths: list[int]) -> dict:
+    """Walks the pages once so each depth's cursor is known (clients carry it between requests)."""
+    cursors, cursor, page = {0: None}, None, 0
+    while page < max(depths):
+        _, cursor = keyset_to_page(session, {0: cursor}, 0)
+        page += 1
+        cursors[page] = cursor
+    return cursors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000, help="rows for the heavy user (same again spread over others)")
+    parser.add_argument("--other-users", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    depths = [0, 10, 100, min(1000, args.rows // PAGE - 1)]
+    path = os.path.join(tempfile.mkdtemp(), "history_bench.db")
+    print(f"Building {path} with {args.rows:,} rows for user 1 ...")
+    engine = build_database(path, args.rows, args.other_users)
+
+    results = {}
+    with engine.connect() as conn:
+        conn.execute(text("DROP INDEX IF EXISTS ix_healthmetric_user_id_timestamp"))
+        conn.commit()
+    with Session(engine) as session:
+        results["no index, offset"] = [time_query(lambda d=d: offset_page(session, d), args.repeat) for d in depths]
+
+    with engine.connect() as conn:
+        conn.execute(text("CREATE INDEX ix_healthmetric_user_id_timestamp ON healthmetric (user_id, timestamp)"))
+        conn.execute(text("ANALYZE"))
+        conn.commit()
+    with Session(engine) as session:
+        results["index, offset"] = [time_query(lambda d=d: offset_page(session, d), args.repeat) for d in depths]
+        cursors = collect_cursors(session, depths)
+        results["index, keyset"] = [time_query(lambda d=d: keyset_to_page(session, cursors, d), args.repeat) for d in depths]
+
+        plan = session.connection().exec_driver_sql(
+            "EXPLAIN QUERY PLAN SELECT * FROM healthmetric WHERE user_id = 1 AND (timestamp, id) < (?, ?) "
+            "ORDER BY timestamp DESC, id DESC LIMIT 51",
+            ("2021-01-01 00:00:00.000000", 10**9),
+        ).fetchall()
+
+    print(f"\nmedian ms per page of {PAGE} (page depth -> {depths})")
+    for name, timings in results.items():
+        print(f"  {name:<18}" + "".join(f"{t:>10.2f}" for t in timings))
+    print("\nkeyset plan:", "; ".join(row[-1] for row in plan))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+"""
+Synthetic data for the benchmarks: elders with emergency contacts and linked caregivers,
+multi-year HealthMetric histories, behavior logs, watch-export CSVs and text PDFs.
+Everything derives from the seed, so two runs with the same arguments build identical
+databases and request payloads.
+
+Usage (builds a database to inspect): python -m benchmarks.synthetic --db /tmp/bench.db --elders 20 --years 2
+"""
+import argparse
+import json
+import os
+import random
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine
+from sqlmodel import SQLModel
+
+PASSWORD = "bench-password"
+SEVERITIES = ("Low", "Medium", "High")
+BEHAVIORS = (
+    "Forgot where the keys were", "Repeated the same question twice", "Missed a meal",
+    "Confused about the day of the week", "Left the stove on", "Did not recognise a neighbour",
+    "Got lost on the usual walk", "Forgot to take evening medication",
+)
+REPORT_SENTENCES = (
+    "The patient presented for a routine follow-up of hypertension and type 2 diabetes.",
+    "Blood pressure was {sys}/{dia} mmHg and resting heart rate {hr} bpm.",
+    "HbA1c has improved to {a1c}% since the last visit three months ago.",
+    "Renal function is stable with an eGFR of {egfr} mL/min.",
+    "The patient reports occasional dizziness when standing up quickly.",
+    "Metformin {dose} mg twice daily is continued; amlodipine is reduced to 5 mg.",
+    "Lipid panel shows LDL of {ldl} mg/dL, which remains above target.",
+    "A fall risk assessment was performed and home physiotherapy is recommended.",
+    "No new neurological deficits were found on examination.",
+    "Follow-up is scheduled in {weeks} weeks with repeat bloodwork beforehand.",
+)
+
+
+@dataclass
+class Population:
+    elders: list[str] = field(default_factory=list) # emails
+    caregivers: list[str] = field(default_factory=list)
+    elder_ids: list[int] = field(default_factory=list)
+    metrics: int = 0
+    behavior_logs: int = 0
+    seconds: float = 0.0
+
+
+def populate(engine, elders: int = 20, caregivers: int = 5, years: float = 1.0, interval_minutes: int = 60,
+             logs_per_elder: int = 200, contacts_per_elder: int = 2, seed: int = 1) -> Population:
+    """
+    Bulk-loads users, caregiver links, HealthMetric history and behavior logs straight
+    through the DB driver (no ORM, no API), so multi-year histories take seconds.
+    All users share one bcrypt hash of PASSWORD.
+    """
+    # Imported here so the caller can set DATABASE_URL etc. first; app.db registers every table model
+    import app.db  # noqa: F401
+    from app.services.passwords import pwd_context
+
+    started = time.perf_counter()
+    rng = random.Random(seed)
+    SQLModel.metadata.create_all(engine)
+    hashed = pwd_context.hash(PASSWORD)
+    population = Population()
+    now = datetime.now().replace(second=0, microsecond=0)
+    steps = int(years * 365 * 24 * 60 / interval_minutes)
+
+    with engine.begin() as conn:
+        raw = conn.connection.driver_connection
+        user_rows = []
+        for i in range(elders):
+            contacts = [{"name": f"Contact {j}", "phone": f"+1555{i:04d}{j:03d}", "relation": "family"} for j in range(contacts_per_elder)]
+            user_rows.append((f"elder{i}@bench.local", f"Elder {i}", "ELDER", f"+1444{i:06d}", 70 + i % 20, json.dumps(contacts), hashed))
+        for i in range(caregivers):
+            user_rows.append((f"caregiver{i}@bench.local", f"Caregiver {i}", "CAREGIVER", f"+1333{i:06d}", None, None, hashed))
+        raw.executemany(
+            "INSERT INTO user (email, full_name, role, phone_number, age, emergency_contacts, hashed_password) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            user_rows,
+        )
+        ids = {email: user_id for user_id, email in raw.execute("SELECT id, email FROM user WHERE email LIKE '%@bench.local'")}
+        population.elders = [f"elder{i}@bench.local" for i in range(elders)]
+        population.caregivers = [f"caregiver{i}@bench.local" for i in range(caregivers)]
+        population.elder_ids = [ids[e] for e in population.elders]
+
+        # Caregivers are assigned round-robin, so each watches about elders / caregivers of them
+        if caregivers:
+            raw.executemany(
+                "INSERT INTO caregiverelderlink (caregiver_id, elder_id) VALUES (?, ?)",
+                [(ids[population.caregivers[i % caregivers]], ids[elder]) for i, elder in enumerate(population.elders)],
+            )
+
+        def metric_rows(user_id):
+            base_hr = rng.randint(60, 80)
+            for k in range(steps):
+                ts = now - timedelta(minutes=interval_minutes * (steps - k))
+                hour = ts.hour
+                hr = base_hr + (10 if 8 <= hour <= 20 else -5) + rng.randint(-6, 6)
+                yield (
+                    user_id, ts.strftime("%Y-%m-%d %H:%M:%S.%f"), "samsung_watch", hr,
+                    rng.randint(0, 400) if 7 <= hour <= 21 else 0, None, rng.randint(93, 99) if k % 4 == 0 else None,
+                )
+
+        for user_id in population.elder_ids:
+            raw.executemany(
+                "INSERT INTO healthmetric (user_id, timestamp, source, heart_rate, steps, sleep_minutes, spo2, fall_detected, inactivity_alert) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, 0, 0)",
+                metric_rows(user_id),
+            )
+            population.metrics += steps
+
+            logs = [
+                (user_id, rng.choice(BEHAVIORS), rng.choice(SEVERITIES),
+                 (now - timedelta(minutes=rng.randint(0, int(years * 365 * 24 * 60)))).strftime("%Y-%m-%d %H:%M:%S.%f"))
+                for _ in range(logs_per_elder)
+            ]
+            raw.executemany("INSERT INTO behaviorlog (user_id, description, severity, timestamp) VALUES (?, ?, ?, ?)", logs)
+            population.behavior_logs += len(logs)
+
+    population.seconds = time.perf_counter() - started
+    return population
+
+
+def make_watch_csv(rng: random.Random, rows: int, start: datetime | None = None) -> bytes:
+    """A Samsung Health style export (Time, HeartRate, Steps, SleepMinutes, SpO2), one row per minute."""
+    start = start or datetime.now() - timedelta(minutes=rows)
+    lines = ["Time,HeartRate,Steps,SleepMinutes,SpO2"]
+    for k in range(rows):
+        ts = start + timedelta(minutes=k)
+        lines.append(f"{ts:%Y-%m-%d %H:%M:%S},{rng.randint(55, 100)},{rng.randint(0, 120)},,{rng.randint(92, 99)}")
+    return ("\n".join(lines) + "\n").encode()
+
+
+def make_report_text(rng: random.Random, sentences: int = 40) -> str:
+    values = {
+        "sys": rng.randint(110, 160), "dia": rng.randint(65, 95), "hr": rng.randint(55, 95),
+        "a1c": round(rng.uniform(5.5, 8.5), 1), "egfr": rng.randint(45, 95), "dose": rng.choice((500, 850, 1000)),
+        "ldl": rng.randint(70, 160), "weeks": rng.choice((4, 6, 8, 12)),
+    }
+    return " ".join(rng.choice(REPORT_SENTENCES).format(**values) for _ in range(sentences))
+
+
+def make_pdf(pages: list[str]) -> bytes:
+    """A minimal valid PDF with one Helvetica text block per page (no PDF library needed)."""
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None, "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for text in pages:
+        words, lines, line = text.split(), [], ""
+        for word in words:
+            if len(line) + len(word) > 90:
+                lines.append(line)
+                line = ""
+            line = f"{line} {word}".strip()
+        lines.append(line)
+        escaped = [l.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)") for l in lines[:60]]
+        stream = "BT /F1 10 Tf 12 TL 40 800 Td " + " ".join(f"({l}) '" for l in escaped) + " ET"
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] /Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>")
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>"
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1")
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    out += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode()
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    return bytes(out)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", required=True, help="SQLite file to create (must not exist)")
+    parser.add_argument("--elders", type=int, default=20)
+    parser.add_argument("--caregivers", type=int, default=5)
+    parser.add_argument("--years", type=float, default=1.0)
+    parser.add_argument("--interval-minutes", type=int, default=60)
+    parser.add_argument("--logs-per-elder", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    if os.path.exists(args.db):
+        parser.error(f"{args.db} already exists")
+
+    engine = create_engine(f"sqlite:///{args.db}")
+    population = populate(engine, args.elders, args.caregivers, args.years, args.interval_minutes, args.logs_per_elder, seed=args.seed)
+    print(f"{len(population.elders)} elders, {len(population.caregivers)} caregivers, {population.metrics} metrics, "
+          f"{population.behavior_logs} behavior logs in {population.seconds:.1f}s -> {args.db} (password: {PASSWORD})")
+
+
+if __name__ == "__main__":
+    main()
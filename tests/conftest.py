@@ -0,0 +1,7 @@
+import os
+import tempfile
+
+# Before any app module is imported: app.db builds its engines from these at import time
+_tmp = tempfile.mkdtemp(prefix="eldercare-tests-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_tmp}/test.db")
+os.environ.setdefault("HEALTH_ARCHIVE_DIR", f"{_tmp}/archive")
@@ -0,0 +1,71 @@
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlmodel import Session, delete
+
+from app.db import engine, get_session, init_db
+from app.models.health import HealthMetric
+from app.models.user import User
+from app.routers import health
+from app.routers.profile import get_current_user
+from app.services.archive import HealthArchive
+
+USER = User(id=1, email="elder@test.local", full_name="Test Elder", role="elder", hashed_password="x")
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    init_db()
+    with Session(engine) as session:
+        session.exec(delete(HealthMetric))
+        session.commit()
+    monkeypatch.setattr(health, "health_archive", HealthArchive(str(tmp_path / "archive")))
+
+    def session_override():
+        with Session(engine) as session:
+            yield session
+
+    app = FastAPI()
+    app.include_router(health.router, prefix="/health")
+    app.dependency_overrides[get_current_user] = lambda: USER
+    app.dependency_overrides[get_session] = session_override
+    return TestClient(app)
+
+
+def seed(live: int, archived: int):
+    """`archived` old rows moved to the archive, then `live` recent rows."""
+    start = datetime(2026, 1, 1, 12, 0)
+    with Session(engine) as session:
+        for k in range(archived + live):
+            session.add(HealthMetric(user_id=USER.id, timestamp=start + timedelta(minutes=k), heart_rate=60 + k))
+        session.commit()
+        health.health_archive.archive_user(session, USER.id, start + timedelta(minutes=archived))
+
+
+def walk(client: TestClient, limit: int) -> list[list[dict]]:
+    pages, params = [], {"limit": limit}
+    while True:
+        response = client.get("/health/stats", params=params)
+        assert response.status_code == 200
+        pages.append(response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            return pages
+        params = {"limit": limit, "before": cursor}
+
+
+def test_paging_continues_into_archive_when_live_rows_fill_the_page_exactly(client):
+    seed(live=10, archived=5)
+    pages = walk(client, limit=10)
+    assert [len(page) for page in pages] == [10, 5]
+    rates = [row["heart_rate"] for page in pages for row in page]
+    assert rates == list(range(74, 59, -1))
+
+
+def test_paging_crosses_from_live_to_archive_within_a_page(client):
+    seed(live=10, archived=5)
+    pages = walk(client, limit=11)
+    assert [len(page) for page in pages] == [11, 4]
+    assert [row["heart_rate"] for page in pages for row in page] == list(range(74, 59, -1))